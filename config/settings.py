@@ -126,6 +126,17 @@ DATABASES = {
     "default": env.dj_db_url("DATABASE_URL", default="sqlite:///db.sqlite3"),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Shared by the web and Huey processes. `fly/start.sh` creates the table.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache",
+    }
+}
+
 AUTH_USER_MODEL = "core.User"
 
 # Password validation
@@ -185,6 +196,13 @@ else:
         "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
     }
 
+# Uploaded CSVs wait here for the import tasks. They're private, and huey's
+# workers share the web server's disk (`SqliteHuey`), so they stay local.
+STORAGES["imports"] = {
+    "BACKEND": "django.core.files.storage.FileSystemStorage",
+    "OPTIONS": {"location": env("IMPORTS_ROOT", default=str(BASE_DIR / "imports"))},
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
@@ -209,6 +227,32 @@ AWS_S3_ENDPOINT_URL = env("AWS_S3_ENDPOINT_URL")
 AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = env("AWS_SECRET_ACCESS_KEY")
 
+# Outbound HTTP (Open Library, ISBN lookups, cover downloads)
+HTTP_USER_AGENT = env(
+    "HTTP_USER_AGENT", default="Stacks (https://bookstacks.app; trey@treypiepmeier.com)"
+)
+HTTP_CONNECT_TIMEOUT = env.float("HTTP_CONNECT_TIMEOUT", default=3.0)
+HTTP_READ_TIMEOUT = env.float("HTTP_READ_TIMEOUT", default=10.0)
+HTTP_RETRIES = env.int("HTTP_RETRIES", default=2)
+# Where to find Open Library, `open_library_standin` can stand in for both.
+OPEN_LIBRARY_URL = env("OPEN_LIBRARY_URL", default="https://openlibrary.org")
+OPEN_LIBRARY_COVERS_URL = env(
+    "OPEN_LIBRARY_COVERS_URL", default="https://covers.openlibrary.org"
+)
+# A local copy of (some of) Open Library's catalog, searched before going
+# out to Open Library. Built with `manage.py build_open_library_catalog`.
+OPEN_LIBRARY_CATALOG = env(
+    "OPEN_LIBRARY_CATALOG", default=str(BASE_DIR / "open_library_catalog.sqlite3")
+)
+# For looking up a batch of imported books at once.
+OPEN_LIBRARY_CONCURRENCY = env.int("OPEN_LIBRARY_CONCURRENCY", default=8)
+# Requests a second to each host (per process). Open Library allows 3 a
+# second from clients that identify themselves with a User-Agent.
+OPEN_LIBRARY_RATE_LIMIT = env.float("OPEN_LIBRARY_RATE_LIMIT", default=3.0)
+# Stop calling Open Library for a while after this many failures in a row.
+OPEN_LIBRARY_BREAKER_THRESHOLD = env.int("OPEN_LIBRARY_BREAKER_THRESHOLD", default=5)
+OPEN_LIBRARY_BREAKER_COOLDOWN = env.int("OPEN_LIBRARY_BREAKER_COOLDOWN", default=30)
+
 # Django Debug Toolbar
 if DEBUG:
     INTERNAL_IPS = ["127.0.0.1"]
@@ -236,3 +280,15 @@ HUEY = {
         "workers": 2,
     },
 }
+
+# Covers for imported books, on a queue of their own with its own consumer
+# (`manage.py run_covers_huey`), so bulk downloads never hold up other tasks.
+COVERS_HUEY = {
+    "huey_class": "huey.SqliteHuey",
+    "name": "covers",
+    "immediate": False,
+    "consumer": {
+        "workers": 4,
+        "worker_type": "thread",
+    },
+}
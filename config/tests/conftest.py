@@ -0,0 +1,61 @@
+import pytest
+from core import http_helpers
+from core.open_library_standin import OpenLibraryStandIn
+from core.queues import COVERS_HUEY
+from core.taxonomy_helpers import forget_taxonomies
+from core.trigram_helpers import forget_trigram_indexes
+from core.typeahead_helpers import forget_typeahead_results
+
+
+@pytest.fixture(autouse=True)
+def fresh_taxonomies():
+    # Types, genres, etc. are cached per process but each test has its own.
+    forget_taxonomies()
+
+
+@pytest.fixture(autouse=True)
+def fresh_search_indexes():
+    # Same for search indexes, user ids get reused between tests.
+    forget_trigram_indexes()
+    forget_typeahead_results()
+
+
+@pytest.fixture(autouse=True)
+def imports_storage(settings, tmp_path):
+    """Uploaded CSVs go under `tmp_path`, not the project's `imports` folder."""
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "imports": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": tmp_path / "imports"},
+        },
+    }
+
+
+@pytest.fixture(scope="session")
+def open_library_standin_server():
+    with OpenLibraryStandIn() as standin:
+        yield standin
+
+
+@pytest.fixture
+def open_library_standin(open_library_standin_server, settings, monkeypatch, tmp_path):
+    """
+    Send Open Library requests to a local `OpenLibraryStandIn`, without rate
+    limits or waits between retries. Covers are saved under `tmp_path`, and
+    imports look them up straight away rather than on the covers queue.
+    Change how it behaves with `open_library_standin.configure(...)`.
+    """
+    open_library_standin_server.configure()
+    settings.OPEN_LIBRARY_URL = open_library_standin_server.url
+    settings.OPEN_LIBRARY_COVERS_URL = open_library_standin_server.url
+    settings.OPEN_LIBRARY_RATE_LIMIT = 0
+    settings.MEDIA_ROOT = tmp_path
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    }
+    monkeypatch.setattr(http_helpers, "_limiter", None)
+    monkeypatch.setattr(http_helpers, "retry_wait", lambda *args: 0)
+    monkeypatch.setattr(COVERS_HUEY, "immediate", True)
+    return open_library_standin_server
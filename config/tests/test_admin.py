@@ -1,5 +1,27 @@
-# import pytest
+import pytest
+from django.contrib import admin
+from model_bakery import baker
+from core.admin import BookAdmin
+from core.models import Book, User
+from core.stats_helpers import rebuild_library_stats
+from core.typeahead_helpers import get_typeahead_results
 
 
 def test_custom_admin_stuff():
     pass
+
+
+@pytest.mark.django_db
+def test_archive_books_updates_counts_and_suggestions():
+    user = baker.make(User)
+    baker.make(Book, user=user, title="Dune", status="backlog")
+    book_admin = BookAdmin(Book, admin.site)
+    assert [b["name"] for b in get_typeahead_results(user, "dun")["books"]] == ["Dune"]
+
+    book_admin.archive_books(None, Book.objects.filter(archived=False))
+    assert get_typeahead_results(user, "dun")["books"] == []
+    assert rebuild_library_stats(user, check=True) == {}
+
+    book_admin.unarchive_books(None, Book.objects.filter(archived=True))
+    assert [b["name"] for b in get_typeahead_results(user, "dun")["books"]] == ["Dune"]
+    assert rebuild_library_stats(user, check=True) == {}
@@ -0,0 +1,397 @@
+import datetime
+import io
+import pytest
+from django.core import mail, management
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from huey.contrib.djhuey import HUEY
+from model_bakery import baker
+from core import bulk_import_helpers, tasks
+from core.bulk_import_helpers import csv_rows, import_rows
+from core.cover_tasks import find_import_covers
+from core.http_helpers import count_requests
+from core.models import Author, Book, ImportJob, ImportRow, LibraryStat, User
+from core.search_helpers import search_ids
+from core.stats_helpers import rebuild_library_stats
+
+pytestmark = pytest.mark.django_db
+
+
+def goodreads_row(title, shelf="to-read", **columns):
+    return {
+        "Title": title,
+        "Author": "Ursula K. Le Guin",
+        "Additional Authors": "",
+        "My Rating": "0",
+        "Date Read": "",
+        "Date Added": "2024/01/02",
+        "Exclusive Shelf": shelf,
+        "My Review": "",
+        **columns,
+    }
+
+
+def test_import_goodreads_rows():
+    user = baker.make(User)
+    baker.make(Book, user=user, title="The Dispossessed", status="finished")
+    rows = [
+        goodreads_row("A Wizard of Earthsea", "read", **{"Date Read": "2024/02/03"}),
+        goodreads_row(
+            "The Left Hand of Darkness",
+            "currently-reading",
+            **{"Additional Authors": "Someone Else, Ursula K. Le Guin "},
+        ),
+        goodreads_row("the dispossessed"),
+        goodreads_row(
+            " The Lathe of Heaven ",
+            "read",
+            **{"My Rating": "4", "My Review": "Dreamy", "Date Read": ""},
+        ),
+        goodreads_row("A WIZARD OF EARTHSEA"),
+        goodreads_row("Unfinished", "abandoned", Author=""),
+    ]
+
+    assert import_rows(rows, user, open_library=False, chunk_size=2) == {
+        "created": 4,
+        "skipped": 2,
+        "failed": 0,
+    }
+
+    assert sorted(Author.objects.filter(user=user).values_list("name", flat=True)) == [
+        "Someone Else",
+        "Ursula K. Le Guin",
+    ]
+    books = {book.title: book for book in Book.objects.filter(user=user)}
+    assert len(books) == 5
+    assert books["The Lathe of Heaven"].imported
+
+    earthsea = books["A Wizard of Earthsea"]
+    reading = earthsea.readings.get()
+    assert (reading.start_date, reading.end_date) == (
+        datetime.date(2024, 1, 2),
+        datetime.date(2024, 2, 3),
+    )
+    assert reading.finished and reading.rating is None
+    assert earthsea.latest_reading_end == datetime.date(2024, 2, 3)
+    assert earthsea.latest_finished_end == datetime.date(2024, 2, 3)
+    assert earthsea.latest_unfinished_end is None
+
+    darkness = books["The Left Hand of Darkness"]
+    assert darkness.author.count() == 2
+    # Just the one reading, from when it was added.
+    assert list(darkness.readings.values_list("start_date", "end_date")) == [
+        (datetime.date(2024, 1, 2), None)
+    ]
+
+    lathe = books["The Lathe of Heaven"]
+    assert lathe.readings.get().rating == 4
+    assert lathe.readings.get().end_date == datetime.date.today()
+    assert lathe.notes.get().text == "Dreamy"
+
+    assert books["Unfinished"].status == "dnf"
+    assert not books["Unfinished"].author.exists()
+
+    # Nothing the signals would have done is missing.
+    assert rebuild_library_stats(user, check=True) == {}
+    assert (
+        LibraryStat.objects.get(user=user, status="finished", facet="status").count == 3
+    )
+    assert search_ids(Book, user, "someone") == [darkness.pk]
+    assert search_ids(Book, user, "dreamy") == [lathe.pk]
+    assert search_ids(Author, user, "someone")
+
+
+def test_import_the_storygraph_rows():
+    user = baker.make(User)
+    rows = [
+        {
+            "Title": "Piranesi",
+            "Authors": "Susanna Clarke",
+            "Read Status": "read",
+            "Dates Read": "2023/10/28-2024/01/24",
+            "Star Rating": "4.5",
+            "Year Published": "2020",
+        },
+        {
+            "Title": "Jonathan Strange & Mr Norrell",
+            "Authors": "Susanna Clarke",
+            "Read Status": "read",
+            "Dates Read": "2022/05/01",
+            "Star Rating": "",
+        },
+    ]
+
+    assert import_rows(rows, user, open_library=False)["created"] == 2
+
+    piranesi = Book.objects.get(title="Piranesi")
+    assert piranesi.published_year == 2020
+    assert list(piranesi.readings.values_list("start_date", "end_date", "rating")) == [
+        (datetime.date(2023, 10, 28), datetime.date(2024, 1, 24), 5)
+    ]
+    strange = Book.objects.get(title__startswith="Jonathan")
+    assert list(strange.readings.values_list("start_date", "end_date")) == [
+        (datetime.date(2022, 5, 1), datetime.date(2022, 5, 1))
+    ]
+    assert Author.objects.get(user=user).book_set.count() == 2
+    assert rebuild_library_stats(user, check=True) == {}
+
+
+def test_import_rows_queries_per_chunk():
+    def queries(count):
+        user = baker.make(User)
+        rows = [
+            goodreads_row(
+                f"Book {i}",
+                "read",
+                Author=f"Author {i}",
+                **{"Additional Authors": "Co Author", "My Review": "Good"},
+            )
+            for i in range(count)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            assert import_rows(rows, user, open_library=False)["created"] == count
+        return len(context)
+
+    # The same however many rows are in a chunk.
+    assert queries(5) == queries(50)
+
+
+def test_csv_rows():
+    file = io.BytesIO(
+        "\ufeffTitle,My Review\r\n"
+        'Dune,"Long,\r\nwinding"\r\n'
+        "\r\n"
+        "Piranesi,\r\n"
+        "Emma\r\n".encode()
+    )
+
+    rows = list(csv_rows(file))
+
+    assert [row for row, _ in rows] == [
+        {"Title": "Dune", "My Review": "Long,\r\nwinding"},
+        {"Title": "Piranesi", "My Review": ""},
+        {"Title": "Emma"},
+    ]
+    # Picking up after a row gets the rest.
+    assert [row for row, _ in csv_rows(file, rows[0][1])] == [
+        row for row, _ in rows[1:]
+    ]
+    assert list(csv_rows(file, rows[-1][1])) == []
+    assert list(csv_rows(io.BytesIO(b""))) == []
+
+
+@pytest.fixture
+def import_job():
+    user = baker.make(User)
+    name = storages["imports"].save(
+        "export.csv",
+        ContentFile(
+            "Title,Author,Exclusive Shelf\n"
+            + "".join(f"Book {i},Someone,read\n" for i in range(5))
+        ),
+    )
+    return ImportJob.objects.create(user=user, file_name=name)
+
+
+def test_import_books_from_csv_queues_each_chunk(import_job, monkeypatch):
+    monkeypatch.setattr(tasks, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(HUEY, "immediate", True)
+    queued = []
+
+    def import_rows(rows, user, import_job):
+        queued.append(rows)
+        return {"created": len(rows) - 1, "skipped": 1, "failed": 0}
+
+    monkeypatch.setattr(tasks, "import_rows", import_rows)
+
+    tasks.import_books_from_csv(import_job.pk)
+
+    assert [[row["Title"] for row in rows] for rows in queued] == [
+        ["Book 0", "Book 1"],
+        ["Book 2", "Book 3"],
+        ["Book 4"],
+    ]
+    import_job.refresh_from_db()
+    assert import_job.status == "finished"
+    assert import_job.source == "goodreads"
+    assert (import_job.total_rows, import_job.processed_rows) == (5, 5)
+    assert (import_job.created_books, import_job.skipped_rows) == (2, 3)
+    assert import_job.rows_per_second > 0
+    assert len(mail.outbox) == 1
+    assert "Your import of 2 books is done!" in mail.outbox[0].body
+    assert not storages["imports"].exists(import_job.file_name)
+
+
+def test_import_books_from_csv_failing(import_job, monkeypatch):
+    monkeypatch.setattr(HUEY, "immediate", True)
+
+    def import_rows(rows, user, import_job):
+        raise ValueError("Oops")
+
+    monkeypatch.setattr(tasks, "import_rows", import_rows)
+
+    # Tried again later, waiting longer each time.
+    for attempt in range(tasks.IMPORT_RETRIES):
+        tasks.import_books_from_csv.call_local(import_job.pk)
+        import_job.refresh_from_db()
+        assert import_job.attempts == attempt + 1
+        assert import_job.status == "running"
+        assert "Oops" in import_job.error
+    assert len(HUEY.scheduled()) == tasks.IMPORT_RETRIES
+    assert [task.args for task in HUEY.scheduled()] == [(import_job.pk, 0)] * 3
+
+    with pytest.raises(ValueError):
+        tasks.import_books_from_csv.call_local(import_job.pk)
+
+    import_job.refresh_from_db()
+    assert import_job.status == "failed"
+    assert import_job.total_rows == 5
+    assert not mail.outbox
+
+
+def test_import_books_from_csv_resumes_from_its_checkpoint(import_job, monkeypatch):
+    monkeypatch.setattr(tasks, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(HUEY, "immediate", True)
+    import_rows = tasks.import_rows
+    imported = []
+
+    def import_only_once(rows, user, import_job):
+        imported.extend(row["Title"] for row in rows)
+        if len(imported) > 2:
+            # The consumer's gone, along with what it had queued.
+            raise KeyboardInterrupt
+        return import_rows(rows, user, import_job=import_job)
+
+    monkeypatch.setattr(tasks, "import_rows", import_only_once)
+    tasks.import_books_from_csv(import_job.pk)
+
+    # Only the first chunk made it.
+    import_job.refresh_from_db()
+    assert import_job.offset > 0
+    assert import_job.processed_rows == 2
+    assert import_job.rows.count() == 2
+    assert Book.objects.filter(user=import_job.user).count() == 2
+
+    # A stale copy of the first task does nothing.
+    tasks.import_books_from_csv.call_local(import_job.pk)
+    assert len(imported) == 4
+
+    monkeypatch.setattr(tasks, "import_rows", import_rows)
+    management.call_command("resume_imports", stdout=io.StringIO())
+
+    import_job.refresh_from_db()
+    assert import_job.status == "finished"
+    assert (import_job.processed_rows, import_job.created_books) == (5, 5)
+    assert import_job.skipped_rows == 0
+    assert Book.objects.filter(user=import_job.user).count() == 5
+    assert len(mail.outbox) == 1
+
+
+def test_importing_the_same_rows_again(import_job):
+    user = import_job.user
+    rows = [
+        goodreads_row("A Wizard of Earthsea", "read"),
+        goodreads_row("The Tombs of Atuan"),
+        goodreads_row(""),
+    ]
+    assert import_rows(rows, user, open_library=False, import_job=import_job) == {
+        "created": 2,
+        "skipped": 0,
+        "failed": 1,
+    }
+    assert sorted(import_job.rows.values_list("status", flat=True)) == [
+        "created",
+        "created",
+        "failed",
+    ]
+    earthsea = Book.objects.get(title="A Wizard of Earthsea")
+    assert import_job.rows.get(book=earthsea).status == "created"
+
+    again = ImportJob.objects.create(user=user)
+    rows.append(goodreads_row("The Farthest Shore"))
+    counts = import_rows(rows, user, open_library=False, import_job=again)
+
+    # The row that failed is tried again, and fails again.
+    assert counts == {"created": 1, "skipped": 2, "failed": 1}
+    assert Book.objects.filter(user=user).count() == 3
+    assert ImportRow.objects.filter(user=user).count() == 7
+    assert not again.rows.filter(book=earthsea).exists()
+
+
+def test_import_job_counts_open_library_requests(
+    open_library_standin, django_capture_on_commit_callbacks
+):
+    user = baker.make(User)
+    job = ImportJob.objects.create(user=user)
+    rows = [
+        goodreads_row("The Hobbit", **{"Original Publication Year": "1937"}),
+        goodreads_row("Something Else"),
+    ]
+
+    with (
+        count_requests() as requests,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        counts = import_rows(rows, user, import_job=job)
+
+    # Two searches and two covers.
+    assert requests == {"open_library": 4}
+    assert counts["created"] == 2
+    assert set(job.books.values_list("title", flat=True)) == {
+        "The Hobbit",
+        "Something Else",
+    }
+    job.refresh_from_db()
+    assert job.open_library_requests == 4
+
+
+def test_import_rows_leaves_covers_to_their_queue(
+    open_library_standin, monkeypatch, django_capture_on_commit_callbacks
+):
+    user = baker.make(User)
+    queued = []
+    monkeypatch.setattr(
+        bulk_import_helpers,
+        "find_import_covers",
+        lambda lookups, import_job_id: queued.append(lookups),
+    )
+    row = {
+        "Title": "The Hobbit",
+        "Author": "J.R.R. Tolkien",
+        "ISBN/UID": "9780261102217",
+        "Exclusive Shelf": "to-read",
+    }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert import_rows([row], user)["created"] == 1
+
+    # Saved without asking Open Library anything.
+    book = Book.objects.get(user=user)
+    assert not open_library_standin.requests
+    assert book.awaiting_cover and not book.covers.exists()
+    assert [len(lookups) for lookups in queued] == [1]
+
+    find_import_covers.call_local(queued[0])
+
+    book.refresh_from_db()
+    assert not book.awaiting_cover
+    assert (book.olid, book.published_year) == ("OL51711263M", 1937)
+    assert book.covers.get().thumbnail.width == 300
+
+
+def test_find_import_covers_without_a_cover(open_library_standin, settings):
+    settings.HTTP_RETRIES = 0
+    book = baker.make(Book, awaiting_cover=True, olid="OL1M", published_year=2001)
+    open_library_standin.configure(error_rate=1)
+
+    updated_at = book.updated_at
+
+    find_import_covers.call_local([(book.pk, "&title=Anything", None)])
+
+    book.refresh_from_db()
+    assert not book.awaiting_cover and not book.covers.exists()
+    # Cached list items are keyed on it.
+    assert book.updated_at > updated_at
+    assert (book.olid, book.published_year) == ("OL1M", 2001)
@@ -0,0 +1,75 @@
+import pytest
+from model_bakery import baker
+from core.filter_helpers import get_facet_counts
+from core.models import Book, BookType, BookGenre, BookFormat, BookLocation
+
+
+@pytest.fixture
+def facets():
+    type1 = baker.make(BookType, slug="type1")
+    type2 = baker.make(BookType, slug="type2", parent=type1)
+    genre1 = baker.make(BookGenre, slug="genre1")
+    genre2 = baker.make(BookGenre, slug="genre2")
+    genre3 = baker.make(BookGenre, slug="genre3", parent=genre1)
+    genre4 = baker.make(BookGenre, slug="genre4", parent=genre1)
+    format1 = baker.make(BookFormat, slug="format1")
+    location1 = baker.make(BookLocation, slug="location1")
+    location2 = baker.make(BookLocation, slug="location2")
+
+    book1 = baker.make(Book, type=type1, status="reading")
+    book1.genre.add(genre1, genre3)
+    book1.location.add(location1)
+    book2 = baker.make(Book, type=type2, status="reading")
+    book2.genre.add(genre3, genre4)
+    book2.format.add(format1)
+    book2.location.add(location1, location2)
+    book3 = baker.make(Book, type=type2, status="reading")
+    book3.genre.add(genre2)
+
+    return {
+        "type": BookType.objects.all(),
+        "genre": BookGenre.objects.all(),
+        "location": BookLocation.objects.all(),
+        "format": BookFormat.objects.all(),
+    }
+
+
+@pytest.mark.django_db
+def test_facet_counts(facets):
+    counts = get_facet_counts(Book.objects.all(), facets)
+
+    assert counts["type"] == {"type1": {"count": 3, "sub_items": {"type2": 2}}}
+    # Books are only counted once per parent genre
+    assert counts["genre"] == {
+        "genre1": {"count": 2, "sub_items": {"genre3": 2, "genre4": 1}},
+        "genre2": {"count": 1, "sub_items": {}},
+    }
+    assert counts["location"] == {"location1": 2, "location2": 1}
+    assert counts["format"] == {"format1": 1}
+
+
+@pytest.mark.django_db
+def test_facet_counts_for_filtered_books(facets):
+    books = Book.objects.filter(format__slug="format1")
+    counts = get_facet_counts(books, facets)
+
+    assert counts["type"] == {"type1": {"count": 1, "sub_items": {"type2": 1}}}
+    assert counts["genre"]["genre1"]["count"] == 1
+    assert counts["genre"]["genre2"]["count"] == 0
+    assert counts["location"] == {"location1": 1, "location2": 1}
+
+
+@pytest.mark.django_db
+def test_facet_counts_query_budget(facets, django_assert_num_queries):
+    facets = {name: list(items) for name, items in facets.items()}
+
+    # One grouped query per field, plus one for unique parent genre counts
+    with django_assert_num_queries(5):
+        get_facet_counts(Book.objects.all(), facets)
+
+    # More filter options don't mean more queries
+    baker.make(BookGenre, _quantity=10)
+    facets["genre"] = list(BookGenre.objects.all())
+
+    with django_assert_num_queries(5):
+        get_facet_counts(Book.objects.all(), facets)
@@ -1,5 +1,22 @@
-# import pytest
+import pytest
+from model_bakery import baker
+from core.forms import BookForm
+from core.models import BookGenre, BookType, User
 
 
 def test_homepage():
     pass
+
+
+@pytest.mark.django_db
+def test_book_form_choices_come_from_taxonomy(django_assert_num_queries):
+    user = baker.make(User)
+    textual = baker.make(BookType, slug="textual", name="Textual")
+    baker.make(BookType, slug="comic", name="Comic", parent=textual)
+    baker.make(BookGenre, _quantity=3)
+    form = BookForm(user=user)
+    str(form["type"])
+
+    with django_assert_num_queries(0):
+        str(BookForm(user=user)["type"])
+        str(BookForm(user=user)["genre"])
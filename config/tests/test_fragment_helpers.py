@@ -0,0 +1,48 @@
+import pytest
+from unittest import mock
+from model_bakery import baker
+from core.models import Book, BookCover
+from core.fragment_helpers import book_list_item_key, render_book_list_items
+
+
+def get_books(user):
+    return Book.objects.filter(user=user).prefetch_related("covers").order_by("pk")
+
+
+@pytest.mark.django_db
+def test_render_book_list_items_uses_cache(django_assert_num_queries):
+    user = baker.make("core.User")
+    baker.make(Book, user=user, title="Cats & Dogs")
+    baker.make(Book, user=user, _quantity=2)
+
+    books = render_book_list_items(get_books(user))
+    assert "Cats &amp; Dogs" in books[0].list_item_html
+
+    books = list(get_books(user))
+    with mock.patch("core.fragment_helpers.render_to_string") as render:
+        with django_assert_num_queries(1):
+            render_book_list_items(books)
+    render.assert_not_called()
+    assert "Cats &amp; Dogs" in books[0].list_item_html
+
+
+@pytest.mark.django_db
+def test_book_list_item_key_changes():
+    book = baker.make(Book)
+    keys = {book_list_item_key(Book.objects.get(pk=book.pk))}
+
+    book.title = "New title"
+    book.save()
+    keys.add(book_list_item_key(Book.objects.get(pk=book.pk)))
+
+    cover = baker.make(BookCover, book=book)
+    keys.add(book_list_item_key(Book.objects.get(pk=book.pk)))
+
+    cover.description = "First edition"
+    cover.save()
+    keys.add(book_list_item_key(Book.objects.get(pk=book.pk)))
+
+    baker.make(BookCover, book=book).top()
+    keys.add(book_list_item_key(Book.objects.get(pk=book.pk)))
+
+    assert len(keys) == 5
@@ -0,0 +1,173 @@
+import httpx
+import pytest
+from unittest import mock
+from django.core.cache import cache
+from core import http_helpers
+from core.cover_helpers import search_open_library
+from core.models import OpenLibraryResponse
+
+
+@pytest.fixture
+def responses(monkeypatch, settings, db):
+    """Answer requests with the given responses (or exceptions) in turn."""
+    settings.HTTP_RETRIES = 2
+    monkeypatch.setattr(http_helpers.time, "sleep", mock.Mock())
+    sent = []
+
+    def install(*answers):
+        answers = list(answers)
+
+        def handler(request):
+            sent.append(request)
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            headers={"User-Agent": settings.HTTP_USER_AGENT},
+        )
+        monkeypatch.setattr(http_helpers, "get_client", lambda: client)
+        return sent
+
+    return install
+
+
+def test_get_retries_then_succeeds(responses):
+    sent = responses(
+        httpx.ConnectError("Nope"),
+        httpx.Response(503),
+        httpx.Response(200, json={"ok": True}),
+    )
+
+    response = http_helpers.get("https://openlibrary.org/search.json")
+    assert response.json() == {"ok": True}
+    assert len(sent) == 3
+    assert sent[0].headers["User-Agent"].startswith("Stacks")
+    assert http_helpers.time.sleep.call_count == 2
+
+
+def test_get_gives_up(responses):
+    sent = responses(*[httpx.ReadTimeout("Slow")] * 3)
+
+    with pytest.raises(httpx.ReadTimeout):
+        http_helpers.get("https://openlibrary.org/search.json")
+    assert len(sent) == 3
+
+    responses(*[httpx.Response(502)] * 3)
+    assert http_helpers.get("https://openlibrary.org/search.json").status_code == 502
+
+
+def test_get_doesnt_retry_client_errors(responses):
+    sent = responses(httpx.Response(404))
+
+    assert http_helpers.get("https://openlibrary.org/isbn/1.json").status_code == 404
+    assert len(sent) == 1
+
+
+def test_search_doesnt_retry(responses):
+    sent = responses(httpx.ReadTimeout("Slow"))
+
+    results = search_open_library("&title=Dune")
+
+    assert results["error"].startswith("Open Library is having issues")
+    assert len(sent) == 1
+    assert sent[0].extensions["timeout"]["read"] == 5
+
+
+def test_retry_wait():
+    assert 0 <= http_helpers.retry_wait(0) <= http_helpers.RETRY_BACKOFF
+    assert http_helpers.retry_wait(10) <= http_helpers.RETRY_MAX_WAIT
+    assert (
+        http_helpers.retry_wait(0, httpx.Response(429, headers={"Retry-After": "2"}))
+        == 2
+    )
+
+
+def test_get_client_is_shared():
+    assert http_helpers.get_client() is http_helpers.get_client()
+
+
+@pytest.fixture
+def breaker(settings):
+    settings.OPEN_LIBRARY_BREAKER_THRESHOLD = 2
+    settings.OPEN_LIBRARY_BREAKER_COOLDOWN = 30
+
+    def end_cooldown():
+        key = http_helpers.open_library_breaker().opened_key
+        cache.set(key, cache.get(key) - 31, timeout=None)
+
+    return end_cooldown
+
+
+def test_circuit_breaker_opens_and_probes(responses, breaker):
+    url = "https://openlibrary.org/isbn/1.json"
+    sent = responses(*[httpx.Response(503)] * 3, httpx.Response(200))
+
+    # Each failed try counts, so it opens without using up the retries.
+    assert http_helpers.get(url).status_code == 503
+    assert http_helpers.open_library_breaker().state == "open"
+    assert len(sent) == 2
+
+    # Fails fast while open, covers included.
+    with pytest.raises(http_helpers.CircuitOpenError):
+        http_helpers.get("https://covers.openlibrary.org/b/id/1-L.jpg")
+    assert len(sent) == 2
+
+    # One probe once the cooldown is up, which fails without a retry...
+    breaker()
+    assert http_helpers.get(url).status_code == 503
+    assert http_helpers.open_library_breaker().state == "open"
+    assert len(sent) == 3
+
+    # ...and then works.
+    breaker()
+    assert http_helpers.get(url).status_code == 200
+    assert http_helpers.open_library_breaker().state == "closed"
+
+
+def test_only_one_probe_at_a_time(responses, breaker):
+    responses(*[httpx.ConnectError("Down")] * 2)
+    with pytest.raises(httpx.ConnectError):
+        http_helpers.get("https://openlibrary.org/isbn/1.json")
+
+    breaker()
+    probe = http_helpers.open_library_breaker()
+    probe.check()
+    assert probe.probing
+
+    with pytest.raises(http_helpers.CircuitOpenError):
+        http_helpers.open_library_breaker().check()
+
+
+def test_search_fails_fast_without_caching(responses, breaker):
+    responses(*[httpx.Response(500)] * 2)
+    http_helpers.get("https://openlibrary.org/search.json")
+
+    results = search_open_library("&title=Dune")
+
+    assert results["error"].startswith("Open Library is having issues")
+    assert not OpenLibraryResponse.objects.exists()
+
+
+def test_other_hosts_skip_the_breaker(responses, breaker):
+    responses(*[httpx.Response(500)] * 6)
+    for _ in range(2):
+        http_helpers.get("https://example.com/cover.jpg")
+
+    assert http_helpers.open_library_breaker().state == "closed"
+
+
+def test_rate_limiter_bursts_then_spaces_out(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(http_helpers.time, "monotonic", lambda: now[0])
+    limiter = http_helpers.RateLimiter(2, burst=2)
+    url = "https://openlibrary.org/search.json"
+
+    assert [limiter.delay(url) for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert limiter.delay("https://covers.openlibrary.org/b/id/1-L.jpg") == 0
+
+    now[0] = 10
+    assert limiter.delay(url) == 0
+    assert http_helpers.RateLimiter(0).delay(url) == 0
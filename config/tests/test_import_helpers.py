@@ -0,0 +1,75 @@
+import pytest
+from core.import_helpers import (
+    normalize_isbn,
+    publication_year,
+    resolve_isbns,
+    row_isbn,
+)
+
+
+@pytest.mark.parametrize(
+    "text, year",
+    [
+        ("1937", 1937),
+        ("Sep 21, 1937", 1937),
+        ("1937-09-21", 1937),
+        ("21/09/1937", 1937),
+        ("c1937", 1937),
+        ("[1937?]", 1937),
+        ("September 2004", 2004),
+        ("12345", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_publication_year(text, year):
+    assert publication_year(text) == year
+
+
+def test_row_isbn():
+    assert normalize_isbn("978-0-261-10221-7") == "9780261102217"
+    assert normalize_isbn("026110221x") == "026110221X"
+    assert normalize_isbn("12345") is None
+
+    assert row_isbn({"ISBN/UID": "9780261102217"}) == "9780261102217"
+    assert row_isbn({"ISBN": '="0261102214"', "ISBN13": '=""'}) == "0261102214"
+    assert row_isbn({"ISBN/UID": "storygraph-uid", "ISBN13": '="9780261102217"'}) == (
+        "9780261102217"
+    )
+    assert row_isbn({"ISBN": '=""'}) is None
+
+
+@pytest.mark.django_db
+def test_resolve_isbns(open_library_standin):
+    isbns = ["9780261102217", "978-0-261-10221-7", "0001112223", "9781234567897"]
+    isbns += [f"97800000{i:05}" for i in range(60)]
+
+    years = resolve_isbns(isbns, chunk_size=40)
+
+    assert years["9780261102217"] == years["978-0-261-10221-7"] == 1937
+    assert years["0001112223"] is None
+    assert 1900 <= years["9781234567897"] < 2025
+    assert len(years) == 64
+    # Two chunks of the 63 different ISBNs.
+    assert [path.split("?")[0] for path in open_library_standin.requests] == [
+        "/api/books",
+        "/api/books",
+    ]
+
+    # All cached now, including those Open Library didn't know.
+    assert resolve_isbns(isbns) == years
+    assert resolve_isbns(["0001112223"]) == {"0001112223": None}
+    assert len(open_library_standin.requests) == 2
+
+
+@pytest.mark.django_db
+def test_resolve_isbns_when_open_library_fails(open_library_standin, settings):
+    settings.HTTP_RETRIES = 0
+    open_library_standin.configure(error_rate=1)
+
+    assert resolve_isbns(["9780261102217"]) == {"9780261102217": None}
+
+    # Errors are only cached briefly, but they are cached.
+    open_library_standin.configure()
+    assert resolve_isbns(["9780261102217"]) == {"9780261102217": None}
+    assert open_library_standin.requests == []
@@ -3,7 +3,7 @@ import io
 from PIL import Image
 from unittest import mock
 from model_bakery import baker
-from requests.exceptions import RequestException
+import httpx
 from core.models import Book, BookFormat, BookLocation, BookReading, BookCover
 
 
@@ -124,21 +124,21 @@ def test_save_cover_from_url_with_empty_url():
 
 
 @pytest.mark.django_db
-@mock.patch("requests.get", side_effect=RequestException)
+@mock.patch("core.http_helpers.get", side_effect=httpx.ConnectError("Nope"))
 def test_save_cover_from_url_with_request_exception(mock_get):
     book_cover = baker.make(BookCover)
     assert book_cover.save_cover_from_url("http://example.com/image.jpg") is False
 
 
 @pytest.mark.django_db
-@mock.patch("requests.get", return_value=mock.Mock(status_code=404))
+@mock.patch("core.http_helpers.get", return_value=mock.Mock(status_code=404))
 def test_save_cover_from_url_with_non_200_status_code(mock_get):
     book_cover = baker.make(BookCover)
     assert book_cover.save_cover_from_url("http://example.com/image.jpg") is False
 
 
 @pytest.mark.django_db
-@mock.patch("requests.get")
+@mock.patch("core.http_helpers.get")
 def test_save_cover_from_url_with_200_status_code(mock_get):
     # Create a mock image
     img = Image.new("RGB", (60, 30), color="red")
@@ -146,10 +146,70 @@ def test_save_cover_from_url_with_200_status_code(mock_get):
     img.save(img_byte_arr, format="JPEG")
     img_byte_arr = img_byte_arr.getvalue()
 
-    # Mock the response of requests.get
+    # Mock the response of http_helpers.get
     mock_get.return_value.status_code = 200
     mock_get.return_value.content = img_byte_arr
 
     book_cover = baker.make(BookCover)
     assert book_cover.save_cover_from_url("http://example.com/image.jpg") is True
     assert book_cover.image is not None
+
+
+@pytest.mark.django_db
+def test_book_latest_reading_follows_readings():
+    book = baker.make(Book, title="Test Book", status="backlog")
+    assert book.latest_reading_start is None
+
+    book.status = "reading"
+    book.save()
+    book.refresh_from_db()
+    assert book.latest_reading_start is not None
+    assert book.latest_unfinished_end is None
+
+    book.status = "finished"
+    book.save()
+    book.refresh_from_db()
+    assert book.latest_finished_end is not None
+
+    book.readings.get().delete()
+    book.refresh_from_db()
+    assert book.latest_reading_start is None
+    assert book.latest_finished_end is None
+
+
+@pytest.mark.django_db
+def test_book_latest_finished_end_ignores_later_unfinished_readings():
+    book = baker.make(Book, title="Test Book", status="backlog")
+    baker.make(
+        BookReading,
+        book=book,
+        start_date="2024-01-01",
+        end_date="2024-02-01",
+        finished=True,
+    )
+    # Started again and gave up.
+    baker.make(
+        BookReading,
+        book=book,
+        start_date="2024-05-01",
+        end_date="2024-06-01",
+        finished=False,
+    )
+
+    book.refresh_from_db()
+    assert str(book.latest_reading_start) == "2024-05-01"
+    assert str(book.latest_reading_end) == "2024-06-01"
+    assert str(book.latest_finished_end) == "2024-02-01"
+    assert str(book.latest_unfinished_end) == "2024-06-01"
+
+
+@pytest.mark.django_db
+def test_book_save_keeps_latest_reading():
+    book = baker.make(Book, title="Test Book", status="backlog")
+    stale_book = Book.objects.get(pk=book.pk)
+    baker.make(BookReading, book=book, start_date="2024-01-01")
+
+    stale_book.title = "New Title"
+    stale_book.save()
+    book.refresh_from_db()
+    assert str(book.latest_reading_start) == "2024-01-01"
@@ -0,0 +1,108 @@
+import httpx
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.utils import timezone
+from core import http_helpers
+from core.cover_helpers import search_open_library
+from core.import_helpers import resolve_isbns
+from core.models import OpenLibraryResponse
+from core.open_library_cache_helpers import (
+    OPEN_LIBRARY_CACHE_EMPTY_TTL,
+    OPEN_LIBRARY_CACHE_ERROR_TTL,
+    OPEN_LIBRARY_CACHE_TTL,
+    cached_response,
+    cull,
+    get_cache_stats,
+    isbn_key,
+    reset_cache_stats,
+    search_key,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    reset_cache_stats()
+
+
+def expires_in(key):
+    return OpenLibraryResponse.objects.get(key=key).expires_at - timezone.now()
+
+
+def test_search_key_ignores_case_spacing_and_order():
+    assert search_key("&title=The  Hobbit&author=Tolkien") == search_key(
+        "&author=tolkien&title=the hobbit "
+    )
+    assert search_key("&title=The Hobbit") != search_key("&title=The Hobbit 2")
+    assert isbn_key("978-0-261-10221-7") == isbn_key("9780261102217")
+    assert len(search_key(f"&title={'a' * 500}")) <= 255
+
+
+def test_cached_response_fetches_once():
+    fetch = mock.Mock(return_value=[{"title": "The Hobbit"}])
+
+    assert cached_response("search:hobbit", fetch) == [{"title": "The Hobbit"}]
+    assert cached_response("search:hobbit", fetch) == [{"title": "The Hobbit"}]
+    assert fetch.call_count == 1
+    assert expires_in("search:hobbit") > OPEN_LIBRARY_CACHE_TTL - timedelta(minutes=1)
+
+    stats = get_cache_stats()
+    assert stats["search"] == {"hits": 1, "misses": 1}
+    assert stats["entries"] == 1
+
+
+def test_empty_and_error_responses_expire_sooner():
+    cached_response("search:nothing", lambda: [])
+    cached_response("search:broken", lambda: {"error": "Nope"})
+
+    assert expires_in("search:nothing") <= OPEN_LIBRARY_CACHE_EMPTY_TTL
+    assert expires_in("search:broken") <= OPEN_LIBRARY_CACHE_ERROR_TTL
+
+
+def test_expired_responses_are_fetched_again():
+    cached_response("search:hobbit", lambda: ["old"])
+    OpenLibraryResponse.objects.update(expires_at=timezone.now())
+
+    assert cached_response("search:hobbit", lambda: ["new"]) == ["new"]
+    assert OpenLibraryResponse.objects.get().value == ["new"]
+
+
+def test_cull():
+    for i in range(5):
+        cached_response(f"search:{i}", lambda: [i])
+    OpenLibraryResponse.objects.filter(key="search:0").update(expires_at=timezone.now())
+
+    cull(max_entries=3)
+
+    assert set(OpenLibraryResponse.objects.values_list("key", flat=True)) == {
+        "search:2",
+        "search:3",
+        "search:4",
+    }
+    call_command("open_library_cache_stats", "--cull", "--reset")
+    assert get_cache_stats()["search"] == {"hits": 0, "misses": 0}
+
+
+def test_open_library_lookups_are_cached(monkeypatch):
+    get = mock.Mock(
+        return_value=httpx.Response(
+            200,
+            json={"docs": [{"title": "the hobbit", "cover_i": 1}]},
+            request=httpx.Request("GET", "https://openlibrary.org/search.json"),
+        )
+    )
+    monkeypatch.setattr(http_helpers, "get", get)
+
+    first = search_open_library("&title=The Hobbit")
+    assert search_open_library("&title=the hobbit") == first
+    assert first[0]["title"] == "The Hobbit"
+    assert get.call_count == 1
+
+    get.side_effect = httpx.ConnectError("Nope")
+    assert resolve_isbns(["9780261102217"]) == {"9780261102217": None}
+    assert resolve_isbns(["9780261102217"]) == {"9780261102217": None}
+    assert get.call_count == 2
+    assert expires_in(isbn_key("9780261102217")) <= OPEN_LIBRARY_CACHE_ERROR_TTL
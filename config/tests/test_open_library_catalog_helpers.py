@@ -0,0 +1,152 @@
+import gzip
+import json
+import pytest
+from django.core.management import call_command
+from core.cover_helpers import search_open_library
+from core.open_library_catalog_helpers import (
+    build_catalog,
+    catalog_match,
+    search_catalog,
+)
+from core.open_library_helpers import resolve_books
+
+pytestmark = pytest.mark.django_db
+
+
+def dump_line(kind, key, record):
+    record = {"key": key, "type": {"key": kind}, **record}
+    return f"{kind}\t{key}\t1\t2024-01-01T00:00:00\t{json.dumps(record)}\n"
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    works = tmp_path / "ol_dump_works.txt.gz"
+    with gzip.open(works, "wt") as dump:
+        dump.write(
+            dump_line(
+                "/type/work",
+                "/works/OL27482W",
+                {
+                    "title": "The Hobbit",
+                    "authors": [{"author": {"key": "/authors/OL26320A"}}],
+                    "covers": [-1, 14627509],
+                    "first_publish_date": "1937",
+                },
+            )
+        )
+        dump.write(
+            dump_line(
+                "/type/work",
+                "/works/OL59851W",
+                {
+                    "title": "A Wizard of Earthsea",
+                    "authors": [{"author": {"key": "/authors/OL4392780A"}}],
+                },
+            )
+        )
+        dump.write(dump_line("/type/work", "/works/OL1W", {"title": "Left Out"}))
+
+    editions = tmp_path / "ol_dump_editions.txt"
+    editions.write_text(
+        "".join(
+            dump_line("/type/edition", key, record)
+            for key, record in [
+                (
+                    "/books/OL1M",
+                    {
+                        "works": [{"key": "/works/OL27482W"}],
+                        "number_of_pages": 310,
+                        "publish_date": "Sep 21, 1937",
+                        "covers": [14627509],
+                    },
+                ),
+                (
+                    "/books/OL2M",
+                    {"works": [{"key": "/works/OL27482W"}], "number_of_pages": 300},
+                ),
+                (
+                    "/books/OL3M",
+                    {
+                        "works": [{"key": "/works/OL59851W"}],
+                        "number_of_pages": 183,
+                        "publish_date": "1968",
+                        "covers": [123],
+                    },
+                ),
+                ("/books/OL4M", {"works": [{"key": "/works/OL1W"}]}),
+            ]
+        )
+    )
+
+    authors = tmp_path / "ol_dump_authors.txt"
+    authors.write_text(
+        dump_line("/type/author", "/authors/OL26320A", {"name": "J.R.R. Tolkien"})
+        + dump_line(
+            "/type/author", "/authors/OL4392780A", {"name": "Ursula K. Le Guin"}
+        )
+        + dump_line("/type/author", "/authors/OL9A", {"name": "Nobody Needed"})
+    )
+
+    return [str(authors), str(editions), str(works)]
+
+
+@pytest.fixture
+def catalog(dumps, tmp_path, settings):
+    settings.OPEN_LIBRARY_CATALOG = str(tmp_path / "catalog.sqlite3")
+    counts = build_catalog(dumps, limit=2)
+    return counts
+
+
+def test_build_catalog(catalog):
+    assert catalog == {"works": 2, "editions": 3, "authors": 2}
+    assert search_catalog("&title=left out") is None
+
+    assert search_catalog("&title=hobbit&author=tolkien") == [
+        {
+            "key": "/works/OL27482W",
+            "title": "The Hobbit",
+            "author_name": ["J.R.R. Tolkien"],
+            "first_publish_year": 1937,
+            "number_of_pages_median": 300,
+            "cover_i": 14627509,
+            "cover_edition_key": "OL1M",
+        }
+    ]
+
+
+def test_search_open_library_uses_the_catalog(catalog, open_library_standin):
+    results = search_open_library("&title=A Wizard of Earthsea&author=Le Guin")
+
+    assert results == [
+        {
+            "title": "A Wizard of Earthsea",
+            "authors": ["Ursula K. Le Guin"],
+            "published": 1968,
+            "olid": "OL3M",
+            "pages": 183,
+            "cover": f"{open_library_standin.url}/b/id/123-L.jpg",
+        }
+    ]
+    assert open_library_standin.requests == []
+
+    # Anything else still goes to Open Library.
+    assert search_open_library("&q=dune")[0]["title"] == "Dune"
+    hobbit, dune = resolve_books([("&title=The Hobbit", None), ("&title=Dune", None)])
+    assert hobbit["results"][0]["olid"] == "OL1M"
+    assert dune["results"][0]["title"] == "Dune"
+    assert len(open_library_standin.requests) == 2
+
+
+def test_catalog_match():
+    assert catalog_match("&title=The Hobbit&author=J.R.R. Tolkien") == (
+        'title : "The" AND title : "Hobbit" AND authors : "J" AND authors : "R" '
+        'AND authors : "R" AND authors : "Tolkien"'
+    )
+    assert catalog_match("&q=dune") == '"dune"'
+    assert catalog_match("&title=") is None
+
+
+def test_build_open_library_catalog_command(dumps, tmp_path):
+    output = tmp_path / "command.sqlite3"
+    call_command("build_open_library_catalog", *dumps, "--output", str(output))
+    assert output.exists()
@@ -0,0 +1,119 @@
+import asyncio
+import httpx
+import pytest
+from core import http_helpers, open_library_helpers
+from core.import_helpers import open_library_lookup
+from core.models import OpenLibraryResponse
+from core.open_library_helpers import resolve_books
+from core.open_library_cache_helpers import get_cache_stats, reset_cache_stats
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def open_library(monkeypatch):
+    """A fake Open Library that's slower to answer earlier requests."""
+    seen = {"requests": [], "active": 0, "most_active": 0}
+
+    async def handler(request):
+        seen["requests"].append(request)
+        seen["active"] += 1
+        seen["most_active"] = max(seen["most_active"], seen["active"])
+        await asyncio.sleep(0.05 / len(seen["requests"]))
+        seen["active"] -= 1
+
+        title = request.url.params["title"]
+        if title.startswith("Broken"):
+            return httpx.Response(500)
+        return httpx.Response(
+            200, json={"docs": [{"title": title, "cover_i": len(seen["requests"])}]}
+        )
+
+    monkeypatch.setattr(
+        http_helpers,
+        "make_async_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(http_helpers, "retry_wait", lambda *args: 0)
+    # ISBNs are looked up in bulk, see test_import_helpers.
+    monkeypatch.setattr(
+        open_library_helpers,
+        "resolve_isbns",
+        lambda isbns: {isbn: None if isbn == "0000" else 1937 for isbn in isbns},
+    )
+    reset_cache_stats()
+    return seen
+
+
+def test_resolve_books_in_order(open_library):
+    lookups = [(f"&title=Book {i}", None) for i in range(10)]
+    lookups += [("&title=Broken", "0000"), ("&title=The Hobbit", "9780261102217")]
+
+    resolved = resolve_books(lookups, concurrency=3, rate=0)
+
+    assert [book["results"][0]["title"] for book in resolved[:10]] == [
+        f"Book {i}" for i in range(10)
+    ]
+    assert "error" in resolved[10]["results"]
+    assert resolved[10]["published_year"] is None
+    assert resolved[11]["published_year"] == 1937
+    assert open_library["most_active"] == 3
+
+
+def test_resolve_books_uses_the_cache(open_library):
+    resolve_books([("&title=The Hobbit", "9780261102217")], rate=0)
+    sent = len(open_library["requests"])
+
+    resolved = resolve_books(
+        [("&title=the hobbit", "978-0261102217"), ("&title=The Hobbit", None)]
+    )
+
+    assert len(open_library["requests"]) == sent
+    assert resolved[0] == {
+        "results": resolved[1]["results"],
+        "published_year": 1937,
+    }
+    # Identical lookups in a batch are only looked up once.
+    assert get_cache_stats()["search"] == {"hits": 1, "misses": 1}
+
+
+def test_rate_limiter():
+    async def times(limiter):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def request(url):
+            await limiter.wait(url)
+            return loop.time() - started
+
+        return await asyncio.gather(
+            *[request("https://openlibrary.org/search.json") for _ in range(3)],
+            request("https://covers.openlibrary.org/b/id/1-L.jpg"),
+        )
+
+    *same_host, other_host = asyncio.run(times(http_helpers.RateLimiter(20)))
+
+    assert same_host[1] >= 0.045 and same_host[2] >= 0.095
+    assert other_host < 0.045
+
+
+def test_open_library_lookup():
+    assert open_library_lookup(
+        {"Title": "Dune", "Author": "Frank Herbert", "ISBN/UID": "9780441013593"}
+    ) == ("&title=Dune&author=Frank Herbert", "9780441013593")
+    assert open_library_lookup(
+        {"Title": "Dune", "Authors": "Frank Herbert, Someone", "Year Published": "1965"}
+    ) == ("&title=Dune&author=Frank Herbert", None)
+
+
+def test_resolve_books_stops_when_open_library_is_down(open_library, settings):
+    settings.OPEN_LIBRARY_BREAKER_THRESHOLD = 3
+    lookups = [(f"&title=Broken {i}", None) for i in range(10)]
+
+    resolved = resolve_books(lookups, concurrency=1, rate=0)
+
+    # Three tries for the first, which open the breaker, then the rest fail fast.
+    assert len(open_library["requests"]) == 3
+    assert all("error" in book["results"] for book in resolved)
+    assert http_helpers.open_library_breaker().state == "open"
+    assert OpenLibraryResponse.objects.count() == 1
@@ -0,0 +1,91 @@
+import time
+import pytest
+from django.core.cache import cache
+from core import http_helpers
+from model_bakery import baker
+from core.bulk_import_helpers import import_rows
+from core.cover_helpers import search_open_library
+from core.import_helpers import resolve_isbns
+from core.models import Book, OpenLibraryResponse, User
+from core.open_library_helpers import resolve_books
+
+pytestmark = pytest.mark.django_db
+
+
+def test_search_open_library(open_library_standin):
+    results = search_open_library("&title=The Hobbit&author=J.R.R. Tolkien")
+
+    assert len(results) == 10
+    assert results[0]["title"] == "The Hobbit"
+    assert results[0]["published"] == 1937
+    assert results[0]["cover"].startswith(open_library_standin.url)
+
+    made_up = search_open_library("&title=Nothing Like It&author=Nobody")
+    assert made_up[0]["title"] == "Nothing Like It"
+    assert made_up[0]["authors"] == ["Nobody"]
+    assert made_up == search_open_library("&title=Nothing Like It&author=Nobody")
+    assert len(open_library_standin.requests) == 2
+
+
+def test_resolve_isbns(open_library_standin):
+    years = resolve_isbns(["9780261102217", "9780000000002"])
+    assert years["9780261102217"] == 1937
+    assert 1900 <= years["9780000000002"] < 2025
+
+
+def test_import_rows(open_library_standin, django_capture_on_commit_callbacks):
+    user = baker.make(User)
+    row = {
+        "Title": "The Hobbit",
+        "Author": "J.R.R. Tolkien",
+        "ISBN/UID": "9780261102217",
+        "Exclusive Shelf": "to-read",
+    }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert import_rows([row], user)["created"] == 1
+
+    book = Book.objects.get(user=user)
+    assert book.published_year == 1937
+    assert book.olid == "OL51711263M"
+    assert book.covers.get().image.width == 300
+    assert not book.awaiting_cover
+    assert [path.split("?")[0] for path in open_library_standin.requests] == [
+        "/api/books",
+        "/search.json",
+        "/b/id/14627509-L.jpg",
+    ]
+
+
+def test_errors_and_latency_are_repeatable(open_library_standin, settings):
+    settings.HTTP_RETRIES = 0
+    settings.OPEN_LIBRARY_BREAKER_THRESHOLD = 100
+    lookups = [(f"&title=Book {i}", None) for i in range(20)]
+
+    def failures():
+        open_library_standin.configure(error_rate=0.3, jitter=0.01, seed=5)
+        resolved = resolve_books(lookups, rate=0)
+        return [i for i, book in enumerate(resolved) if "error" in book["results"]]
+
+    first = failures()
+    # Cached answers aren't fetched again, so start over.
+    OpenLibraryResponse.objects.all().delete()
+
+    assert first and len(first) < len(lookups)
+    assert failures() == first
+
+
+def test_half_open_breaker_sends_one_probe(open_library_standin, settings):
+    settings.OPEN_LIBRARY_BREAKER_COOLDOWN = 30
+    breaker = http_helpers.open_library_breaker()
+    cache.set_many(
+        {breaker.failures_key: 5, breaker.opened_key: time.time() - 31},
+        timeout=None,
+    )
+    open_library_standin.configure(error_rate=1)
+
+    resolved = resolve_books([(f"&title=Book {i}", None) for i in range(10)])
+
+    assert len(open_library_standin.requests) == 1
+    assert all("error" in book["results"] for book in resolved)
+    assert http_helpers.open_library_breaker().state == "open"
@@ -0,0 +1,15 @@
+import datetime
+from core.pagination_helpers import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    timestamp = datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.UTC)
+    cursor = encode_cursor([timestamp, None, 42])
+
+    assert decode_cursor(cursor) == [timestamp.isoformat(), None, 42]
+
+
+def test_bogus_cursor():
+    assert decode_cursor("") is None
+    assert decode_cursor("not a cursor") is None
+    assert decode_cursor(encode_cursor({"not": "a list"})) is None
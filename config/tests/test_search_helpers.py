@@ -0,0 +1,110 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from core.models import Author, Book, BookNote, BookReading, Series, User
+from core.search_helpers import match_expression, search_library
+
+
+def search_books(user, query):
+    return search_library(Book.objects.filter(user=user), user, query, fuzzy=False)
+
+
+def test_match_expression():
+    assert match_expression("the hobb") == '"the" "hobb"*'
+    assert match_expression('"); DROP') == '"DROP"*'
+    assert match_expression("  ") is None
+
+
+@pytest.mark.django_db
+def test_search_books_by_title_author_and_notes():
+    user = baker.make(User)
+    hobbit = baker.make(Book, user=user, title="The Hobbit")
+    tolkien = baker.make(Author, user=user, name="J.R.R. Tolkien")
+    hobbit.author.add(tolkien)
+    dune = baker.make(Book, user=user, title="Dune")
+    baker.make(BookNote, book=dune, text="Reminds me of the hobbit somehow")
+    baker.make(Book, title="The Hobbit")  # Someone else's
+
+    # Matching titles rank above matching notes
+    assert search_books(user, "hobbit") == [hobbit, dune]
+    assert search_books(user, "hob") == [hobbit, dune]
+    assert search_books(user, "tolk") == [hobbit]
+    assert search_library(Author.objects.all(), user, "tolkien") == [tolkien]
+
+
+@pytest.mark.django_db
+def test_search_filters_before_the_limit():
+    user = baker.make(User)
+    for i in range(5):
+        baker.make(Book, user=user, title=f"Dune {i}", archived=True)
+        baker.make(Book, user=user, title=f"Dust {i}", archived=True)
+    dune = baker.make(Book, user=user, title="Dune Messiah", status="backlog")
+    dusk = baker.make(Book, user=user, title="Dusk", status="backlog")
+    books = Book.objects.filter(user=user, archived=False)
+
+    assert search_library(books, user, "dune", limit=2, fuzzy=False) == [dune]
+    assert search_library(books, user, "dusr", limit=2) == [dusk]
+
+
+@pytest.mark.django_db
+def test_search_index_follows_changes():
+    user = baker.make(User)
+    book = baker.make(Book, user=user, title="Dune", status="backlog")
+    author = baker.make(Author, user=user, name="Frank Herbert")
+    book.author.add(author)
+    series = baker.make(Series, user=user, title="Dune Chronicles")
+
+    author.name = "F. Herbert"
+    author.save()
+    assert search_books(user, "frank") == []
+    assert search_books(user, "herbert") == [book]
+
+    baker.make(
+        BookReading, book=book, start_date="2024-01-01", review="Spice must flow"
+    )
+    assert search_books(user, "spice") == [book]
+
+    author.delete()
+    assert search_books(user, "herbert") == []
+
+    assert search_library(Series.objects.all(), user, "chronicles") == [series]
+    series.delete()
+    assert search_library(Series.objects.all(), user, "chronicles") == []
+
+    book.title = "Children of Dune"
+    book.save()
+    assert search_books(user, "children") == [book]
+    book.delete()
+    assert search_books(user, "dune") == []
+
+
+@pytest.mark.django_db
+def test_book_save_fetches_the_book_once():
+    book = baker.make(Book, title="Dune", status="backlog")
+    book.title = "Dune Messiah"
+    book.status = "reading"
+
+    with CaptureQueriesContext(connection) as queries:
+        book.save()
+
+    book_selects = [
+        query
+        for query in queries
+        if query["sql"].startswith("SELECT") and 'FROM "core_book" ' in query["sql"]
+    ]
+    assert len(book_selects) == 1
+    assert search_books(book.user, "messiah") == [book]
+    assert book.status_changes.get().old_status == "backlog"
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index():
+    user = baker.make(User)
+    book = baker.make(Book, user=user, title="Dune")
+    Book.objects.filter(pk=book.pk).update(title="Emma")
+
+    assert search_books(user, "emma") == []
+    call_command("rebuild_search_index")
+    assert search_books(user, "emma") == [book]
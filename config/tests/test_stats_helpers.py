@@ -0,0 +1,105 @@
+import pytest
+from django.core.management import call_command
+from model_bakery import baker
+from core.models import (
+    Author,
+    Book,
+    BookGenre,
+    BookLocation,
+    BookType,
+    LibraryStat,
+    User,
+)
+from core.taxonomy_helpers import get_taxonomies
+from core.stats_helpers import get_library_counts, rebuild_library_stats
+
+
+@pytest.fixture
+def library():
+    user = baker.make(User)
+    type1 = baker.make(BookType, slug="type1")
+    type2 = baker.make(BookType, slug="type2", parent=type1)
+    genre1 = baker.make(BookGenre, slug="genre1")
+    genre2 = baker.make(BookGenre, slug="genre2", parent=genre1)
+    location1 = baker.make(BookLocation, slug="location1")
+
+    book1 = baker.make(Book, user=user, type=type2, status="backlog")
+    book1.genre.add(genre1, genre2)
+    book1.location.add(location1)
+    book2 = baker.make(Book, user=user, type=type1, status="backlog")
+    book2.genre.add(genre2)
+
+    return user, book1, book2, genre1, location1
+
+
+@pytest.mark.django_db
+def test_library_counts(library):
+    user, book1, book2, genre1, location1 = library
+    status_counts, filter_counts = get_library_counts(user, "backlog", get_taxonomies())
+
+    assert status_counts == {"backlog": 2}
+    assert filter_counts["type"] == {"type1": {"count": 2, "sub_items": {"type2": 1}}}
+    assert filter_counts["genre"] == {
+        "genre1": {"count": 2, "sub_items": {"genre2": 2}}
+    }
+    assert filter_counts["location"] == {"location1": 1}
+
+
+@pytest.mark.django_db
+def test_library_counts_follow_changes(library):
+    user, book1, book2, genre1, location1 = library
+
+    book1.status = "reading"
+    book1.save()
+    book2.genre.remove(*book2.genre.all())
+    location1.books.add(book2)
+    book2.archived = True
+    book2.save()
+    baker.make(Book, user=user, status="reading").delete()
+
+    status_counts, filter_counts = get_library_counts(user, "reading", get_taxonomies())
+
+    assert status_counts == {"reading": 1}
+    assert filter_counts["genre"]["genre1"]["count"] == 1
+    assert filter_counts["location"] == {"location1": 1}
+    assert rebuild_library_stats(user, check=True) == {}
+
+
+@pytest.mark.django_db
+def test_library_counts_single_query(library, django_assert_num_queries):
+    user = library[0]
+    facets = get_taxonomies()
+
+    with django_assert_num_queries(1):
+        get_library_counts(user, "backlog", facets)
+
+
+@pytest.mark.django_db
+def test_rebuild_library_stats(library):
+    user, book1, book2, genre1, location1 = library
+    LibraryStat.objects.filter(user=user, facet="status").update(count=5)
+
+    assert rebuild_library_stats(user) == {("backlog", "status", ""): (5, 2)}
+    assert rebuild_library_stats(user, check=True) == {}
+
+    call_command("rebuild_library_stats", "--check")
+
+
+@pytest.mark.django_db
+def test_library_counts_follow_taxonomy_changes(library):
+    user, book1, book2, genre1, location1 = library
+    author = baker.make(Author, user=user)
+    book1.author.add(author)
+
+    type2 = BookType.objects.get(slug="type2")
+    type2.parent = None
+    type2.save()
+    genre1.slug = "genre-one"
+    genre1.save()
+    assert rebuild_library_stats(user, check=True) == {}
+
+    BookType.objects.get(slug="type1").delete()
+    BookGenre.objects.get(slug="genre2").delete()
+    location1.delete()
+    author.delete()
+    assert rebuild_library_stats(user, check=True) == {}
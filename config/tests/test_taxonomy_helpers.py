@@ -0,0 +1,69 @@
+import pytest
+from model_bakery import baker
+from core.models import BookGenre, BookType
+from core.taxonomy_helpers import get_taxonomy
+from core.templatetags.filter_matches_any import filter_matches_any
+
+
+@pytest.fixture
+def genres():
+    fiction = baker.make(BookGenre, slug="fiction", name="Fiction")
+    fantasy = baker.make(BookGenre, slug="fantasy", name="Fantasy", parent=fiction)
+    poetry = baker.make(BookGenre, slug="poetry", name="Poetry")
+    return fiction, fantasy, poetry
+
+
+@pytest.mark.django_db
+def test_taxonomy(genres):
+    fiction, fantasy, poetry = genres
+    taxonomy = get_taxonomy("genre")
+
+    assert taxonomy.get("fantasy") == fantasy
+    assert taxonomy.ids_by_slug["poetry"] == poetry.pk
+    assert taxonomy.family_ids("fiction") == [fiction.pk, fantasy.pk]
+    assert taxonomy.family_ids("fantasy") == [fantasy.pk]
+    assert taxonomy.children[fiction.pk] == (fantasy,)
+    assert taxonomy.get("fiction").has_children is True
+    assert taxonomy.get("poetry").has_children is False
+
+
+@pytest.mark.django_db
+def test_taxonomy_is_loaded_once(genres, django_assert_num_queries):
+    get_taxonomy("genre")
+
+    with django_assert_num_queries(0):
+        taxonomy = get_taxonomy("genre")
+        # Parents are already there too
+        assert taxonomy.get("fantasy").parent.slug == "fiction"
+
+
+@pytest.mark.django_db
+def test_taxonomy_is_reloaded_after_changes(genres):
+    assert get_taxonomy("genre").get("drama") is None
+
+    baker.make(BookGenre, slug="drama")
+    assert get_taxonomy("genre").get("drama") is not None
+
+    BookGenre.objects.get(slug="drama").delete()
+    assert get_taxonomy("genre").get("drama") is None
+
+
+@pytest.mark.django_db
+def test_filter_matches_any(genres, django_assert_num_queries):
+    fiction, fantasy, poetry = genres
+    get_taxonomy("genre")
+
+    with django_assert_num_queries(0):
+        assert filter_matches_any(fiction, "genre", {"genre": "fiction"})
+        assert filter_matches_any(fiction, "genre", {"genre": "fantasy"})
+        assert not filter_matches_any(poetry, "genre", {"genre": "fantasy"})
+        assert not filter_matches_any(fiction, "genre", {"genre": "all"})
+
+
+@pytest.mark.django_db
+def test_grouped_types():
+    textual = baker.make(BookType, slug="textual", name="Textual")
+    comic = baker.make(BookType, slug="comic", name="Comic", parent=textual)
+    audio = baker.make(BookType, slug="audio", name="Audio")
+
+    assert get_taxonomy("type").grouped() == [audio, textual, comic]
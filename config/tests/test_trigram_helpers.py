@@ -0,0 +1,72 @@
+import pytest
+from model_bakery import baker
+from core.models import Author, Book, User
+from core.search_helpers import search_library
+from core.trigram_helpers import TrigramIndex, get_trigram_index
+
+
+def test_trigram_index_finds_misspellings():
+    index = TrigramIndex(
+        {
+            1: "The Hobbit",
+            2: "The Hobbit: There and Back Again",
+            3: "The Left Hand of Darkness",
+            4: "Hobbies for Everyone",
+        }
+    )
+
+    assert index.search("hobit") == [1, 2]
+    assert index.search("the hobbit there") == [2, 1]
+    assert index.search("darknes left") == [3]
+    assert index.search("zzz") == []
+    assert index.search("") == []
+
+
+@pytest.mark.django_db
+def test_trigram_index_follows_library_changes():
+    user = baker.make(User)
+    book = baker.make(Book, user=user, title="The Hobbit")
+    index = get_trigram_index(user, Book)
+
+    assert get_trigram_index(user, Book) is index
+    assert index.search("hobit") == [book.pk]
+
+    book.status = "reading"
+    book.save()
+    assert get_trigram_index(user, Book) is index
+
+    book.title = "Dune"
+    book.save()
+    assert get_trigram_index(user, Book).search("dunne") == [book.pk]
+
+    author = baker.make(Author, user=user, name="Ursula K. Le Guin")
+    assert get_trigram_index(user, Author).search("ursla") == [author.pk]
+
+
+@pytest.mark.django_db
+def test_search_library_adds_near_misses():
+    user = baker.make(User)
+    hobbit = baker.make(Book, user=user, title="The Hobbit")
+    hobbies = baker.make(Book, user=user, title="Hobbit Hobbies")
+
+    assert search_library(Book.objects.all(), user, "hobbit") == [hobbit, hobbies]
+    assert search_library(Book.objects.all(), user, "hobit") == [hobbit, hobbies]
+    assert search_library(Book.objects.all(), user, "hobit", fuzzy=False) == []
+
+
+def test_trigram_index_completes_prefixes():
+    index = TrigramIndex(
+        {
+            1: "The Hobbit: There and Back Again",
+            2: "The Hobbit",
+            3: "Hobbits of the Shire",
+            4: "Dune",
+        }
+    )
+
+    assert index.complete("hob") == [3, 2, 1]
+    assert index.complete("the hob") == [2, 1, 3]
+    assert index.complete("the hobbit th") == [2, 1]
+    assert index.complete("shire hobb") == [3]
+    assert index.complete("du", limit=1) == [4]
+    assert index.complete("x") == []
@@ -30,6 +30,11 @@ urlpatterns = [
     # ------------
     path("import", views.import_books, name="import_books"),
     path("imports", views.imports, name="imports"),
+    path(
+        "imports/<int:pk>/progress",
+        views.import_job_progress,
+        name="import_job_progress",
+    ),
     # Changelog
     # ---------
     path("changelog", views.changelog, name="changelog"),
@@ -41,6 +46,7 @@ urlpatterns = [
     path("book/<int:pk>", views.book_detail, name="book_detail"),  # R
     path("book/<int:pk>/update", views.book_update, name="book_update"),  # U
     path("book/<int:pk>/delete", views.book_delete, name="book_delete"),  # D
+    path("book/<int:pk>/status", views.book_status, name="book_status"),
     path("book/<int:pk>/archive", views.book_archive, name="book_archive"),
     path("book/<int:pk>/unarchive", views.book_unarchive, name="book_unarchive"),
     # Book Series
@@ -55,6 +61,7 @@ urlpatterns = [
     # Book Search
     # -----------
     path("search", views.search, name="search"),
+    path("search/typeahead", views.typeahead, name="typeahead"),
     path("ol", views.open_library_search, name="open_library_search"),
     # Authors
     # -------
@@ -18,7 +18,12 @@ from .models import (
     BookLocation,
     Changelog,
     Series,
+    LibraryStat,
+    OpenLibraryResponse,
+    ImportJob,
 )
+from .stats_helpers import rebuild_library_stats
+from .trigram_helpers import forget_trigram_index
 
 
 @admin.register(User)
@@ -97,10 +102,21 @@ class BookAdmin(OrderedInlineModelAdminMixin, admin.ModelAdmin):
     actions = ["archive_books", "unarchive_books"]
 
     def archive_books(self, request, queryset):
-        queryset.update(archived=True)
+        self.set_archived(queryset, True)
 
     def unarchive_books(self, request, queryset):
-        queryset.update(archived=False)
+        self.set_archived(queryset, False)
+
+    def set_archived(self, queryset, archived):
+        # Found first, the queryset may be filtered on `archived`.
+        users = list(User.objects.filter(books__in=queryset).distinct())
+        queryset.update(archived=archived)
+
+        # `update()` skips `Book.save()`, so recount the cached counts and
+        # have search suggestions (and typeahead) pick up the change.
+        for user in users:
+            rebuild_library_stats(user)
+            forget_trigram_index(user.pk)
 
     def authors_list(self, obj):
         return ", ".join([author.name for author in obj.author.all()])
@@ -198,3 +214,32 @@ class ChangelogAdmin(admin.ModelAdmin):
 admin.site.unregister(Group)
 admin.site.register(BookReading)
 admin.site.register(BookNote)
+
+
+@admin.register(LibraryStat)
+class LibraryStatAdmin(admin.ModelAdmin):
+    list_display = ("user", "status", "facet", "slug", "count")
+    list_filter = ("user", "facet")
+
+
+@admin.register(OpenLibraryResponse)
+class OpenLibraryResponseAdmin(admin.ModelAdmin):
+    list_display = ("key", "expires_at", "created_at")
+    search_fields = ("key",)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "source",
+        "status",
+        "processed_rows",
+        "total_rows",
+        "created_books",
+        "open_library_requests",
+        "created_at",
+    )
+    list_filter = ("status", "source")
+    search_fields = ("user__email",)
+    readonly_fields = ("started_at", "finished_at", "created_at", "updated_at")
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Connect the signals that keep the taxonomy cache, search index and
+        # library stats fresh.
+        from . import search_helpers, stats_helpers, taxonomy_helpers  # noqa: F401
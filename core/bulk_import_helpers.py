@@ -0,0 +1,231 @@
+import csv
+from collections import Counter
+from functools import partial
+from django.db import transaction
+from .cover_tasks import COVER_BATCH_SIZE, find_import_covers
+from .models import Author, Book, BookNote, BookReading, ImportRow, LibraryStat
+from .import_helpers import (
+    open_library_lookup,
+    publication_year,
+    row_authors,
+    row_fingerprint,
+    row_published_year,
+    row_reading,
+    row_status,
+)
+from .search_helpers import index
+from .trigram_helpers import forget_trigram_index
+from .utils import chunks
+
+# Rows are imported this many at a time, with a handful of queries each.
+IMPORT_CHUNK_SIZE = 250
+
+
+def csv_rows(file, offset=0):
+    """
+    `(row, offset)` for each row of a CSV `file` opened in binary mode, as a
+    dict keyed by the header. `offset` is where the next row starts in the
+    file, so reading can pick up from there later without starting over.
+    The file is read a line at a time, however big it is.
+    """
+    position = 0
+
+    def lines():
+        nonlocal position
+        # Not `for line in file`, Django's `File` goes back to the start for that.
+        for line in iter(file.readline, b""):
+            position += len(line)
+            yield line.decode("utf-8-sig", errors="replace")
+
+    file.seek(0)
+    source = lines()
+    header = next(csv.reader(source), None)
+    if not header:
+        return
+
+    if offset:
+        file.seek(offset)
+        position = offset
+        source = lines()
+
+    # `csv.reader` only takes as many lines as each row needs.
+    for values in csv.reader(source):
+        if values:
+            yield dict(zip(header, values)), position
+
+
+def import_rows(
+    rows, user, open_library=True, chunk_size=IMPORT_CHUNK_SIZE, import_job=None
+):
+    """
+    Add the books in Goodreads or The StoryGraph CSV `rows` to `user`'s
+    library, with their authors, readings and reviews. Books already in the
+    library (or earlier in `rows`) are skipped, titles matched ignoring case.
+
+    Rows go in `chunk_size` at a time, each chunk with a few bulk inserts
+    rather than dozens of queries a row. With `open_library`, the books are
+    looked up on Open Library for IDs, years and covers afterwards, on the
+    covers queue, so an import never waits on it.
+
+    With an `import_job`, new books are linked to it and every row is kept
+    as an `ImportRow`, in the same transaction as its chunk. Rows `user` has
+    imported before, in this job or any other, are skipped straight away
+    (unless they failed last time).
+
+    Returns how many rows were "created", "skipped" or "failed".
+    """
+    titles = {title.lower() for title in user.books.values_list("title", flat=True)}
+    counts = Counter(created=0, skipped=0, failed=0)
+
+    for chunk in chunks(list(rows), chunk_size):
+        fingerprints = [row_fingerprint(row) for row in chunk]
+        seen = (
+            set(
+                ImportRow.objects.filter(user=user, fingerprint__in=fingerprints)
+                .exclude(status="failed")
+                .values_list("fingerprint", flat=True)
+            )
+            if import_job
+            else set()
+        )
+
+        statuses = []
+        new_rows = []
+        for row, fingerprint in zip(chunk, fingerprints):
+            title = (row.get("Title") or "").strip()
+            if fingerprint in seen:
+                statuses.append("skipped")
+            elif not title:
+                statuses.append("failed")
+            elif title.lower() in titles:
+                statuses.append("skipped")
+            else:
+                titles.add(title.lower())
+                new_rows.append({**row, "Title": title})
+                statuses.append("created")
+        counts.update(statuses)
+
+        with transaction.atomic():
+            books = iter(
+                import_chunk(new_rows, user, open_library, import_job)
+                if new_rows
+                else []
+            )
+            if import_job:
+                ImportRow.objects.bulk_create(
+                    [
+                        ImportRow(
+                            import_job=import_job,
+                            user=user,
+                            fingerprint=fingerprint,
+                            status=status,
+                            book=next(books) if status == "created" else None,
+                        )
+                        for fingerprint, status in zip(fingerprints, statuses)
+                    ]
+                )
+
+    return counts
+
+
+def import_chunk(rows, user, open_library=True, import_job=None):
+    """Import rows that are all new books to `user`, returning the books."""
+    lookups = [
+        open_library_lookup(row) if open_library else (None, None) for row in rows
+    ]
+
+    with transaction.atomic():
+        author_names = [row_authors(row) for row in rows]
+        authors, new_authors = get_or_create_authors(
+            user, {name for names in author_names for name in names}
+        )
+
+        books = []
+        readings = []
+        for row, lookup in zip(rows, lookups):
+            status = row_status(row)
+            reading = row_reading(row, status)
+
+            book = Book(
+                user=user,
+                title=row["Title"],
+                status=status,
+                published_year=publication_year(row_published_year(row)),
+                imported=True,
+                import_job=import_job,
+                awaiting_cover=any(lookup),
+                # Usually kept up to date by `BookReading`'s signals.
+                latest_reading_start=reading and reading["start_date"],
+                latest_reading_end=reading and reading["end_date"],
+                latest_finished_end=(
+                    reading["end_date"] if reading and reading["finished"] else None
+                ),
+                latest_unfinished_end=(
+                    reading["end_date"] if reading and not reading["finished"] else None
+                ),
+            )
+            books.append(book)
+            readings.append(reading)
+
+        # `bulk_create` sends no signals, the search index and stats are
+        # updated below instead.
+        Book.objects.bulk_create(books)
+
+        Book.author.through.objects.bulk_create(
+            [
+                Book.author.through(book_id=book.pk, author_id=authors[name].pk)
+                for book, names in zip(books, author_names)
+                for name in names
+            ]
+        )
+        BookReading.objects.bulk_create(
+            [
+                BookReading(book=book, **reading)
+                for book, reading in zip(books, readings)
+                if reading
+            ]
+        )
+        BookNote.objects.bulk_create(
+            [
+                BookNote(book=book, text=row["My Review"])
+                for book, row in zip(books, rows)
+                if row.get("My Review")
+            ]
+        )
+
+        stats = Counter()
+        for book, names in zip(books, author_names):
+            stats[(book.status, "status", "")] += 1
+            for name in names:
+                stats[(book.status, "author", str(authors[name].pk))] += 1
+        LibraryStat.add(user.pk, stats)
+
+        index(Book, [book.pk for book in books])
+        index(Author, [author.pk for author in new_authors])
+
+    # Once everything's saved, the covers can take as long as they need.
+    transaction.on_commit(partial(forget_trigram_index, user.pk))
+    awaiting = [
+        (book.pk, *lookup) for book, lookup in zip(books, lookups) if any(lookup)
+    ]
+    for batch in chunks(awaiting, COVER_BATCH_SIZE):
+        transaction.on_commit(
+            partial(find_import_covers, batch, import_job and import_job.pk)
+        )
+
+    return books
+
+
+def get_or_create_authors(user, names):
+    """
+    `({name: Author}, [new authors])` for `names`, adding the authors `user`
+    doesn't have yet.
+    """
+    authors = {
+        author.name: author
+        for author in Author.objects.filter(user=user, name__in=names)
+    }
+    new_authors = Author.objects.bulk_create(
+        [Author(user=user, name=name) for name in sorted(names - authors.keys())]
+    )
+    return authors | {author.name: author for author in new_authors}, new_authors
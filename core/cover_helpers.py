@@ -1,39 +1,86 @@
 import httpx
+from django.conf import settings
 from titlecase import titlecase
+from . import http_helpers
+from .open_library_cache_helpers import cached_response, search_key
+from .open_library_catalog_helpers import search_catalog
 
 
 def search_open_library(query):
+    """
+    Search the local Open Library catalog, if there is one, then Open Library
+    itself (or the answer from a recent identical search).
+    """
+    if docs := search_catalog(query):
+        return open_library_results({"docs": docs})
+
+    try:
+        return cached_response(
+            search_key(query), lambda: fetch_open_library_search(query)
+        )
+    except http_helpers.CircuitOpenError as exc:
+        # Not worth caching, Open Library could be back any moment.
+        return open_library_search_error(exc)
+
+
+def open_library_search_url(query):
     querystring = (
         f"?limit=10&fields=cover_i,cover_edition_key,title,author_name,"  # noqa: E231
         f"number_of_pages_median,first_publish_year,key{query}"  # noqa: E231
     )
+    return f"{settings.OPEN_LIBRARY_URL}/search.json{querystring}"
+
+
+def open_library_search_error(exc):
+    return {
+        "error": (
+            "Open Library is having issues. Please try again later or add your book manually. "
+            f"We got the following error: “{exc}”"
+        )
+    }
+
 
+def fetch_open_library_search(query):
     try:
-        response = httpx.get(
-            f"https://openlibrary.org/search.json{querystring}"  # noqa: E231
+        response = http_helpers.get(
+            open_library_search_url(query),
+            retries=0,
+            timeout=http_helpers.INTERACTIVE_TIMEOUT,
         )
         response.raise_for_status()
+    except http_helpers.CircuitOpenError:
+        raise
     except httpx.HTTPError as exc:
-        return {
-            "error": (
-                "Open Library is having issues. Please try again later or add your book manually. "
-                f"We got the following error: “{exc}”"
-            )
-        }
+        return open_library_search_error(exc)
 
-    found = []
+    return parse_open_library_search(response)
+
+
+def parse_open_library_search(response):
+    """Our search results from an Open Library `search.json` response."""
     if response.content and "application/json" in response.headers["Content-Type"]:
         data = response.json()
     else:
         print("Empty response received")
         data = None
 
+    return open_library_results(data)
+
+
+def open_library_results(data):
+    """
+    The results with covers from a `search.json` payload (a list), or the
+    first result if none have one (a dict).
+    """
+    found = []
     try:
         for doc in data["docs"]:
             if "cover_i" in doc:
-                cover_image = f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-L.jpg"  # noqa: E231
+                cover_image = (
+                    f"{settings.OPEN_LIBRARY_COVERS_URL}/b/id/{doc['cover_i']}-L.jpg"
+                )
             elif "cover_edition_key" in doc:
-                cover_image = f"https://covers.openlibrary.org/b/olid/{doc['cover_edition_key']}-L.jpg"  # noqa: E231
+                cover_image = f"{settings.OPEN_LIBRARY_COVERS_URL}/b/olid/{doc['cover_edition_key']}-L.jpg"
             else:
                 cover_image = None
 
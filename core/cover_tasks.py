@@ -0,0 +1,66 @@
+import os
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils import timezone
+from .models import Book, BookCover, ImportJob
+from .http_helpers import count_requests
+from .open_library_helpers import download_covers, resolve_books
+from .queues import cover_task
+
+# Imported books are looked up this many to a task, so the covers queue's
+# workers share out a big import between them.
+COVER_BATCH_SIZE = 25
+
+
+def first_result(results):
+    """The Open Library result to take a book's ID and cover from."""
+    if isinstance(results, dict):
+        # If there's only one result (or an error), it's a dict
+        return results
+    # Get the first one and hope for the best
+    return results[0] if results else {}
+
+
+@cover_task()
+def find_import_covers(lookups, import_job_id=None):
+    """
+    Look imported books up on Open Library and download their covers, once
+    the import has saved them. `lookups` is a list of `(book ID, query, isbn)`
+    like `open_library_lookup`'s. IDs and years the import didn't have are
+    filled in. Open Library requests are added to the `ImportJob`'s count.
+    """
+    books = Book.objects.in_bulk([book_id for book_id, _, _ in lookups])
+
+    try:
+        with count_requests() as requests:
+            resolved = resolve_books([(query, isbn) for _, query, isbn in lookups])
+
+            urls = {}
+            for (book_id, _, _), lookup in zip(lookups, resolved):
+                if book := books.get(book_id):
+                    result = first_result(lookup["results"])
+                    book.olid = book.olid or result.get("olid") or ""
+                    book.published_year = (
+                        book.published_year or lookup["published_year"]
+                    )
+                    if result.get("cover"):
+                        urls[book] = result["cover"]
+            Book.objects.bulk_update(books.values(), ["olid", "published_year"])
+
+            images = download_covers(set(urls.values()))
+
+        for book, url in urls.items():
+            if image := images.get(url):
+                # Kept at the size it was downloaded, only the thumbnail's made.
+                cover = BookCover.objects.create(book=book)
+                cover.image.save(os.path.basename(url)[:100], ContentFile(image))
+    finally:
+        # A new `updated_at` so cached list items lose their placeholder.
+        Book.objects.filter(pk__in=books).update(
+            awaiting_cover=False, updated_at=timezone.now()
+        )
+
+    if import_job_id:
+        ImportJob.objects.filter(pk=import_job_id).update(
+            open_library_requests=F("open_library_requests") + requests["open_library"]
+        )
@@ -13,16 +13,25 @@ class GroupedModelChoiceIterator(ModelChoiceIterator):
     def __iter__(self):
         if self.field.empty_label is not None:
             yield ("", self.field.empty_label)
-        queryset = self.queryset
-        # Can't use iterator() when queryset uses prefetch_related()
-        if not queryset._prefetch_related_lookups:
-            queryset = queryset.iterator()
+        if self.field.objects is not None:
+            queryset = self.field.objects
+        else:
+            queryset = self.queryset
+            # Can't use iterator() when queryset uses prefetch_related()
+            if not queryset._prefetch_related_lookups:
+                queryset = queryset.iterator()
         for group, objs in groupby(queryset, self.groupby):
             yield (group, [self.choice(obj) for obj in objs])
 
 
 class GroupedModelChoiceField(ModelChoiceField):
-    def __init__(self, *args, choices_groupby, **kwargs):
+    """
+    Pass already loaded `objects` (in `queryset` order) to build the choices
+    from them instead of querying. `queryset` is still used for validation.
+    """
+
+    def __init__(self, *args, choices_groupby, objects=None, **kwargs):
+        self.objects = objects
         if isinstance(choices_groupby, str):
             choices_groupby = attrgetter(choices_groupby)
         elif not callable(choices_groupby):
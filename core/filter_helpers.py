@@ -1,51 +1,119 @@
-def calculate_unique_child_counts(parent, items, queryset, field_name, child_counts):
-    if field_name == "genre":
-        unique_books = set()
+from django.db.models import Count
+from django.db.models.functions import Coalesce
+from .models import Book
 
-        for child in items:
-            if child.parent == parent:
-                related_books = queryset.filter(genre__slug=child.slug)
-                unique_books.update({book.id for book in related_books})
 
-        return len(unique_books)
+def count_by_item(queryset, field_name):
+    """Return `{item_pk: book_count}` for a filter field in a single grouped query."""
+    book_ids = queryset.order_by().values("pk")
+    field = Book._meta.get_field(field_name)
+
+    if field.many_to_many:
+        # Group the through table rows rather than joining back to `Book`.
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        rows = (
+            through.objects.filter(**{f"{source}__in": book_ids})
+            .values(target)
+            .annotate(count=Count(source, distinct=True))
+            .values_list(target, "count")
+        )
     else:
-        return sum(
-            child_counts[child.slug] for child in items if child.parent == parent
+        rows = (
+            Book.objects.filter(pk__in=book_ids, **{f"{field_name}__isnull": False})
+            .values(field_name)
+            .annotate(count=Count("pk"))
+            .values_list(field_name, "count")
         )
 
+    return dict(rows)
+
+
+def count_by_parent(queryset, field_name):
+    """
+    Return `{parent_pk: unique_book_count}` for a many-to-many filter field,
+    counting a book once even if it has both a parent and one of its children.
+    """
+    book_ids = queryset.order_by().values("pk")
+    field = Book._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+
+    return dict(
+        through.objects.filter(**{f"{source}__in": book_ids})
+        .annotate(root=Coalesce(f"{target}__parent", target))
+        .values("root")
+        .annotate(count=Count(source, distinct=True))
+        .values_list("root", "count")
+    )
+
 
 def get_filter_counts(queryset, items, field_name):
+    items = list(items)
+
     if not items:
         return {}
 
-    if hasattr(items[0], "parent"):
-        child_counts = {
-            item.slug: queryset.filter(**{f"{field_name}__slug": item.slug}).count()
-            for item in items
-            if item.parent is not None
-        }
+    counts = count_by_item(queryset, field_name)
 
-        parent_counts = {
-            parent.slug: {
-                "count": queryset.filter(**{f"{field_name}__slug": parent.slug}).count()
-                + calculate_unique_child_counts(
-                    parent, items, queryset, field_name, child_counts
-                ),
-                "sub_items": {
-                    child.slug: child_counts[child.slug]
-                    for child in items
-                    if child.parent == parent
-                },
-            }
-            for parent in items
-            if parent.parent is None
-        }
+    if not hasattr(items[0], "parent"):
+        return {item.slug: counts.get(item.pk, 0) for item in items}
+
+    children = {}
+    for item in items:
+        if item.parent_id is not None:
+            children.setdefault(item.parent_id, []).append(item)
 
-        return parent_counts
+    if Book._meta.get_field(field_name).many_to_many:
+        # A book can be in a parent genre and any of its sub-genres at once.
+        parent_counts = count_by_parent(queryset, field_name)
     else:
-        counts = {
-            item.slug: queryset.filter(**{f"{field_name}__slug": item.slug}).count()
+        # A book only has one type, so children can simply be added up.
+        parent_counts = {
+            item.pk: counts.get(item.pk, 0)
+            + sum(counts.get(child.pk, 0) for child in children.get(item.pk, []))
             for item in items
+            if item.parent_id is None
+        }
+
+    return {
+        parent.slug: {
+            "count": parent_counts.get(parent.pk, 0),
+            "sub_items": {
+                child.slug: counts.get(child.pk, 0)
+                for child in children.get(parent.pk, [])
+            },
         }
+        for parent in items
+        if parent.parent_id is None
+    }
+
+
+def get_filter_count(counts, slug):
+    """Look up one option's count in the output of `get_filter_counts`."""
+    for item_slug, count in counts.items():
+        if isinstance(count, dict):
+            if item_slug == slug:
+                return count["count"]
+            if slug in count["sub_items"]:
+                return count["sub_items"][slug]
+        elif item_slug == slug:
+            return count
+
+    return 0
+
+
+def get_facet_counts(queryset, facets):
+    """
+    Count books for every filter option at once.
 
-        return counts
+    `facets` maps a field name to its filter options, e.g. `{"genre": genres}`.
+    Runs one grouped query per field (plus one for parent genres) no matter how
+    many options there are.
+    """
+    return {
+        field_name: get_filter_counts(queryset, items, field_name)
+        for field_name, items in facets.items()
+    }
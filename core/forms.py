@@ -1,5 +1,4 @@
 from django import forms
-from django.forms.widgets import MultipleHiddenInput
 from django.forms import modelformset_factory
 from django_registration.forms import RegistrationForm
 from .models import (
@@ -13,6 +12,7 @@ from .models import (
     SeriesBook,
 )
 from .fields import GroupedModelChoiceField
+from .taxonomy_helpers import get_taxonomy
 
 
 class RegisterForm(RegistrationForm):
@@ -50,9 +50,15 @@ class BookForm(forms.ModelForm):
         self.fields["genre"].label = "Genre(s)"
         self.fields["type"] = GroupedModelChoiceField(
             queryset=self.fields["type"].queryset.order_by("parent", "name"),
+            objects=get_taxonomy("type").grouped(),
             choices_groupby="parent",
             required=False,
         )
+        for field_name in ("genre", "format", "location"):
+            # Validation still uses the queryset, but skip querying for choices.
+            self.fields[field_name].choices = [
+                (item.pk, str(item)) for item in get_taxonomy(field_name)
+            ]
 
     class Meta:
         model = Book
@@ -70,21 +76,6 @@ class BookForm(forms.ModelForm):
         )
 
 
-class BookStatusForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        super(BookStatusForm, self).__init__(*args, **kwargs)
-        for field in self.fields:
-            self.fields[field].widget = forms.HiddenInput()
-        self.fields["author"].widget = MultipleHiddenInput()
-        self.fields["format"].widget = MultipleHiddenInput()
-        self.fields["location"].widget = MultipleHiddenInput()
-        self.fields["genre"].widget = MultipleHiddenInput()
-
-    class Meta:
-        model = Book
-        exclude = ("created_at", "updated_at", "status")
-
-
 class BookReadingForm(forms.ModelForm):
     start_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
     end_date = forms.DateField(
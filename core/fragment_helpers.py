@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+BOOK_LIST_ITEM_TEMPLATE = "components/book-list-item.html"
+# Bump this whenever `book-list-item.html` (or anything it includes) changes.
+BOOK_LIST_ITEM_VERSION = 2
+# Cover URLs from S3 are signed and expire, so cached markup mustn't outlive them.
+BOOK_LIST_ITEM_TIMEOUT = getattr(settings, "AWS_QUERYSTRING_EXPIRE", 3600) // 2
+
+
+def book_list_item_key(book):
+    """
+    The cache key for a book's rendered list item. Editing the book changes
+    `updated_at`; adding, editing, deleting or reordering its covers changes
+    which cover comes first or that cover's `updated_at`.
+    """
+    cover = next(iter(book.covers.all()), None)
+    cover_version = f"{cover.pk}.{cover.updated_at.timestamp()}" if cover else "none"
+
+    return (
+        f"book-list-item:{BOOK_LIST_ITEM_VERSION}:{book.pk}:"
+        f"{book.updated_at.timestamp()}:{cover_version}"
+    )
+
+
+def render_book_list_items(books):
+    """
+    Set `list_item_html` on each book, rendering only the ones that aren't
+    cached yet. `books` should have their covers prefetched. Reads and writes
+    the cache in one go each, rather than once per book.
+    """
+    books = list(books)
+    keys = {book.pk: book_list_item_key(book) for book in books}
+    cached = cache.get_many(keys.values())
+    rendered = {}
+
+    for book in books:
+        key = keys[book.pk]
+        if key in cached:
+            book.list_item_html = cached[key]
+        else:
+            book.list_item_html = rendered[key] = render_to_string(
+                BOOK_LIST_ITEM_TEMPLATE, {"book": book}
+            )
+
+    if rendered:
+        cache.set_many(rendered, BOOK_LIST_ITEM_TIMEOUT)
+
+    return books
@@ -0,0 +1,329 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from importlib.util import find_spec
+from urllib.parse import urlsplit
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import slugify
+
+# Worth another go, the server (or something in front of it) is struggling.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.5
+RETRY_MAX_WAIT = 5.0
+
+# For requests made while someone waits on a page: no retries, and a web
+# worker is never held much longer than this (pass as `timeout`).
+INTERACTIVE_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+
+_client = None
+_client_pid = None
+_limiter = None
+_counting = threading.local()
+
+
+def client_options():
+    return {
+        "http2": find_spec("h2") is not None,
+        "timeout": httpx.Timeout(
+            settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+        ),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        "headers": {"User-Agent": settings.HTTP_USER_AGENT},
+        "follow_redirects": True,
+    }
+
+
+def get_client():
+    """
+    This process's shared `httpx.Client`, which keeps connections to Open
+    Library and cover hosts alive between requests. Uses HTTP/2 if the `h2`
+    package is installed.
+    """
+    global _client, _client_pid
+
+    # Don't share sockets with a parent process we were forked from.
+    if _client is None or _client_pid != os.getpid():
+        _client = httpx.Client(**client_options())
+        _client_pid = os.getpid()
+
+    return _client
+
+
+def make_async_client():
+    """
+    An `httpx.AsyncClient` set up like `get_client()`'s. These belong to an
+    event loop, so make one per batch (`async with make_async_client()`).
+    """
+    return httpx.AsyncClient(**client_options())
+
+
+class RateLimiter:
+    """
+    A token bucket per host: up to `burst` requests at once, then `rate` a
+    second. Callers reserve a token and are told how long to wait for it,
+    so it's safe to share between threads and event loops in a process.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def delay(self, url):
+        """Take a token for `url`'s host, returning the seconds until it's ours."""
+        if not self.rate:
+            return 0
+
+        host = urlsplit(str(url)).hostname
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+            self.buckets[host] = (tokens, now)
+
+        return max(0, -tokens / self.rate)
+
+    async def wait(self, url):
+        if delay := self.delay(url):
+            await asyncio.sleep(delay)
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of calling a service that's been failing."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service after `threshold` failures in a row, for
+    `cooldown` seconds. After that one request (the probe) is let through:
+    if it works the breaker closes, otherwise it stays open for another
+    `cooldown`.
+
+    The state is kept in the cache so web workers and the task queue share
+    it. Make a new breaker for each request (or batch), it loads the state
+    once, and `save()` it afterwards. A batch that gets to probe sends one
+    request before the rest. Counting isn't atomic across processes, but
+    close is good enough here.
+    """
+
+    def __init__(self, name, threshold, cooldown):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures_key = f"circuit:{slugify(name)}:failures"
+        self.opened_key = f"circuit:{slugify(name)}:opened-at"
+        self.probe_key = f"circuit:{slugify(name)}:probe"
+
+        state = cache.get_many([self.failures_key, self.opened_key])
+        self.failures = state.get(self.failures_key, 0)
+        self.opened_at = state.get(self.opened_key)
+        self.probing = False
+        self.changed = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def check(self, probe=True):
+        """
+        Raise `CircuitOpenError` unless a request can go ahead. When half-open
+        the first process to ask gets to probe, unless `probe` is False.
+        """
+        state = self.state
+        if state == "closed" or self.probing:
+            return
+
+        if (
+            state == "half-open"
+            and probe
+            and cache.add(self.probe_key, True, timeout=self.cooldown)
+        ):
+            self.probing = True
+            return
+
+        raise CircuitOpenError(
+            f"{self.name} isn't responding, we'll try again in a little while"
+        )
+
+    def record(self, succeeded):
+        if succeeded:
+            if self.failures or self.opened_at is not None:
+                self.failures = 0
+                self.opened_at = None
+                self.changed = True
+        else:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.time()
+            self.changed = True
+        self.probing = False
+
+    def save(self):
+        if not self.changed:
+            return
+
+        if self.opened_at is None and not self.failures:
+            cache.delete_many([self.failures_key, self.opened_key, self.probe_key])
+        else:
+            cache.set_many(
+                {self.failures_key: self.failures, self.opened_key: self.opened_at},
+                timeout=None,
+            )
+            if self.opened_at is not None:
+                cache.delete(self.probe_key)
+        self.changed = False
+
+
+def is_open_library(url):
+    host = urlsplit(str(url)).hostname or ""
+    hosts = {
+        urlsplit(settings.OPEN_LIBRARY_URL).hostname,
+        urlsplit(settings.OPEN_LIBRARY_COVERS_URL).hostname,
+    }
+    return host in hosts or host.endswith(".openlibrary.org")
+
+
+def open_library_breaker():
+    return CircuitBreaker(
+        "Open Library",
+        settings.OPEN_LIBRARY_BREAKER_THRESHOLD,
+        settings.OPEN_LIBRARY_BREAKER_COOLDOWN,
+    )
+
+
+def open_library_limiter():
+    """This process's `RateLimiter` for Open Library hosts."""
+    global _limiter
+
+    if _limiter is None:
+        rate = settings.OPEN_LIBRARY_RATE_LIMIT
+        _limiter = RateLimiter(rate, burst=max(1, rate))
+
+    return _limiter
+
+
+@contextmanager
+def count_requests():
+    """
+    Count the requests (each try) this thread makes inside the block, as
+    `{"open_library": n, "other": n}`, even those from `async_get`.
+    """
+    counts = Counter()
+    outer = getattr(_counting, "counts", None)
+    _counting.counts = counts
+    try:
+        yield counts
+    finally:
+        _counting.counts = outer
+        if outer is not None:
+            outer.update(counts)
+
+
+def _count_request(url):
+    if (counts := getattr(_counting, "counts", None)) is not None:
+        counts["open_library" if is_open_library(url) else "other"] += 1
+
+
+def retry_wait(attempt, response=None):
+    """Seconds to wait before another attempt: exponential, with full jitter."""
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return min(int(response.headers["Retry-After"]), RETRY_MAX_WAIT)
+
+    return random.uniform(0, min(RETRY_BACKOFF * 2**attempt, RETRY_MAX_WAIT))
+
+
+def get(url, retries=None, **kwargs):
+    """
+    GET `url` with the shared client, retrying connection problems, timeouts
+    and overloaded servers a few times. Raises `httpx.HTTPError` if it never
+    gets through, otherwise returns the last response (whatever its status).
+
+    Open Library requests are rate limited, and fail straight away with
+    `CircuitOpenError` while it's been down. Each failed try counts towards
+    opening the breaker, and there are no more tries once it's open.
+    """
+    if not is_open_library(url):
+        return _get(url, retries, **kwargs)
+
+    breaker = open_library_breaker()
+    breaker.check()
+    try:
+        return _get(
+            url, retries, limiter=open_library_limiter(), breaker=breaker, **kwargs
+        )
+    finally:
+        breaker.save()
+
+
+def can_retry(attempt, retries, breaker=None):
+    return attempt < retries and (breaker is None or breaker.state == "closed")
+
+
+def _get(url, retries=None, limiter=None, breaker=None, **kwargs):
+    retries = settings.HTTP_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        if limiter and (delay := limiter.delay(url)):
+            time.sleep(delay)
+
+        _count_request(url)
+        try:
+            response = get_client().get(url, **kwargs)
+        except httpx.TransportError:
+            if breaker:
+                breaker.record(succeeded=False)
+            if not can_retry(attempt, retries, breaker):
+                raise
+            time.sleep(retry_wait(attempt))
+            continue
+
+        failed = response.status_code in RETRY_STATUS_CODES
+        if breaker:
+            breaker.record(succeeded=not failed)
+        if not failed or not can_retry(attempt, retries, breaker):
+            return response
+        time.sleep(retry_wait(attempt, response))
+
+
+async def async_get(client, url, retries=None, limiter=None, breaker=None, **kwargs):
+    """
+    `get()` for an `httpx.AsyncClient`, waiting on `limiter` before each try.
+    `breaker` is only checked and updated in memory, since the cache can't
+    be used in an event loop: `check()` it beforehand and `save()` it after.
+    """
+    retries = settings.HTTP_RETRIES if retries is None else retries
+    if breaker:
+        breaker.check(probe=False)
+
+    for attempt in range(retries + 1):
+        if limiter:
+            await limiter.wait(url)
+
+        _count_request(url)
+        try:
+            response = await client.get(url, **kwargs)
+        except httpx.TransportError:
+            if breaker:
+                breaker.record(succeeded=False)
+            if not can_retry(attempt, retries, breaker):
+                raise
+            await asyncio.sleep(retry_wait(attempt))
+            continue
+
+        failed = response.status_code in RETRY_STATUS_CODES
+        if breaker:
+            breaker.record(succeeded=not failed)
+        if not failed or not can_retry(attempt, retries, breaker):
+            return response
+        await asyncio.sleep(retry_wait(attempt, response))
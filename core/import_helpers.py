@@ -1,4 +1,20 @@
-import requests
+import hashlib
+import json
+import re
+from datetime import date
+import httpx
+from dateutil import parser
+from django.conf import settings
+from . import http_helpers
+from .open_library_cache_helpers import (
+    get_cached_responses,
+    isbn_key,
+    store_response,
+)
+from .utils import chunks
+
+# The books API takes many ISBNs at once, as long as the URL isn't too long.
+ISBN_CHUNK_SIZE = 50
 
 
 def goodreads_status(shelf):
@@ -26,25 +42,208 @@ def the_storygraph_status(status):
         return "wishlist"
 
 
-def published_year_from_isbn(isbn):
-    url = f"https://openlibrary.org/isbn/{isbn}.json"  # noqa: E231
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        date_str = data.get("publish_date")
+def csv_source(row):
+    """Which export a row's from, by its columns: "goodreads", "storygraph" or ""."""
+    if "Exclusive Shelf" in row or "Book Id" in row:
+        return "goodreads"
+    if "Read Status" in row:
+        return "storygraph"
+    return ""
 
-        # Attempt to extract the year directly if it's an integer
-        year_str = date_str.split()[-1]
-        if year_str.isdigit():
-            return int(year_str)
-        else:
-            # Implement additional logic for date parsing if necessary
-            try:
-                # Example of parsing the full date string to extract the year
-                from datetime import datetime
-
-                year = datetime.strptime(date_str, "%b %d, %Y").year
-                return year
-            except ValueError:
-                pass
+
+def row_fingerprint(row):
+    """
+    A hash of everything in `row`, to tell when it's been imported before,
+    whichever file or job it's in. Spaces around values don't count.
+    """
+    values = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+
+def row_status(row):
+    if row.get("Exclusive Shelf") or row.get("Bookshelves"):
+        # Goodreads
+        return goodreads_status(row.get("Exclusive Shelf") or row["Bookshelves"])
+    if row.get("Read Status"):
+        # The StoryGraph
+        return the_storygraph_status(row["Read Status"])
+    return "wishlist"
+
+
+def row_authors(row):
+    """The names of every author in a Goodreads or The StoryGraph row, in order."""
+    names = []
+    if row.get("Author"):
+        # Goodreads
+        names += [row["Author"], *row.get("Additional Authors", "").split(",")]
+    if row.get("Authors"):
+        # The StoryGraph
+        names += row["Authors"].split(",")
+
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def parse_date(text):
+    try:
+        return parser.parse(text).date()
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def parse_rating(text):
+    """A 1 to 5 star rating, rounding half stars up. Goodreads uses 0 for none."""
+    try:
+        rating = int(float(text) + 0.5)
+    except (TypeError, ValueError):
+        return None
+    return rating if 1 <= rating <= 5 else None
+
+
+def row_reading(row, status):
+    """
+    The `BookReading` fields for a row's book, or None if its status doesn't
+    come with a reading. Dates that can't be read are today.
+    """
+    today = date.today()
+
+    if status == "reading":
+        return {
+            "start_date": parse_date(row.get("Date Added")) or today,
+            "end_date": None,
+            "finished": False,
+            "rating": None,
+        }
+
+    if status != "finished":
+        return None
+
+    if dates_read := row.get("Dates Read"):
+        # The StoryGraph, like 2023/10/28-2024/01/24, or just one date.
+        start, _, end = dates_read.partition("-")
+        start_date = parse_date(start)
+        end_date = parse_date(end) or start_date
+        rating = row.get("Star Rating")
+    else:
+        # Goodreads
+        start_date = parse_date(row.get("Date Added"))
+        end_date = parse_date(row.get("Date Read"))
+        rating = row.get("My Rating")
+
+    if not (start_date and end_date):
+        start_date = end_date = today
+    elif start_date > end_date:
+        start_date = end_date
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "finished": True,
+        "rating": parse_rating(rating),
+    }
+
+
+def row_author(row):
+    """The name of the author a Goodreads or The StoryGraph row is filed under."""
+    if row.get("Author"):
+        return row["Author"]
+    if row.get("Authors"):
+        return row["Authors"].split(",")[0]
     return None
+
+
+def open_library_query(title, author=None):
+    if author:
+        return f"&title={title}&author={author}"
+    return f"&title={title}"
+
+
+def normalize_isbn(value):
+    """
+    Just the digits (and check digit X) of an ISBN-10 or ISBN-13, or None
+    if it isn't one. Goodreads exports them like `="0261102214"`.
+    """
+    isbn = re.sub(r"[^0-9X]", "", str(value or "").upper())
+    return isbn if len(isbn) in (10, 13) else None
+
+
+def row_isbn(row):
+    """The ISBN in a The StoryGraph or Goodreads row, if it has one."""
+    for column in ("ISBN/UID", "ISBN13", "ISBN"):
+        if isbn := normalize_isbn(row.get(column)):
+            return isbn
+    return None
+
+
+def row_published_year(row):
+    return row.get("Original Publication Year") or row.get("Year Published") or None
+
+
+def open_library_lookup(row):
+    """
+    What `import_rows` will ask Open Library about for `row`: a search
+    query and, if the row has no publication year, an ISBN (or None).
+    """
+    return (
+        open_library_query(row["Title"], row_author(row)),
+        None if row_published_year(row) else row_isbn(row),
+    )
+
+
+def publication_year(text):
+    """
+    The year from a free text date like Open Library's `publish_date`, which
+    can be "1937", "Sep 21, 1937", "1937-09-21", "c1937", "[1937?]", etc.
+    """
+    if match := re.search(r"(?<!\d)(1[0-9]\d\d|20\d\d)(?!\d)", str(text or "")):
+        return int(match[1])
+    return None
+
+
+def open_library_books_url(isbns):
+    bibkeys = ",".join(f"ISBN:{isbn}" for isbn in isbns)  # noqa: E231
+    return f"{settings.OPEN_LIBRARY_URL}/api/books?bibkeys={bibkeys}&format=json&jscmd=data"
+
+
+def isbn_lookup_is_empty(value):
+    return value.get("year") is None
+
+
+def resolve_isbns(isbns, chunk_size=ISBN_CHUNK_SIZE):
+    """
+    `{isbn: year or None}` for each of `isbns`, asking Open Library's books
+    API about `chunk_size` at a time rather than one request each. Answers
+    are cached (errors only briefly), and cached ones are used.
+    """
+    isbns = {isbn: normalize_isbn(isbn) for isbn in isbns}
+    keys = {isbn: isbn_key(isbn) for isbn in set(isbns.values()) if isbn}
+    found = get_cached_responses(keys.values())
+    missing = [isbn for isbn, key in keys.items() if key not in found]
+
+    for chunk in chunks(sorted(missing), chunk_size):
+        try:
+            response = http_helpers.get(open_library_books_url(chunk))
+            response.raise_for_status()
+            books = response.json()
+        except http_helpers.CircuitOpenError:
+            # Not worth caching, Open Library could be back any moment.
+            break
+        except (httpx.HTTPError, ValueError) as exc:
+            lookups = {isbn: {"error": str(exc)} for isbn in chunk}
+        else:
+            lookups = {
+                isbn: {
+                    "year": publication_year(
+                        books.get(f"ISBN:{isbn}", {}).get("publish_date")  # noqa: E231
+                    )
+                }
+                for isbn in chunk
+            }
+
+        for isbn, lookup in lookups.items():
+            store_response(keys[isbn], lookup, is_empty=isbn_lookup_is_empty)
+            found[keys[isbn]] = lookup
+
+    return {
+        isbn: found.get(keys.get(normalized), {}).get("year")
+        for isbn, normalized in isbns.items()
+    }
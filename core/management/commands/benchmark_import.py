@@ -0,0 +1,78 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from faker import Faker
+from core.bulk_import_helpers import IMPORT_CHUNK_SIZE, import_rows
+from core.models import User
+
+
+def goodreads_rows(count, seed):
+    """Made up rows like a Goodreads export, a few books to each author."""
+    rng = random.Random(seed)
+    fake = Faker()
+    fake.seed_instance(seed)
+    authors = [fake.name() for _ in range(max(count // 4, 1))]
+
+    rows = []
+    for i in range(count):
+        shelf = rng.choice(["read", "read", "read", "to-read", "currently-reading"])
+        added = fake.date_between("-10y", "-1y")
+        rows.append(
+            {
+                "Title": f"{fake.catch_phrase()} {i}",
+                "Author": rng.choice(authors),
+                "Additional Authors": ", ".join(
+                    rng.sample(authors, rng.choice([0, 0, 1, 2]))
+                ),
+                "ISBN": '=""',
+                "ISBN13": '=""',
+                "My Rating": str(rng.choice([0, 3, 4, 5])),
+                "Original Publication Year": str(rng.randrange(1900, 2025)),
+                "Date Read": added.strftime("%Y/%m/%d") if shelf == "read" else "",
+                "Date Added": added.strftime("%Y/%m/%d"),
+                "Exclusive Shelf": shelf,
+                "My Review": fake.paragraph() if rng.random() < 0.2 else "",
+            }
+        )
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Time importing a made up Goodreads export, one row at a time and in "
+        "chunks, without Open Library. Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=5000)
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **kwargs):
+        rows = goodreads_rows(kwargs["books"], kwargs["seed"])
+
+        for name, chunk_size in [
+            ("one at a time", 1),
+            (f"chunks of {kwargs['chunk_size']}", kwargs["chunk_size"]),
+        ]:
+            queries = []
+            with (
+                transaction.atomic(),
+                connection.execute_wrapper(
+                    lambda execute, *args: queries.append(1) or execute(*args)
+                ),
+            ):
+                user = User.objects.create_user(f"benchmark-{time.time()}@example.com")
+
+                started = time.perf_counter()
+                added = import_rows(
+                    rows, user, open_library=False, chunk_size=chunk_size
+                )["created"]
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{name:>16}: {elapsed:.2f}s, {added / elapsed:.0f} books/s, "
+                    f"{len(queries) / added:.1f} queries a book"
+                )
+                transaction.set_rollback(True)
@@ -0,0 +1,116 @@
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from faker import Faker
+from core import http_helpers
+from core.bulk_import_helpers import IMPORT_CHUNK_SIZE, import_rows
+from core.cover_helpers import search_open_library
+from core.import_helpers import open_library_lookup
+from core.models import OpenLibraryResponse, User
+from core.open_library_helpers import resolve_books
+from core.open_library_standin import OpenLibraryStandIn
+from core.queues import COVERS_HUEY
+
+
+class Command(BaseCommand):
+    help = (
+        "Time Open Library searches and imports against a local stand-in "
+        "with made up latency and errors. Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.05)
+        parser.add_argument("--jitter", type=float, default=0.05)
+        parser.add_argument("--error-rate", type=float, default=0.02)
+        parser.add_argument("--docs", type=int, default=10)
+        parser.add_argument(
+            "--rate", type=float, default=0, help="Requests a second, 0 for no limit"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **kwargs):
+        fake = Faker()
+        fake.seed_instance(kwargs["seed"])
+        rows = [
+            {
+                "Title": fake.unique.catch_phrase(),
+                "Author": fake.name(),
+                "ISBN/UID": fake.isbn13(separator=""),
+                "Exclusive Shelf": "read",
+            }
+            for _ in range(kwargs["books"])
+        ]
+
+        standin = OpenLibraryStandIn()
+        with (
+            standin,
+            tempfile.TemporaryDirectory() as media_root,
+            override_settings(
+                OPEN_LIBRARY_URL=standin.url,
+                OPEN_LIBRARY_COVERS_URL=standin.url,
+                OPEN_LIBRARY_RATE_LIMIT=kwargs["rate"],
+                MEDIA_ROOT=media_root,
+                STORAGES={
+                    "default": {
+                        "BACKEND": "django.core.files.storage.FileSystemStorage"
+                    },
+                    "staticfiles": {
+                        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+                    },
+                },
+            ),
+        ):
+            http_helpers._limiter = None
+            # Imports' covers are looked up right away, so they're timed too.
+            immediate = COVERS_HUEY.immediate
+            COVERS_HUEY.immediate = True
+
+            users = []
+
+            def import_books(chunk_size):
+                user = User.objects.create_user(f"benchmark-{time.time()}@example.com")
+                users.append(user)
+                import_rows(rows, user, chunk_size=chunk_size)
+
+            paths = {
+                "search one at a time": lambda: [
+                    search_open_library(open_library_lookup(row)[0]) for row in rows
+                ],
+                "search in a batch": lambda: resolve_books(
+                    [open_library_lookup(row) for row in rows]
+                ),
+                "import one at a time": lambda: import_books(chunk_size=1),
+                "import in chunks": lambda: import_books(chunk_size=IMPORT_CHUNK_SIZE),
+            }
+
+            # Not in a transaction that's rolled back, imports only look up
+            # covers once their chunks are committed. Cleaned up instead.
+            for name, path in paths.items():
+                OpenLibraryResponse.objects.all().delete()
+                standin.configure(
+                    latency=kwargs["latency"],
+                    jitter=kwargs["jitter"],
+                    error_rate=kwargs["error_rate"],
+                    docs=kwargs["docs"],
+                    seed=kwargs["seed"],
+                )
+
+                started = time.perf_counter()
+                path()
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{name:>21}: {elapsed:.2f}s, "
+                    f"{len(rows) / elapsed:.1f} books/s, "
+                    f"{len(standin.requests)} requests"
+                )
+
+                for user in users:
+                    user.delete()
+                users.clear()
+                OpenLibraryResponse.objects.all().delete()
+
+            http_helpers._limiter = None
+            COVERS_HUEY.immediate = immediate
@@ -0,0 +1,90 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from faker import Faker
+from core.models import Book, User
+from core.search_helpers import index, search_enabled, search_ids
+from core.trigram_helpers import TrigramIndex
+
+
+def misspell(word, rng):
+    """Drop, double or swap a letter, like a quick typist would."""
+    i = rng.randrange(1, len(word) - 1)
+    return rng.choice(
+        [
+            word[:i] + word[i + 1 :],
+            word[:i] + word[i] + word[i:],
+            word[: i - 1] + word[i] + word[i - 1] + word[i + 1 :],
+        ]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare icontains, full-text and trigram title search on a made up "
+        "library. Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=50000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        fake = Faker()
+        fake.seed_instance(kwargs["seed"])
+
+        with transaction.atomic():
+            user = User.objects.create_user(f"benchmark-{time.time()}@example.com")
+            titles = {fake.catch_phrase() for _ in range(kwargs["books"])}
+            books = Book.objects.bulk_create(
+                Book(user=user, title=title) for title in titles
+            )
+            index(Book, [book.pk for book in books])
+
+            started = time.perf_counter()
+            trigram_index = TrigramIndex({book.pk: book.title for book in books})
+            self.stdout.write(
+                f"{len(books)} books, trigram index built in "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms\n"
+            )
+
+            # Search for random titles with their longest word misspelled
+            queries = []
+            for book in rng.sample(books, kwargs["queries"]):
+                word = max(book.title.split(), key=len)
+                queries.append(
+                    (book.pk, book.title.replace(word, misspell(word, rng), 1))
+                )
+
+            user_books = Book.objects.filter(user=user)
+            paths = {
+                "icontains": lambda query: list(
+                    user_books.filter(title__icontains=query).values_list(
+                        "pk", flat=True
+                    )[:50]
+                ),
+                "trigram": lambda query: trigram_index.search(query, limit=50),
+            }
+            if search_enabled():
+                paths["full-text"] = lambda query: search_ids(Book, user, query)
+
+            for name, path in paths.items():
+                timings = []
+                found = 0
+                for pk, query in queries:
+                    started = time.perf_counter()
+                    results = path(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    found += pk in results
+
+                timings.sort()
+                self.stdout.write(
+                    f"{name:>10}: median {timings[len(timings) // 2]:.2f}ms, "
+                    f"max {timings[-1]:.2f}ms, "
+                    f"found {found} of {len(queries)} misspelled titles"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.open_library_catalog_helpers import build_catalog, catalog_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the local Open Library catalog from works, editions and authors "
+        "dumps (https://openlibrary.org/developers/dumps), gzipped or not"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dumps", nargs="+")
+        parser.add_argument(
+            "--limit", type=int, help="Only take this many works from the dump"
+        )
+        parser.add_argument(
+            "--output", help="Where to put the catalog, OPEN_LIBRARY_CATALOG otherwise"
+        )
+
+    def handle(self, *args, **kwargs):
+        output = kwargs["output"] or catalog_path()
+        if not output:
+            raise CommandError("Set OPEN_LIBRARY_CATALOG or pass --output")
+
+        started = time.perf_counter()
+        counts = build_catalog(kwargs["dumps"], output, limit=kwargs["limit"])
+
+        self.stdout.write(
+            f"Added {counts['works']} works, {counts['editions']} editions and "
+            f"{counts['authors']} authors to {output} in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
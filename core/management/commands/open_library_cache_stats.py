@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from core.open_library_cache_helpers import (
+    OPEN_LIBRARY_CACHE_KINDS,
+    cull,
+    get_cache_stats,
+    reset_cache_stats,
+)
+
+
+class Command(BaseCommand):
+    help = "Show how often cached Open Library responses are used"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Start counting hits and misses again"
+        )
+        parser.add_argument(
+            "--cull", action="store_true", help="Remove expired responses first"
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["cull"]:
+            cull()
+
+        stats = get_cache_stats()
+
+        for kind in OPEN_LIBRARY_CACHE_KINDS:
+            hits, misses = stats[kind]["hits"], stats[kind]["misses"]
+            rate = f"{hits / (hits + misses):.0%}" if hits + misses else "n/a"
+            self.stdout.write(f"{kind}: {hits} hits, {misses} misses ({rate})")
+
+        self.stdout.write(
+            f"{stats['entries']} cached responses, {stats['expired']} expired"
+        )
+
+        if kwargs["reset"]:
+            reset_cache_stats()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from core.models import User
+from core.taxonomy_helpers import get_taxonomies
+from core.stats_helpers import rebuild_library_stats
+
+
+class Command(BaseCommand):
+    help = "Recount the cached book counts for each user's status pages and filters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report counts that have drifted, don't fix them",
+        )
+
+    def handle(self, *args, **kwargs):
+        facets = get_taxonomies()
+        drifted_users = 0
+
+        for user in User.objects.all():
+            drift = rebuild_library_stats(user, facets, check=kwargs["check"])
+
+            if drift:
+                drifted_users += 1
+                for (status, facet, slug), (stored, actual) in sorted(drift.items()):
+                    self.stdout.write(
+                        f"{user} / {status} / {facet} {slug}: {stored} → {actual}"
+                    )
+
+        if kwargs["check"]:
+            self.stdout.write(f"{drifted_users} users with drifted counts")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"{drifted_users} users with drifted counts fixed")
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.search_helpers import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of books, authors and series"
+
+    def handle(self, *args, **kwargs):
+        if not search_enabled():
+            raise CommandError("Full-text search needs SQLite")
+
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.models import ImportJob
+from core.tasks import import_books_from_csv
+from core.utils import pluralize
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue unfinished imports again from their checkpoints, for when "
+        "Huey's queue was lost in a restart. Stale copies of tasks do nothing."
+    )
+
+    def handle(self, *args, **kwargs):
+        jobs = ImportJob.objects.filter(status__in=["queued", "running"])
+
+        for job in jobs:
+            import_books_from_csv(job.pk, job.offset)
+            self.stdout.write(f"{job}: from {job.processed_rows} rows in")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(jobs)} {pluralize('import', len(jobs))} queued again"
+            )
+        )
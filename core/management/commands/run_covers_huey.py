@@ -0,0 +1,28 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+from huey.consumer_options import ConsumerConfig
+from core.queues import COVERS_HUEY
+
+
+class Command(BaseCommand):
+    help = "Run the consumer for the covers queue, alongside `run_huey`"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int)
+
+    def handle(self, *args, **kwargs):
+        options = dict(settings.COVERS_HUEY.get("consumer", {}))
+        if kwargs["workers"]:
+            options["workers"] = kwargs["workers"]
+
+        autodiscover_modules("tasks", "cover_tasks")
+
+        config = ConsumerConfig(**options)
+        config.validate()
+        logger = logging.getLogger("huey")
+        if not logger.handlers:
+            config.setup_logger(logger)
+
+        COVERS_HUEY.create_consumer(**config.values).run()
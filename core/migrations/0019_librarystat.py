@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_alter_bookreading_rating"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LibraryStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("status", models.CharField(max_length=20)),
+                ("facet", models.CharField(max_length=20)),
+                ("slug", models.CharField(blank=True, max_length=100)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="library_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        models.F("user"),
+                        models.F("status"),
+                        models.F("facet"),
+                        models.F("slug"),
+                        name="library_stat_unique",
+                    )
+                ],
+            },
+        ),
+    ]
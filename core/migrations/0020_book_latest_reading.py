@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+def copy_latest_readings(apps, schema_editor):
+    Book = apps.get_model("core", "Book")
+    BookReading = apps.get_model("core", "BookReading")
+
+    for book in Book.objects.filter(readings__isnull=False).distinct():
+        reading = BookReading.objects.filter(book=book).order_by("-start_date").first()
+        Book.objects.filter(pk=book.pk).update(
+            latest_reading_start=reading.start_date,
+            latest_reading_end=reading.end_date,
+            latest_reading_finished=reading.finished,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_librarystat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="latest_reading_end",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="latest_reading_finished",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="latest_reading_start",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["user", "status", "archived", "latest_reading_start"],
+                name="book_latest_reading_start",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["user", "status", "archived", "latest_reading_end"],
+                name="book_latest_reading_end",
+            ),
+        ),
+        migrations.RunPython(copy_latest_readings, migrations.RunPython.noop),
+    ]
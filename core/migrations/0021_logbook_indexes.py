@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_book_latest_reading"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["user", "created_at"], name="book_user_created_at"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookstatuschange",
+            index=models.Index(
+                fields=["book", "changed_at"], name="book_status_change_changed_at"
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+CREATE_SQL = """
+    CREATE VIRTUAL TABLE core_search USING fts5(
+        user_id UNINDEXED,
+        title,
+        authors,
+        body,
+        prefix = '2 3',
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+INDEX_SQL = [
+    """
+    INSERT INTO core_search (rowid, user_id, title, authors, body)
+    SELECT
+        book.id * 4,
+        book.user_id,
+        book.title,
+        coalesce((
+            SELECT group_concat(author.name, ' ')
+            FROM core_book_author book_author
+            JOIN core_author author ON author.id = book_author.author_id
+            WHERE book_author.book_id = book.id
+        ), ''),
+        coalesce((
+            SELECT group_concat(text, ' ') FROM core_booknote WHERE book_id = book.id
+        ), '') || ' ' || coalesce((
+            SELECT group_concat(review, ' ') FROM core_bookreading WHERE book_id = book.id
+        ), '')
+    FROM core_book book
+    """,
+    """
+    INSERT INTO core_search (rowid, user_id, title, authors, body)
+    SELECT author.id * 4 + 1, author.user_id, '', author.name, author.bio
+    FROM core_author author
+    """,
+    """
+    INSERT INTO core_search (rowid, user_id, title, authors, body)
+    SELECT series.id * 4 + 2, series.user_id, series.title, '', series.description
+    FROM core_series series
+    """,
+]
+
+
+def create_search_table(apps, schema_editor):
+    # FTS5 is SQLite only, other databases fall back to `icontains`.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(CREATE_SQL)
+    for sql in INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS core_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_logbook_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
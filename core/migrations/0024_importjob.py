@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+
+
+def import_jobs_for_past_imports(apps, schema_editor):
+    """One finished job for each day someone imported books, like the old page."""
+    Book = apps.get_model("core", "Book")
+    ImportJob = apps.get_model("core", "ImportJob")
+
+    days = (
+        Book.objects.filter(imported=True)
+        .annotate(day=TruncDate("created_at"))
+        .values("user_id", "day")
+        .annotate(count=Count("id"), first=Min("created_at"), last=Max("created_at"))
+    )
+    for day in days:
+        job = ImportJob.objects.create(
+            user_id=day["user_id"],
+            status="finished",
+            total_rows=day["count"],
+            processed_rows=day["count"],
+            created_books=day["count"],
+        )
+        ImportJob.objects.filter(pk=job.pk).update(
+            created_at=day["first"],
+            started_at=day["first"],
+            finished_at=day["last"],
+            updated_at=day["last"],
+        )
+        Book.objects.annotate(day=TruncDate("created_at")).filter(
+            user_id=day["user_id"], imported=True, day=day["day"]
+        ).update(import_job=job)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_openlibraryresponse"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("goodreads", "Goodreads"),
+                            ("storygraph", "The StoryGraph"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Waiting to start"),
+                            ("running", "Importing"),
+                            ("finished", "Finished"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("file_name", models.CharField(blank=True, max_length=255)),
+                ("total_rows", models.PositiveIntegerField(blank=True, null=True)),
+                ("processed_rows", models.PositiveIntegerField(default=0)),
+                ("created_books", models.PositiveIntegerField(default=0)),
+                ("skipped_rows", models.PositiveIntegerField(default=0)),
+                ("failed_rows", models.PositiveIntegerField(default=0)),
+                ("open_library_requests", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="import_job",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="books",
+                to="core.importjob",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="importjob",
+            index=models.Index(
+                fields=["user", "created_at"], name="import_job_user_created_at"
+            ),
+        ),
+        migrations.RunPython(import_jobs_for_past_imports, migrations.RunPython.noop),
+    ]
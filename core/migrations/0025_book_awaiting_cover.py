@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0024_importjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="awaiting_cover",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:43
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_latest_ends(apps, schema_editor):
+    Book = apps.get_model("core", "Book")
+    BookReading = apps.get_model("core", "BookReading")
+
+    for field, finished in [
+        ("latest_finished_end", True),
+        ("latest_unfinished_end", False),
+    ]:
+        latest = BookReading.objects.filter(
+            book=OuterRef("pk"), finished=finished
+        ).order_by("-start_date")
+        Book.objects.update(**{field: Subquery(latest.values("end_date")[:1])})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0026_import_checkpoints"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="book",
+            name="book_latest_reading_end",
+        ),
+        migrations.RemoveField(
+            model_name="book",
+            name="latest_reading_finished",
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="latest_finished_end",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="latest_unfinished_end",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(copy_latest_ends, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["user", "status", "archived", "latest_finished_end"],
+                name="book_latest_finished_end",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["user", "status", "archived", "latest_unfinished_end"],
+                name="book_latest_unfinished_end",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from collections import Counter, defaultdict
+from django.db import migrations
+
+
+def fill_library_stats(apps, schema_editor):
+    """Count every user's `LibraryStat` rows, like `rebuild_library_stats`."""
+    Book = apps.get_model("core", "Book")
+    LibraryStat = apps.get_model("core", "LibraryStat")
+
+    counts = defaultdict(Counter)
+    books = (
+        Book.objects.filter(archived=False)
+        .select_related("type__parent")
+        .prefetch_related("genre__parent", "format", "location", "author")
+    )
+    for book in books.iterator(chunk_size=500):
+        # Parent types and genres count every book in them or their children.
+        keys = {("status", "")}
+        for facet, items in [
+            ("type", [book.type] if book.type else []),
+            ("genre", book.genre.all()),
+        ]:
+            for item in items:
+                keys.add((facet, item.slug))
+                if item.parent:
+                    keys.add((facet, item.parent.slug))
+        keys |= {("format", item.slug) for item in book.format.all()}
+        keys |= {("location", item.slug) for item in book.location.all()}
+        keys |= {("author", str(author.pk)) for author in book.author.all()}
+
+        counts[book.user_id].update((book.status, facet, slug) for facet, slug in keys)
+
+    LibraryStat.objects.all().delete()
+    LibraryStat.objects.bulk_create(
+        (
+            LibraryStat(
+                user_id=user_id, status=status, facet=facet, slug=slug, count=count
+            )
+            for user_id, user_counts in counts.items()
+            for (status, facet, slug), count in user_counts.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0027_book_latest_finished_ends"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_library_stats, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,30 @@
 import os
-import requests
 import datetime
+import httpx
+from functools import reduce
+from operator import or_
 import pillow_avif  # noqa: F401 (ignore "unused import" error)
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.template.defaultfilters import date
 from django.core.files.temp import NamedTemporaryFile
 from django.core.files import File
 from django.urls import reverse
-from django.db.models.signals import pre_save
+from django.db.models.signals import (
+    pre_save,
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
 from django.dispatch import receiver
 from django.conf import settings
-from django.db.models import UniqueConstraint
+from django.db.models import F, Q, UniqueConstraint
 from django.db.models.functions import Lower
+from core import http_helpers
 from core.image_helpers import rename_image, resize_image
 from ordered_model.models import OrderedModel
 
@@ -214,6 +224,22 @@ class Book(models.Model):
     olid = models.CharField(max_length=100, blank=True, verbose_name="Open Library ID")
     pages = models.PositiveSmallIntegerField(blank=True, null=True)
     imported = models.BooleanField(default=False)
+    import_job = models.ForeignKey(
+        "ImportJob",
+        on_delete=models.SET_NULL,
+        related_name="books",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # Copied from the latest `BookReading` so lists can sort without subqueries.
+    latest_reading_start = models.DateField(null=True, blank=True, editable=False)
+    latest_reading_end = models.DateField(null=True, blank=True, editable=False)
+    # The ends of the latest finished and unfinished ones, to sort those lists by.
+    latest_finished_end = models.DateField(null=True, blank=True, editable=False)
+    latest_unfinished_end = models.DateField(null=True, blank=True, editable=False)
+    # Set while an import's looking for the book's cover in the background.
+    awaiting_cover = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -225,6 +251,21 @@ class Book(models.Model):
                 name="user_title_unique",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "status", "archived", "latest_reading_start"],
+                name="book_latest_reading_start",
+            ),
+            models.Index(
+                fields=["user", "status", "archived", "latest_finished_end"],
+                name="book_latest_finished_end",
+            ),
+            models.Index(
+                fields=["user", "status", "archived", "latest_unfinished_end"],
+                name="book_latest_unfinished_end",
+            ),
+            models.Index(fields=["user", "created_at"], name="book_user_created_at"),
+        ]
 
     def __str__(self):
         if self.archived:
@@ -232,10 +273,39 @@ class Book(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old = (
+                Book.objects.only(
+                    "title",
+                    "status",
+                    "archived",
+                    "type",
+                    "latest_reading_start",
+                    "latest_reading_end",
+                    "latest_finished_end",
+                    "latest_unfinished_end",
+                ).get(pk=self.pk)
+                if self.pk
+                else None
+            )
+            # For the `pre_save` and `post_save` receivers, so they needn't
+            # fetch the book again.
+            self._old = old
+            if old:
+                # These only change with readings, don't save over them.
+                self.latest_reading_start = old.latest_reading_start
+                self.latest_reading_end = old.latest_reading_end
+                self.latest_finished_end = old.latest_finished_end
+                self.latest_unfinished_end = old.latest_unfinished_end
+
+            self._save_with_readings(old, *args, **kwargs)
+            self.update_library_stats(old)
+
+    def _save_with_readings(self, old, *args, **kwargs):
         new = not self.pk
 
-        if self.pk:
-            old_status = Book.objects.get(pk=self.pk).status
+        if old:
+            old_status = old.status
             new_status = self.status
 
             if old_status != new_status:
@@ -248,7 +318,7 @@ class Book(models.Model):
                 # Add the current date as an `end_date` to the most recent BookReading (if any) and mark it `finished`.
                 elif new_status == "finished":
                     reading = (
-                        BookReading.objects.filter(book=self, end_date=None)
+                        self.readings.filter(end_date=None)
                         .order_by("-start_date")
                         .first()
                     )
@@ -264,7 +334,7 @@ class Book(models.Model):
                     or new_status == "wishlist"
                 ):
                     reading = (
-                        BookReading.objects.filter(book=self, end_date=None)
+                        self.readings.filter(end_date=None)
                         .order_by("-start_date")
                         .first()
                     )
@@ -275,7 +345,7 @@ class Book(models.Model):
                 # Add an `end_date` to the latest BookReading (if any), but don't mark it `finished`.
                 elif new_status == "dnf":
                     reading = (
-                        BookReading.objects.filter(book=self, end_date=None)
+                        self.readings.filter(end_date=None)
                         .order_by("-start_date")
                         .first()
                     )
@@ -288,6 +358,61 @@ class Book(models.Model):
         if new and self.status == "reading":
             BookReading.objects.create(book=self, start_date=datetime.date.today())
 
+    def facet_keys(self, facets=None):
+        """The `(facet, slug)` pairs this book is counted under in the filters."""
+        facets = LIBRARY_STAT_FACETS if facets is None else facets
+        keys = set()
+
+        if "type" in facets:
+            keys |= type_facet_keys(self.type_id)
+        if "genre" in facets:
+            for slug, parent_slug in self.genre.values_list("slug", "parent__slug"):
+                keys.add(("genre", slug))
+                if parent_slug:
+                    # Books count towards their sub-genres' parent genre too.
+                    keys.add(("genre", parent_slug))
+        if "format" in facets:
+            keys |= {
+                ("format", slug) for slug in self.format.values_list("slug", flat=True)
+            }
+        if "location" in facets:
+            keys |= {
+                ("location", slug)
+                for slug in self.location.values_list("slug", flat=True)
+            }
+        if "author" in facets:
+            keys |= {
+                ("author", str(pk)) for pk in self.author.values_list("pk", flat=True)
+            }
+
+        return keys
+
+    def update_library_stats(self, old=None):
+        """Move this book's `LibraryStat` counts after a save."""
+        if old is None:
+            # A brand new book can't have any many-to-many relations yet.
+            facets = ()
+        elif (old.status, old.archived) == (self.status, self.archived):
+            if old.type_id == self.type_id:
+                return
+            facets = ()
+        else:
+            facets = [facet for facet in LIBRARY_STAT_FACETS if facet != "type"]
+
+        shared_keys = self.facet_keys(facets)
+        before = (
+            library_stat_keys(
+                old.status, old.archived, shared_keys | type_facet_keys(old.type_id)
+            )
+            if old
+            else set()
+        )
+        after = library_stat_keys(
+            self.status, self.archived, shared_keys | type_facet_keys(self.type_id)
+        )
+
+        LibraryStat.adjust(self.user_id, before, after)
+
     def get_absolute_url(self):
         return reverse("book_detail", args=(self.pk,))
 
@@ -313,6 +438,30 @@ class Book(models.Model):
     def latest_reading(self):
         return BookReading.objects.filter(book=self).order_by("-start_date").first()
 
+    def update_latest_reading(self):
+        """
+        Copy the dates of the latest `BookReading`, and the ends of the latest
+        finished and unfinished ones, onto this book.
+        """
+        readings = BookReading.objects.filter(book=self).order_by("-start_date")
+        readings = list(readings.values_list("start_date", "end_date", "finished"))
+        self.latest_reading_start = readings[0][0] if readings else None
+        self.latest_reading_end = readings[0][1] if readings else None
+        self.latest_finished_end = next(
+            (end for _, end, finished in readings if finished), None
+        )
+        self.latest_unfinished_end = next(
+            (end for _, end, finished in readings if not finished), None
+        )
+
+        # Skip `save()` so this doesn't count as the book being updated.
+        Book.objects.filter(pk=self.pk).update(
+            latest_reading_start=self.latest_reading_start,
+            latest_reading_end=self.latest_reading_end,
+            latest_finished_end=self.latest_finished_end,
+            latest_unfinished_end=self.latest_unfinished_end,
+        )
+
 
 class BookCover(OrderedModel):
     image = models.ImageField(
@@ -356,8 +505,10 @@ class BookCover(OrderedModel):
     def save_cover_from_url(self, url):
         if url != "":
             try:
-                r = requests.get(url, headers={"User-Agent": "Stacks"})
-            except requests.exceptions.RequestException:
+                r = http_helpers.get(
+                    url, retries=0, timeout=http_helpers.INTERACTIVE_TIMEOUT
+                )
+            except httpx.HTTPError:
                 return False
 
             if r.status_code == 200:
@@ -477,20 +628,359 @@ class BookStatusChange(models.Model):
 
     class Meta:
         ordering = ["-changed_at"]
+        indexes = [
+            models.Index(
+                fields=["book", "changed_at"], name="book_status_change_changed_at"
+            ),
+        ]
 
     def __str__(self):
         return f"{date(self.changed_at, 'Y-m-d')} / {self.book} Changed from “{self.old_status}” to “{self.new_status}”"
 
 
+@receiver(post_save, sender=BookReading)
+@receiver(post_delete, sender=BookReading)
+def track_latest_reading(sender, instance, **kwargs):
+    instance.book.update_latest_reading()
+
+
 @receiver(pre_save, sender=Book)
 def track_status_changes(sender, instance, **kwargs):
-    try:
-        old_instance = sender.objects.get(pk=instance.pk)
-        if old_instance.status != instance.status:
-            BookStatusChange.objects.create(
-                book=old_instance,
-                old_status=old_instance.status,
-                new_status=instance.status,
+    old = getattr(instance, "_old", None)
+    if old and old.status != instance.status:
+        BookStatusChange.objects.create(
+            book=instance,
+            old_status=old.status,
+            new_status=instance.status,
+        )
+
+
+LIBRARY_STAT_FACETS = ("type", "genre", "format", "location", "author")
+
+
+def type_facet_keys(type_id):
+    if not type_id:
+        return set()
+
+    slug, parent_slug = BookType.objects.values_list("slug", "parent__slug").get(
+        pk=type_id
+    )
+    return {("type", slug)} | ({("type", parent_slug)} if parent_slug else set())
+
+
+def library_stat_keys(status, archived, facet_keys):
+    """The `(status, facet, slug)` counters a book adds one to."""
+    if archived:
+        return set()
+
+    return {(status, "status", "")} | {
+        (status, facet, slug) for facet, slug in facet_keys
+    }
+
+
+class LibraryStat(models.Model):
+    """
+    Running counts of a user's (unarchived) books for the status navigation
+    and filters, so they don't have to be counted on every page view.
+
+    `facet` is "status" (with an empty `slug`) for the total in each status,
+    otherwise a filter field with the option's slug (or the pk for authors).
+    Parent types and genres count every book in them or their children.
+
+    Rebuild with `./manage.py rebuild_library_stats`.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="library_stats"
+    )
+    status = models.CharField(max_length=20)
+    facet = models.CharField(max_length=20)
+    slug = models.CharField(max_length=100, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                "user",
+                "status",
+                "facet",
+                "slug",
+                name="library_stat_unique",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} / {self.status} / {self.facet} {self.slug}: {self.count}"
+
+    @classmethod
+    def adjust(cls, user_id, before, after):
+        """Add one to counters only in `after` and take one from those only in `before`."""
+        added = after - before
+        removed = before - after
+
+        if added:
+            cls.objects.bulk_create(
+                [
+                    cls(user_id=user_id, status=status, facet=facet, slug=slug)
+                    for status, facet, slug in added
+                ],
+                ignore_conflicts=True,
+            )
+            cls.objects.filter(cls._matching(user_id, added)).update(
+                count=F("count") + 1
+            )
+
+        if removed:
+            cls.objects.filter(cls._matching(user_id, removed)).update(
+                count=F("count") - 1
+            )
+
+    @classmethod
+    def add(cls, user_id, counts):
+        """
+        Add `{(status, facet, slug): count}` to counters all at once, for bulk
+        changes that would take a query per counter with `adjust`.
+        """
+        counts = {key: count for key, count in counts.items() if count}
+        if not counts:
+            return
+
+        with transaction.atomic():
+            stored = (
+                cls.objects.select_for_update()
+                .filter(
+                    user_id=user_id,
+                    status__in={status for status, _, _ in counts},
+                    facet__in={facet for _, facet, _ in counts},
+                    slug__in={slug for _, _, slug in counts},
+                )
+                .values_list("status", "facet", "slug", "count")
             )
-    except sender.DoesNotExist:
-        pass
+            totals = dict(counts)
+            for status, facet, slug, count in stored:
+                if (status, facet, slug) in totals:
+                    totals[(status, facet, slug)] += count
+
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        user_id=user_id,
+                        status=status,
+                        facet=facet,
+                        slug=slug,
+                        count=count,
+                    )
+                    for (status, facet, slug), count in totals.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["user", "status", "facet", "slug"],
+                update_fields=["count"],
+            )
+
+    @staticmethod
+    def _matching(user_id, keys):
+        return Q(user_id=user_id) & reduce(
+            or_,
+            (Q(status=status, facet=facet, slug=slug) for status, facet, slug in keys),
+        )
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+@receiver(m2m_changed, sender=Book.genre.through)
+@receiver(m2m_changed, sender=Book.format.through)
+@receiver(m2m_changed, sender=Book.location.through)
+def track_library_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    facet = {
+        Book.author.through: "author",
+        Book.genre.through: "genre",
+        Book.format.through: "format",
+        Book.location.through: "location",
+    }[sender]
+
+    if action in ("pre_add", "pre_remove", "pre_clear"):
+        if not reverse:
+            books = [instance]
+        elif pk_set is not None:
+            books = Book.objects.filter(pk__in=pk_set)
+        else:
+            books = Book.objects.filter(**{facet: instance})
+
+        instance._library_stat_keys = [
+            (book, book.facet_keys((facet,))) for book in books
+        ]
+
+    elif action in ("post_add", "post_remove", "post_clear"):
+        for book, before in getattr(instance, "_library_stat_keys", []):
+            LibraryStat.adjust(
+                book.user_id,
+                library_stat_keys(book.status, book.archived, before),
+                library_stat_keys(
+                    book.status, book.archived, book.facet_keys((facet,))
+                ),
+            )
+        instance._library_stat_keys = []
+
+
+@receiver(pre_delete, sender=Book)
+def remove_library_stats(sender, instance, **kwargs):
+    LibraryStat.adjust(
+        instance.user_id,
+        library_stat_keys(instance.status, instance.archived, instance.facet_keys()),
+        set(),
+    )
+
+
+@receiver(post_delete, sender=Author)
+def remove_author_stats(sender, instance, **kwargs):
+    # Deleting an author clears its m2m rows without `m2m_changed`.
+    LibraryStat.objects.filter(
+        user_id=instance.user_id, facet="author", slug=str(instance.pk)
+    ).delete()
+
+
+class OpenLibraryResponse(models.Model):
+    """
+    Recent answers from Open Library, so repeat searches and re-imports don't
+    go back over the network. Lives in the database so it's shared between
+    the web and Huey processes and survives restarts.
+
+    See `core.open_library_cache_helpers`.
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    value = models.JSONField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+
+class ImportJob(models.Model):
+    """
+    A CSV import from Goodreads or The StoryGraph. The counts go up as each
+    chunk of rows is imported, for a progress bar while it runs and the
+    history on the imports page after. The books it added link back to it.
+    `offset` is a checkpoint, saved with each chunk, to resume from.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="import_jobs")
+    source = models.CharField(
+        max_length=20,
+        choices=[
+            ("goodreads", "Goodreads"),
+            ("storygraph", "The StoryGraph"),
+        ],
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("queued", "Waiting to start"),
+            ("running", "Importing"),
+            ("finished", "Finished"),
+            ("failed", "Failed"),
+        ],
+        default="queued",
+    )
+    # The uploaded CSV in the "imports" storage, until it's done with.
+    file_name = models.CharField(max_length=255, blank=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_books = models.PositiveIntegerField(default=0)
+    # Already in the library, or earlier in the file.
+    skipped_rows = models.PositiveIntegerField(default=0)
+    # Without a title, say.
+    failed_rows = models.PositiveIntegerField(default=0)
+    open_library_requests = models.PositiveIntegerField(default=0)
+    # Where the next chunk starts in the file.
+    offset = models.PositiveBigIntegerField(default=0)
+    # Tries at the current chunk that failed, reset once one succeeds.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"], name="import_job_user_created_at"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Import for {self.user} / {date(self.created_at, 'Y-m-d H:i')}"
+
+    @property
+    def is_running(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at or not self.processed_rows:
+            return None
+
+        # `updated_at` is when the latest chunk finished.
+        seconds = (
+            (self.finished_at or self.updated_at) - self.started_at
+        ).total_seconds()
+        return self.processed_rows / seconds if seconds > 0 else None
+
+    def add_counts(
+        self, processed=0, created=0, skipped=0, failed=0, requests=0, offset=None
+    ):
+        """
+        Add a chunk's counts, without losing any from elsewhere. Pass the
+        chunk's end as `offset` to move the checkpoint along.
+        """
+        checkpoint = (
+            {} if offset is None else {"offset": offset, "attempts": 0, "error": ""}
+        )
+        ImportJob.objects.filter(pk=self.pk).update(
+            processed_rows=F("processed_rows") + processed,
+            created_books=F("created_books") + created,
+            skipped_rows=F("skipped_rows") + skipped,
+            failed_rows=F("failed_rows") + failed,
+            open_library_requests=F("open_library_requests") + requests,
+            updated_at=timezone.now(),
+            **checkpoint,
+        )
+        self.refresh_from_db()
+
+
+class ImportRow(models.Model):
+    """
+    A row an `ImportJob` has been through, by a fingerprint of its contents,
+    so rows are never imported twice: not when a job's resumed, nor when the
+    same file's imported again.
+    """
+
+    import_job = models.ForeignKey(
+        ImportJob, on_delete=models.CASCADE, related_name="rows"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("created", "Created"),
+            ("skipped", "Skipped"),
+            ("failed", "Failed"),
+        ],
+    )
+    book = models.ForeignKey(
+        Book, on_delete=models.SET_NULL, related_name="+", null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "fingerprint"], name="import_row_user_fingerprint"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} row of {self.import_job}"
@@ -0,0 +1,154 @@
+import hashlib
+import random
+import re
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Subquery
+from django.utils import timezone
+from .models import OpenLibraryResponse
+
+OPEN_LIBRARY_CACHE_TTL = timedelta(days=7)
+# Not finding anything is cached for less time, in case Open Library catches up.
+OPEN_LIBRARY_CACHE_EMPTY_TTL = timedelta(hours=1)
+# Errors only long enough to stop hammering Open Library while it's struggling.
+OPEN_LIBRARY_CACHE_ERROR_TTL = timedelta(minutes=5)
+OPEN_LIBRARY_CACHE_MAX_ENTRIES = 20000
+# Check the size of the cache on about one write in this many.
+OPEN_LIBRARY_CACHE_CULL_EVERY = 100
+OPEN_LIBRARY_CACHE_KINDS = ("search", "isbn")
+
+
+def make_key(kind, normalized):
+    key = f"{kind}:{normalized}"
+    if len(key) > OpenLibraryResponse._meta.get_field("key").max_length:
+        key = f"{kind}:{hashlib.sha256(normalized.encode()).hexdigest()}"
+    return key
+
+
+def search_key(query):
+    """
+    The cache key for a `search_open_library` query string like
+    "&title=The Hobbit&author=Tolkien", ignoring case, spacing and order.
+    """
+    params = sorted(
+        (name, " ".join(value.lower().split()))
+        for name, value in parse_qsl(query.lstrip("&"))
+    )
+    return make_key("search", urlencode(params))
+
+
+def isbn_key(isbn):
+    return make_key("isbn", re.sub(r"[^0-9X]", "", isbn.upper()))
+
+
+def response_ttl(value, is_empty):
+    if isinstance(value, dict) and "error" in value:
+        return OPEN_LIBRARY_CACHE_ERROR_TTL
+    if is_empty(value):
+        return OPEN_LIBRARY_CACHE_EMPTY_TTL
+    return OPEN_LIBRARY_CACHE_TTL
+
+
+def cached_response(key, fetch, is_empty=lambda value: not value):
+    """
+    The cached value for `key`, or the result of calling `fetch()` (which
+    must be JSON serializable), which is then cached. Results that are
+    empty or have an "error" are cached for less time.
+    """
+    cached = get_cached_responses([key])
+    if key in cached:
+        return cached[key]
+
+    value = fetch()
+    store_response(key, value, is_empty)
+    return value
+
+
+def get_cached_responses(keys):
+    """`{key: value}` for those of `keys` that are cached, in one query."""
+    keys = set(keys)
+    found = dict(
+        OpenLibraryResponse.objects.filter(
+            key__in=keys, expires_at__gt=timezone.now()
+        ).values_list("key", "value")
+    )
+
+    for kind in OPEN_LIBRARY_CACHE_KINDS:
+        hits = sum(1 for key in found if key.startswith(f"{kind}:"))
+        misses = sum(1 for key in keys if key.startswith(f"{kind}:")) - hits
+        if hits:
+            count_lookup(kind, "hits", hits)
+        if misses:
+            count_lookup(kind, "misses", misses)
+
+    return found
+
+
+def store_response(key, value, is_empty=lambda value: not value):
+    try:
+        OpenLibraryResponse.objects.update_or_create(
+            key=key,
+            defaults={
+                "value": value,
+                "expires_at": timezone.now() + response_ttl(value, is_empty),
+            },
+        )
+    except IntegrityError:
+        # Another process beat us to it, theirs is just as good.
+        pass
+
+    if random.randrange(OPEN_LIBRARY_CACHE_CULL_EVERY) == 0:
+        cull()
+
+
+def cull(max_entries=OPEN_LIBRARY_CACHE_MAX_ENTRIES):
+    """Drop expired responses, then the soonest to expire if there are too many."""
+    responses = OpenLibraryResponse.objects.all()
+    responses.filter(expires_at__lte=timezone.now()).delete()
+
+    if (excess := responses.count() - max_entries) > 0:
+        responses.filter(
+            pk__in=Subquery(responses.order_by("expires_at").values("pk")[:excess])
+        ).delete()
+
+
+def _stats_key(kind, outcome):
+    return f"open-library-cache:{kind}:{outcome}"
+
+
+def count_lookup(kind, outcome, count=1):
+    key = _stats_key(kind, outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        # Evicted in between, it'll start again next time.
+        pass
+
+
+def get_cache_stats():
+    """Hit and miss counts for each kind of lookup, plus how big the cache is."""
+    stats = {
+        kind: {
+            outcome: cache.get(_stats_key(kind, outcome), 0)
+            for outcome in ("hits", "misses")
+        }
+        for kind in OPEN_LIBRARY_CACHE_KINDS
+    }
+    stats["entries"] = OpenLibraryResponse.objects.count()
+    stats["expired"] = OpenLibraryResponse.objects.filter(
+        expires_at__lte=timezone.now()
+    ).count()
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(
+        [
+            _stats_key(kind, outcome)
+            for kind in OPEN_LIBRARY_CACHE_KINDS
+            for outcome in ("hits", "misses")
+        ]
+    )
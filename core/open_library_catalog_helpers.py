@@ -0,0 +1,301 @@
+import gzip
+import json
+import re
+import sqlite3
+from pathlib import Path
+from urllib.parse import parse_qsl
+from django.conf import settings
+
+CATALOG_LIMIT = 10
+# bm25 weights for the title and authors columns.
+CATALOG_WEIGHTS = (10.0, 5.0)
+CATALOG_BATCH_SIZE = 10000
+
+CATALOG_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS work (
+        id INTEGER PRIMARY KEY,
+        key TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        author_keys TEXT NOT NULL DEFAULT '[]',
+        authors TEXT NOT NULL DEFAULT '[]',
+        first_publish_year INTEGER,
+        pages INTEGER,
+        cover_id INTEGER,
+        cover_edition_key TEXT
+    );
+    CREATE TABLE IF NOT EXISTS edition (
+        key TEXT PRIMARY KEY,
+        work_key TEXT NOT NULL,
+        publish_year INTEGER,
+        pages INTEGER,
+        cover_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS edition_work_key ON edition (work_key);
+    CREATE TABLE IF NOT EXISTS author (
+        key TEXT PRIMARY KEY,
+        name TEXT NOT NULL
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS work_search USING fts5(
+        title,
+        authors,
+        content='work',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+"""
+
+INSERT_WORK_SQL = """
+    INSERT INTO work (key, title, author_keys, first_publish_year, cover_id)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        title = excluded.title,
+        author_keys = excluded.author_keys,
+        first_publish_year = excluded.first_publish_year,
+        cover_id = excluded.cover_id
+"""
+INSERT_EDITION_SQL = "INSERT OR REPLACE INTO edition VALUES (?, ?, ?, ?, ?)"
+INSERT_AUTHOR_SQL = "INSERT OR REPLACE INTO author VALUES (?, ?)"
+
+# Fill in what works get from their editions and authors, once everything's in.
+CATALOG_FINISH_SQL = """
+    UPDATE work SET authors = (
+        SELECT json_group_array(author.name)
+        FROM json_each(work.author_keys) author_key
+        JOIN author ON author.key = author_key.value
+    );
+
+    UPDATE work SET first_publish_year = (
+        SELECT min(year) FROM (
+            SELECT work.first_publish_year AS year
+            UNION ALL
+            SELECT publish_year FROM edition WHERE edition.work_key = work.key
+        )
+    );
+
+    -- The lower median, Open Library's `number_of_pages_median` near enough.
+    UPDATE work SET pages = (
+        SELECT pages FROM (
+            SELECT
+                pages,
+                row_number() OVER (ORDER BY pages) AS position,
+                count(*) OVER () AS total
+            FROM edition
+            WHERE edition.work_key = work.key AND pages > 0
+        )
+        WHERE position = (total + 1) / 2
+    );
+
+    -- Prefer an edition with the work's own cover.
+    UPDATE work SET cover_edition_key = coalesce(
+        (
+            SELECT min(key) FROM edition
+            WHERE edition.work_key = work.key AND edition.cover_id = work.cover_id
+        ),
+        (
+            SELECT min(key) FROM edition
+            WHERE edition.work_key = work.key AND edition.cover_id IS NOT NULL
+        )
+    );
+
+    UPDATE work SET cover_id = (
+        SELECT cover_id FROM edition WHERE edition.key = work.cover_edition_key
+    )
+    WHERE cover_id IS NULL;
+
+    INSERT INTO work_search(work_search) VALUES ('rebuild');
+    INSERT INTO work_search(work_search) VALUES ('optimize');
+"""
+
+
+def catalog_path():
+    return (
+        Path(settings.OPEN_LIBRARY_CATALOG) if settings.OPEN_LIBRARY_CATALOG else None
+    )
+
+
+def year(text):
+    if match := re.search(r"\b(\d{4})\b", str(text or "")):
+        return int(match[1])
+    return None
+
+
+def first_cover(data):
+    # Open Library marks removed covers with -1.
+    return next((cover for cover in data.get("covers", []) if cover > 0), None)
+
+
+def read_dump(path):
+    """
+    `(type, key, record)` for each line of an Open Library dump, which are
+    tab separated with the record as JSON in the last column. Gzipped dumps
+    are read as they are.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as lines:
+        for line in lines:
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) >= 5:
+                yield columns[0], columns[1], json.loads(columns[-1])
+
+
+def dump_type(path):
+    return next(read_dump(path), (None,))[0]
+
+
+def insert_many(connection, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CATALOG_BATCH_SIZE:
+            connection.executemany(sql, batch)
+            batch = []
+    connection.executemany(sql, batch)
+
+
+def build_catalog(paths, output=None, limit=None):
+    """
+    Build (or add to) the catalog at `output` from Open Library's separate
+    works, editions and authors dumps, in any order. With `limit`, only that
+    many works are taken, with just their editions and authors. Returns how
+    many of each were added.
+    """
+    output = output or catalog_path()
+    # Works decide which editions and authors are worth keeping.
+    order = ["/type/work", "/type/edition", "/type/author"]
+    paths = sorted(
+        ((kind, path) for path in paths if (kind := dump_type(path)) in order),
+        key=lambda kind_path: order.index(kind_path[0]),
+    )
+
+    counts = {"works": 0, "editions": 0, "authors": 0}
+    work_keys = set()
+    author_keys = set()
+
+    def works(records):
+        for kind, key, record in records:
+            if kind != "/type/work" or not record.get("title"):
+                continue
+            if limit is not None and counts["works"] >= limit:
+                return
+
+            keys = [
+                author["author"]["key"]
+                for author in record.get("authors", [])
+                if isinstance(author.get("author"), dict)
+            ]
+            work_keys.add(key)
+            author_keys.update(keys)
+            counts["works"] += 1
+            yield (
+                key,
+                record["title"],
+                json.dumps(keys),
+                year(record.get("first_publish_date")),
+                first_cover(record),
+            )
+
+    def editions(records):
+        for kind, key, record in records:
+            work = next(iter(record.get("works", [])), {}).get("key")
+            if kind != "/type/edition" or work not in work_keys:
+                continue
+
+            counts["editions"] += 1
+            pages = record.get("number_of_pages")
+            yield (
+                key,
+                work,
+                year(record.get("publish_date")),
+                pages if isinstance(pages, int) else None,
+                first_cover(record),
+            )
+
+    def authors(records):
+        for kind, key, record in records:
+            if (
+                kind != "/type/author"
+                or key not in author_keys
+                or not record.get("name")
+            ):
+                continue
+
+            counts["authors"] += 1
+            yield key, record["name"]
+
+    connection = sqlite3.connect(output)
+    try:
+        with connection:
+            connection.executescript(CATALOG_SCHEMA)
+            for kind, path in paths:
+                sql, rows = {
+                    "/type/work": (INSERT_WORK_SQL, works),
+                    "/type/edition": (INSERT_EDITION_SQL, editions),
+                    "/type/author": (INSERT_AUTHOR_SQL, authors),
+                }[kind]
+                insert_many(connection, sql, rows(read_dump(path)))
+            connection.executescript(CATALOG_FINISH_SQL)
+    finally:
+        connection.close()
+
+    return counts
+
+
+def catalog_match(query):
+    """
+    The FTS5 query for a `search_open_library` query string: title words in
+    the title, author words in the authors, and `q` words anywhere.
+    """
+    terms = []
+    for name, value in parse_qsl(query.lstrip("&")):
+        column = {"title": "title : ", "author": "authors : ", "q": ""}.get(name)
+        if column is not None:
+            terms += [f'{column}"{word}"' for word in re.findall(r"\w+", value)]
+
+    return " AND ".join(terms) or None
+
+
+def search_catalog(query, limit=CATALOG_LIMIT):
+    """
+    Open Library `search.json` style docs for a `search_open_library` query
+    from the local catalog, or None if there's no catalog or nothing in it.
+    """
+    path = catalog_path()
+    if not path or not path.exists() or not (match := catalog_match(query)):
+        return None
+
+    weights = ", ".join(str(weight) for weight in CATALOG_WEIGHTS)
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            f"""
+            SELECT
+                work.key, work.title, work.authors, work.first_publish_year,
+                work.pages, work.cover_id, work.cover_edition_key
+            FROM work_search
+            JOIN work ON work.id = work_search.rowid
+            WHERE work_search MATCH ?
+            ORDER BY bm25(work_search, {weights})
+            LIMIT ?
+            """,
+            [match, limit],
+        ).fetchall()
+    except sqlite3.Error:
+        # A half built or old catalog shouldn't stop anyone adding a book.
+        return None
+    finally:
+        connection.close()
+
+    docs = []
+    for key, title, authors, published, pages, cover_id, edition_key in rows:
+        doc = {
+            "key": key,
+            "title": title,
+            "author_name": json.loads(authors),
+            "first_publish_year": published,
+            "number_of_pages_median": pages,
+            "cover_i": cover_id,
+            "cover_edition_key": edition_key and edition_key.removeprefix("/books/"),
+        }
+        docs.append({name: value for name, value in doc.items() if value is not None})
+
+    return docs or None
@@ -0,0 +1,174 @@
+import asyncio
+import httpx
+from django.conf import settings
+from . import http_helpers
+from .cover_helpers import (
+    open_library_results,
+    open_library_search_error,
+    open_library_search_url,
+    parse_open_library_search,
+)
+from .import_helpers import resolve_isbns
+from .open_library_catalog_helpers import search_catalog
+from .open_library_cache_helpers import (
+    get_cached_responses,
+    search_key,
+    store_response,
+)
+
+
+async def fetch_search(client, limiter, breaker, query):
+    try:
+        response = await http_helpers.async_get(
+            client, open_library_search_url(query), limiter=limiter, breaker=breaker
+        )
+        response.raise_for_status()
+    except http_helpers.CircuitOpenError:
+        raise
+    except httpx.HTTPError as exc:
+        return open_library_search_error(exc)
+
+    return parse_open_library_search(response)
+
+
+async def fetch_all(fetches, concurrency, limiter, breaker):
+    """
+    Await each of `fetches` (`{key: fetch(client, limiter, breaker)}`), at
+    most `concurrency` at a time. Those skipped because `breaker` opened
+    come back as `CircuitOpenError`s. If `breaker` is probing, the first
+    fetch goes alone and the rest only follow if it works.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with http_helpers.make_async_client() as client:
+
+        async def run(fetch):
+            async with semaphore:
+                try:
+                    return await fetch(client, limiter, breaker)
+                except http_helpers.CircuitOpenError as exc:
+                    return exc
+
+        fetches_left = list(fetches.values())
+        values = []
+        if breaker.probing:
+            values.append(await run(fetches_left.pop(0)))
+
+        # `gather` keeps the order it was given.
+        values += await asyncio.gather(*[run(fetch) for fetch in fetches_left])
+
+    return dict(zip(fetches, values))
+
+
+def resolve_books(lookups, concurrency=None, rate=None):
+    """
+    Search Open Library for a batch of books at once. `lookups` is a list of
+    `(query, isbn)` pairs as used by `search_open_library` and
+    `resolve_isbns`, either of which may be None.
+
+    Returns `{"results": ..., "published_year": ...}` for each lookup, in the
+    same order. Cached answers are used, and new ones are cached, just like
+    the one at a time versions. ISBNs are looked up in bulk. Pass `rate` to
+    use a rate limit other than the one shared with the rest of this process.
+    """
+    concurrency = concurrency or settings.OPEN_LIBRARY_CONCURRENCY
+    limiter = (
+        http_helpers.open_library_limiter()
+        if rate is None
+        else http_helpers.RateLimiter(rate)
+    )
+
+    years = resolve_isbns(isbn for _, isbn in lookups if isbn)
+
+    # The local catalog first, it's quicker than even the cache.
+    found = {}
+    fetches = {}
+    for query, _ in lookups:
+        if not query or (key := search_key(query)) in found or key in fetches:
+            continue
+        if docs := search_catalog(query):
+            found[key] = open_library_results({"docs": docs})
+        else:
+            fetches[key] = lambda client, limiter, breaker, query=query: (
+                fetch_search(client, limiter, breaker, query)
+            )
+
+    # Database work happens outside the event loop, Django won't allow it inside.
+    found |= get_cached_responses(fetches)
+    missing = {key: fetch for key, fetch in fetches.items() if key not in found}
+    if missing:
+        breaker = http_helpers.open_library_breaker()
+        try:
+            breaker.check()
+        except http_helpers.CircuitOpenError:
+            # Everything fails fast below.
+            pass
+
+        fetched = asyncio.run(fetch_all(missing, concurrency, limiter, breaker))
+        breaker.save()
+
+        for key, value in fetched.items():
+            if isinstance(value, http_helpers.CircuitOpenError):
+                # Not worth caching, Open Library could be back any moment.
+                found[key] = open_library_search_error(value)
+            else:
+                store_response(key, value)
+                found[key] = value
+
+    return [
+        {
+            "results": found[search_key(query)] if query else None,
+            "published_year": years.get(isbn) if isbn else None,
+        }
+        for query, isbn in lookups
+    ]
+
+
+async def fetch_cover(client, limiter, breaker, url):
+    try:
+        response = await http_helpers.async_get(
+            client, url, limiter=limiter, breaker=breaker
+        )
+    except http_helpers.CircuitOpenError:
+        raise
+    except httpx.HTTPError:
+        return None
+
+    return response.content if response.status_code == 200 else None
+
+
+def download_covers(urls, concurrency=None):
+    """
+    `{url: image}` for each of `urls`, with the image's bytes, or None if it
+    couldn't be downloaded. Several are downloaded at once, rate limited and
+    behind the circuit breaker like `resolve_books`.
+    """
+    fetches = {
+        url: lambda client, limiter, breaker, url=url: (
+            fetch_cover(client, limiter, breaker, url)
+        )
+        for url in urls
+    }
+    if not fetches:
+        return {}
+
+    breaker = http_helpers.open_library_breaker()
+    try:
+        breaker.check()
+    except http_helpers.CircuitOpenError:
+        pass
+
+    fetched = asyncio.run(
+        fetch_all(
+            fetches,
+            concurrency or settings.OPEN_LIBRARY_CONCURRENCY,
+            http_helpers.open_library_limiter(),
+            breaker,
+        )
+    )
+    breaker.save()
+
+    return {
+        url: None if isinstance(image, http_helpers.CircuitOpenError) else image
+        for url, image in fetched.items()
+    }
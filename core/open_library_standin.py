@@ -0,0 +1,217 @@
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+from collections import Counter
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from PIL import Image
+
+RECORDINGS = Path(__file__).parent / "open_library_recordings"
+
+
+def stable_number(text, digits=7):
+    """A number that's always the same for `text`, for made up ids."""
+    return int(hashlib.sha256(text.encode()).hexdigest(), 16) % 10**digits
+
+
+def stable_fraction(text):
+    """Between 0 and 1, and always the same for `text`."""
+    return stable_number(text, digits=9) / 10**9
+
+
+class OpenLibraryStandIn:
+    """
+    A local HTTP server that answers like Open Library's `search.json`,
+    `api/books` and covers, for tests and benchmarks that shouldn't touch
+    the network. Point `OPEN_LIBRARY_URL` and
+    `OPEN_LIBRARY_COVERS_URL` at its `url`.
+
+    Recorded titles and ISBNs get the recorded answer, anything else gets one
+    made up from the title or ISBN, except for ISBNs starting "000", which
+    aren't found. `latency` (seconds, plus up to `jitter` more), `error_rate`
+    (0 to 1, answered with a 503), `docs` (results per search) and
+    `cover_size` (pixels) can be changed with `configure()`.
+
+    Whether a request fails, and its jitter, depend only on `seed`, the path
+    and how many times it's been asked for, so runs repeat exactly however
+    many requests are in flight.
+    """
+
+    defaults = {
+        "latency": 0,
+        "jitter": 0,
+        "error_rate": 0,
+        "docs": 10,
+        "cover_size": (300, 450),
+        "seed": 1,
+    }
+
+    def __init__(self, **options):
+        self.recorded_search = json.loads((RECORDINGS / "search.json").read_text())
+        self.recorded_edition = json.loads((RECORDINGS / "isbn.json").read_text())
+        self.server = None
+        self.lock = threading.Lock()
+        self.configure(**options)
+
+    def configure(self, **options):
+        """Set options (others go back to their defaults) and forget requests."""
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise TypeError(f"Unknown options: {', '.join(sorted(unknown))}")
+
+        self.options = {**self.defaults, **options}
+        self.requests = []
+        self.attempts = Counter()
+        self._cover = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"  # noqa: E231
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, content_type, body = standin.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, path):
+        """`(status, content type, body)` for a GET of `path`."""
+        with self.lock:
+            self.requests.append(path)
+            self.attempts[path] += 1
+            attempt = f"{self.options['seed']}:{path}:{self.attempts[path]}"
+
+        delay = self.options["latency"] + self.options["jitter"] * stable_fraction(
+            f"jitter:{attempt}"
+        )
+        failed = stable_fraction(f"error:{attempt}") < self.options["error_rate"]
+
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, "text/plain", b"Service Unavailable"
+
+        url = urlsplit(path)
+        if url.path == "/search.json":
+            return self.json(self.search(parse_qs(url.query)))
+        if url.path == "/api/books":
+            return self.json(self.books(parse_qs(url.query)))
+        if re.fullmatch(r"/b/(id|olid)/[\w-]+\.jpg", url.path):
+            return 200, "image/jpeg", self.cover()
+        return 404, "text/plain", b"Not Found"
+
+    def json(self, data):
+        return 200, "application/json", json.dumps(data).encode()
+
+    def search(self, params):
+        title = params.get("title", params.get("q", [""]))[0]
+        author = params.get("author", [None])[0]
+        limit = min(int(params.get("limit", [100])[0]), self.options["docs"])
+
+        recorded = [
+            doc
+            for doc in self.recorded_search["docs"]
+            if doc["title"].lower() == title.lower()
+        ]
+        docs = recorded or [self.made_up_doc(title, author)]
+        # Other editions and companions, like a real search turns up.
+        docs += [self.made_up_doc(f"{title} ({i})", author) for i in range(1, limit)]
+        docs = docs[:limit]
+
+        return {
+            **self.recorded_search,
+            "numFound": len(docs),
+            "num_found": len(docs),
+            "docs": docs,
+            "q": title,
+        }
+
+    def made_up_doc(self, title, author):
+        number = stable_number(title)
+        return {
+            **self.recorded_search["docs"][0],
+            "author_name": [author] if author else [],
+            "cover_edition_key": f"OL{number}M",
+            "cover_i": number,
+            "first_publish_year": 1900 + number % 125,
+            "key": f"/works/OL{number}W",
+            "number_of_pages_median": 100 + number % 500,
+            "title": title,
+        }
+
+    def edition(self, isbn):
+        isbn = isbn.replace("-", "")
+        if isbn.startswith("000"):
+            return None
+        if isbn in self.recorded_edition["isbn_13"] + self.recorded_edition["isbn_10"]:
+            return self.recorded_edition
+
+        number = stable_number(isbn)
+        return {
+            **self.recorded_edition,
+            "isbn_13": [isbn],
+            "isbn_10": [],
+            "key": f"/books/OL{number}M",
+            "publish_date": str(1900 + number % 125),
+            "title": f"Edition {isbn}",
+        }
+
+    def books(self, params):
+        """The books API with `jscmd=data`, for ISBNs only."""
+        books = {}
+        for bibkey in params.get("bibkeys", [""])[0].split(","):
+            kind, _, isbn = bibkey.partition(":")
+            if kind == "ISBN" and (edition := self.edition(isbn)):
+                books[bibkey] = {
+                    "url": f"{self.url}{edition['key']}",
+                    "key": edition["key"],
+                    "title": edition["title"],
+                    "number_of_pages": edition["number_of_pages"],
+                    "publish_date": edition["publish_date"],
+                    "identifiers": {"isbn_13": edition["isbn_13"]},
+                }
+        return books
+
+    def cover(self):
+        if self._cover is None:
+            width, height = self.options["cover_size"]
+            # Noise, so the image is about as big as a real cover of that size.
+            noise = random.Random(self.options["seed"]).randbytes(width * height * 3)
+            image = Image.frombytes("RGB", (width, height), noise)
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=85)
+            self._cover = buffer.getvalue()
+
+        return self._cover
@@ -0,0 +1,108 @@
+import json
+import datetime
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+
+def encode_cursor(values):
+    """Turn the sort values of the last item on a page into an opaque string."""
+    data = json.dumps(values, default=_isoformat, separators=(",", ":"))
+    return urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def _isoformat(value):
+    # Unlike `DjangoJSONEncoder`, keep microseconds so ties can't slip through.
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Can't put {type(value).__name__} in a cursor")
+
+
+def decode_cursor(cursor):
+    """The sort values from `encode_cursor`, or `None` if it's missing or bogus."""
+    if not cursor:
+        return None
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        return None
+
+    return values if isinstance(values, list) else None
+
+
+def keyset_order(ordering):
+    """
+    `order_by()` arguments for `ordering`, a list of `(field, descending)`
+    pairs. Empty values always go last so they can be paged through too.
+    """
+    return [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in ordering
+    ]
+
+
+def keyset_filter(ordering, values):
+    """A `Q` for everything that comes after `values` in `ordering`."""
+    (field, descending), *rest = ordering
+    value, *rest_values = values
+    later = "lt" if descending else "gt"
+
+    if value is None:
+        # Empty values are last, so only other empty values can follow.
+        after = Q()
+    else:
+        after = Q(**{f"{field}__{later}": value}) | Q(**{f"{field}__isnull": True})
+
+    if not rest:
+        return after if value is not None else Q(pk__in=[])
+
+    same = Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+    tied = same & keyset_filter(rest, rest_values)
+
+    return tied if value is None else after | tied
+
+
+def keyset_queryset(queryset, ordering, cursor):
+    """`queryset` sorted by `ordering`, starting after `cursor` if there is one."""
+    queryset = queryset.order_by(*keyset_order(ordering))
+
+    if (values := decode_cursor(cursor)) and len(values) == len(ordering):
+        try:
+            queryset = queryset.filter(keyset_filter(ordering, values))
+        except ValidationError:
+            # Someone's been fiddling with the cursor, start from the top.
+            pass
+
+    return queryset
+
+
+def keyset_slice(items, ordering, per_page):
+    """
+    Split `per_page + 1` sorted items into a page and the cursor for the page
+    after it (or `None` if this is the last one).
+    """
+    if len(items) <= per_page:
+        return items, None
+
+    items = items[:per_page]
+    return items, encode_cursor(
+        [_sort_value(items[-1], field) for field, descending in ordering]
+    )
+
+
+def keyset_page(queryset, ordering, cursor, per_page):
+    """
+    Return a page of `queryset` sorted by `ordering` (which should end with a
+    unique field like `pk`) starting after `cursor`, plus the cursor for the
+    page after it.
+    """
+    items = list(keyset_queryset(queryset, ordering, cursor)[: per_page + 1])
+    return keyset_slice(items, ordering, per_page)
+
+
+def _sort_value(item, field):
+    if isinstance(item, dict):
+        return item[field]
+    return getattr(item, field)
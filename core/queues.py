@@ -0,0 +1,35 @@
+from functools import wraps
+from django.conf import settings
+from django.db import close_old_connections
+from huey.utils import load_class
+
+
+def make_huey(config):
+    """A Huey instance from a dict like `settings.HUEY`."""
+    config = {key: value for key, value in config.items() if key != "consumer"}
+    huey_class = load_class(config.pop("huey_class", "huey.SqliteHuey"))
+    return huey_class(config.pop("name"), **config)
+
+
+COVERS_HUEY = make_huey(settings.COVERS_HUEY)
+
+
+def cover_task(*args, **kwargs):
+    """`db_task()`, but on `COVERS_HUEY` rather than the main queue."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def inner(*a, **k):
+            if not COVERS_HUEY.immediate:
+                close_old_connections()
+            try:
+                return fn(*a, **k)
+            finally:
+                if not COVERS_HUEY.immediate:
+                    close_old_connections()
+
+        task = COVERS_HUEY.task(*args, **kwargs)(inner)
+        task.call_local = fn
+        return task
+
+    return decorator
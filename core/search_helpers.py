@@ -0,0 +1,261 @@
+import re
+from django.db import connection
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from .models import Author, Book, BookNote, BookReading, Series
+from .trigram_helpers import TRIGRAM_FIELDS, forget_trigram_index, get_trigram_index
+
+# An SQLite FTS5 table with one row per book, author and series. The rowid is
+# `object_id * SEARCH_KIND_COUNT + kind`, so a row can be found without a scan.
+SEARCH_TABLE = "core_search"
+SEARCH_KIND_COUNT = 4
+SEARCH_KINDS = {
+    # model: (kind, field to fall back to `icontains` on)
+    Book: (0, "title"),
+    Author: (1, "name"),
+    Series: (2, "title"),
+}
+SEARCH_LIMIT = 50
+# bm25 weights for the user_id, title, authors and body columns.
+SEARCH_WEIGHTS = (0.0, 10.0, 5.0, 1.0)
+
+# Books are indexed with their authors' names, notes and reviews.
+INDEX_BOOKS_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, user_id, title, authors, body)
+    SELECT
+        book.id * {SEARCH_KIND_COUNT},
+        book.user_id,
+        book.title,
+        coalesce((
+            SELECT group_concat(author.name, ' ')
+            FROM core_book_author book_author
+            JOIN core_author author ON author.id = book_author.author_id
+            WHERE book_author.book_id = book.id
+        ), ''),
+        coalesce((
+            SELECT group_concat(text, ' ') FROM core_booknote WHERE book_id = book.id
+        ), '') || ' ' || coalesce((
+            SELECT group_concat(review, ' ') FROM core_bookreading WHERE book_id = book.id
+        ), '')
+    FROM core_book book
+"""
+INDEX_AUTHORS_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, user_id, title, authors, body)
+    SELECT author.id * {SEARCH_KIND_COUNT} + 1, author.user_id, '', author.name, author.bio
+    FROM core_author author
+"""
+INDEX_SERIES_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, user_id, title, authors, body)
+    SELECT series.id * {SEARCH_KIND_COUNT} + 2, series.user_id, series.title, '', series.description
+    FROM core_series series
+"""
+INDEX_SQL = {
+    Book: INDEX_BOOKS_SQL,
+    Author: INDEX_AUTHORS_SQL,
+    Series: INDEX_SERIES_SQL,
+}
+
+
+def search_enabled():
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query):
+    """
+    Turn what someone typed into an FTS5 query matching every word, with the
+    last one as a prefix so "hobb" finds "The Hobbit".
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+
+    return " ".join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def search_ids(model, user, query, limit=SEARCH_LIMIT, queryset=None):
+    """
+    The ids of `user`'s objects of `model` matching `query`, best first. With
+    a `queryset`, only its objects count, filtered before the `limit`.
+    """
+    if not (match := match_expression(query)):
+        return []
+
+    kind = SEARCH_KINDS[model][0]
+    weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+    within = ""
+    within_params = []
+    if queryset is not None:
+        sql, within_params = queryset.values("pk").query.sql_with_params()
+        within = f"AND rowid / {SEARCH_KIND_COUNT} IN ({sql})"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH %s AND user_id = %s AND rowid %% %s = %s
+            {within}
+            ORDER BY bm25({SEARCH_TABLE}, {weights})
+            LIMIT %s
+            """,
+            [match, user.pk, SEARCH_KIND_COUNT, kind, *within_params, limit],
+        )
+        return [rowid // SEARCH_KIND_COUNT for (rowid,) in cursor.fetchall()]
+
+
+def search_library(queryset, user, query, limit=SEARCH_LIMIT, fuzzy=True):
+    """
+    The objects in `queryset` (books, authors or series) matching `query`,
+    best first. Falls back to `icontains` on databases without FTS5. With
+    `fuzzy`, books and authors with near-miss spellings are added at the end.
+    """
+    if search_enabled():
+        ids = search_ids(queryset.model, user, query, limit, queryset)
+        found = queryset.in_bulk(ids)
+        results = [found[pk] for pk in ids if pk in found]
+    else:
+        field = SEARCH_KINDS[queryset.model][1]
+        results = list(queryset.filter(**{f"{field}__icontains": query})[:limit])
+
+    if fuzzy and queryset.model in TRIGRAM_FIELDS and len(results) < limit:
+        seen = {result.pk for result in results}
+        # Every near miss, since `queryset` may leave out any number of them.
+        ids = [
+            pk
+            for pk in get_trigram_index(user, queryset.model).search(query, None)
+            if pk not in seen
+        ]
+        allowed = set(queryset.filter(pk__in=ids).values_list("pk", flat=True))
+        ids = [pk for pk in ids if pk in allowed][: limit - len(results)]
+        found = queryset.in_bulk(ids)
+        results += [found[pk] for pk in ids if pk in found]
+
+    return results
+
+
+def unindex(model, ids):
+    kind = SEARCH_KINDS[model][0]
+    rowids = [pk * SEARCH_KIND_COUNT + kind for pk in ids]
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(rowid,) for rowid in rowids],
+        )
+
+
+def index(model, ids):
+    """(Re)index the given books, authors or series from the database."""
+    ids = list(ids)
+    if not ids or not search_enabled():
+        return
+
+    unindex(model, ids)
+    placeholders = ", ".join(["%s"] * len(ids))
+    table = model._meta.db_table.replace("core_", "")
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"{INDEX_SQL[model]} WHERE {table}.id IN ({placeholders})",
+            ids,
+        )
+
+
+def rebuild_search_index():
+    """Throw away the whole search index and fill it again."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        for sql in INDEX_SQL.values():
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+
+
+@receiver(pre_save, sender=Author)
+def remember_saved_name(sender, instance, **kwargs):
+    # So `post_save` can tell whether anything searchable actually changed.
+    instance._search_saved = (
+        sender.objects.filter(pk=instance.pk).values_list("name").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, created, **kwargs):
+    # As it was before, fetched by `Book.save()`.
+    old = getattr(instance, "_old", None)
+
+    # Books are saved on every status change, skip them if nothing we index moved.
+    if created or not old or old.title != instance.title:
+        index(Book, [instance.pk])
+    elif old.archived == instance.archived:
+        return
+
+    forget_trigram_index(instance.user_id)
+
+
+@receiver(post_save, sender=Author)
+def index_author(sender, instance, created, **kwargs):
+    saved = getattr(instance, "_search_saved", None)
+    if not created and saved and saved[0] == instance.name:
+        index(Author, [instance.pk])
+        return
+
+    if not created:
+        index(Book, instance.book_set.values_list("pk", flat=True))
+    index(Author, [instance.pk])
+    forget_trigram_index(instance.user_id)
+
+
+@receiver(post_save, sender=Series)
+def index_series(sender, instance, **kwargs):
+    index(Series, [instance.pk])
+
+
+@receiver(post_save, sender=BookNote)
+@receiver(post_delete, sender=BookNote)
+@receiver(post_save, sender=BookReading)
+@receiver(post_delete, sender=BookReading)
+def index_book_text(sender, instance, **kwargs):
+    index(Book, [instance.book_id])
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+def index_book_authors(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            index(Book, [instance.pk])
+    elif action == "pre_clear":
+        remember_author_books(Author, instance)
+    elif action == "post_clear":
+        index(Book, instance._search_book_ids)
+    elif action in ("post_add", "post_remove"):
+        index(Book, pk_set)
+
+
+@receiver(pre_delete, sender=Author)
+def remember_author_books(sender, instance, **kwargs):
+    # Deleting an author clears its books without sending `m2m_changed`.
+    instance._search_book_ids = list(instance.book_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Series)
+def unindex_deleted(sender, instance, **kwargs):
+    if sender in TRIGRAM_FIELDS:
+        forget_trigram_index(instance.user_id)
+
+    if not search_enabled():
+        return
+
+    unindex(sender, [instance.pk])
+    if sender is Author:
+        index(Book, getattr(instance, "_search_book_ids", []))
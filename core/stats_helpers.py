@@ -0,0 +1,202 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .filter_helpers import count_by_item, get_filter_counts
+from .models import (
+    Book,
+    BookFormat,
+    BookGenre,
+    BookLocation,
+    BookType,
+    LibraryStat,
+    User,
+)
+from .taxonomy_helpers import TAXONOMY_MODELS, get_taxonomies
+
+
+def get_library_counts(user, status, facets):
+    """
+    Read `status_counts` and unfiltered `filter_counts` for a status page from
+    `LibraryStat` in one query. `facets` maps a filter field to its options,
+    the same as `get_facet_counts`.
+    """
+    counts = {}
+    status_counts = {}
+
+    for stat in LibraryStat.objects.filter(
+        Q(facet="status") | Q(status=status), user=user
+    ):
+        if stat.facet == "status":
+            if stat.count:
+                status_counts[stat.status] = stat.count
+        elif stat.status == status:
+            counts[(stat.facet, stat.slug)] = stat.count
+
+    filter_counts = {}
+    for field_name, items in facets.items():
+        items = list(items)
+
+        if items and hasattr(items[0], "parent"):
+            filter_counts[field_name] = {
+                parent.slug: {
+                    "count": counts.get((field_name, parent.slug), 0),
+                    "sub_items": {
+                        child.slug: counts.get((field_name, child.slug), 0)
+                        for child in items
+                        if child.parent_id == parent.pk
+                    },
+                }
+                for parent in items
+                if parent.parent_id is None
+            }
+        else:
+            filter_counts[field_name] = {
+                item.slug: counts.get((field_name, item.slug), 0) for item in items
+            }
+
+    return status_counts, filter_counts
+
+
+def get_status_counts(user):
+    """`{status: book_count}` for the status nav, skipping empty statuses."""
+    return dict(
+        LibraryStat.objects.filter(user=user, facet="status", count__gt=0).values_list(
+            "status", "count"
+        )
+    )
+
+
+def count_library_stats(user, facets):
+    """Count every `LibraryStat` for a user from scratch."""
+    expected = {}
+    books = Book.objects.filter(user=user, archived=False)
+
+    for status in books.values_list("status", flat=True).distinct():
+        status_books = books.filter(status=status)
+        expected[(status, "status", "")] = status_books.count()
+
+        for field_name, items in facets.items():
+            for slug, count in get_filter_counts(
+                status_books, items, field_name
+            ).items():
+                if isinstance(count, dict):
+                    expected[(status, field_name, slug)] = count["count"]
+                    for sub_slug, sub_count in count["sub_items"].items():
+                        expected[(status, field_name, sub_slug)] = sub_count
+                else:
+                    expected[(status, field_name, slug)] = count
+
+        for pk, count in count_by_item(status_books, "author").items():
+            expected[(status, "author", str(pk))] = count
+
+    return {key: count for key, count in expected.items() if count}
+
+
+def rebuild_library_stats(user, facets=None, check=False):
+    """
+    Recount a user's `LibraryStat` rows, returning the ones that had drifted as
+    `{(status, facet, slug): (stored, actual)}`. With `check`, nothing is saved.
+    """
+    expected = count_library_stats(user, facets or get_taxonomies())
+    stored = {
+        (stat.status, stat.facet, stat.slug): stat.count
+        for stat in LibraryStat.objects.filter(user=user)
+        if stat.count
+    }
+    drift = {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+    if drift and not check:
+        with transaction.atomic():
+            LibraryStat.objects.filter(user=user).delete()
+            LibraryStat.objects.bulk_create(
+                LibraryStat(
+                    user=user, status=status, facet=facet, slug=slug, count=count
+                )
+                for (status, facet, slug), count in expected.items()
+            )
+
+    return drift
+
+
+def stat_fields(item):
+    """The fields of a taxonomy item that decide which counters it's in."""
+    return ["slug", "parent_id"] if hasattr(item, "parent") else ["slug"]
+
+
+def taxonomy_stat_users(item):
+    """
+    Users with books counted under a taxonomy item: those in it, or (for a
+    parent type or genre) in one of its children.
+    """
+    field_name = next(
+        name for name, model in TAXONOMY_MODELS.items() if isinstance(item, model)
+    )
+    pks = [item.pk]
+    if hasattr(item, "parent"):
+        pks += type(item).objects.filter(parent=item).values_list("pk", flat=True)
+
+    return list(
+        User.objects.filter(
+            pk__in=Book.objects.filter(**{f"{field_name}__in": pks}).values("user_id")
+        )
+    )
+
+
+def rebuild_stats_for(users):
+    facets = get_taxonomies()
+    for user in users:
+        rebuild_library_stats(user, facets)
+
+
+# Renaming a taxonomy item or moving it to another parent changes which
+# counters its books are in, and deleting it clears `Book.type` or the m2m
+# rows without `m2m_changed`, so the users whose books it had are recounted.
+# These receivers are connected after `invalidate_taxonomies`, so the
+# recount sees the new taxonomy.
+
+
+@receiver(pre_save, sender=BookType)
+@receiver(pre_save, sender=BookGenre)
+@receiver(pre_save, sender=BookFormat)
+@receiver(pre_save, sender=BookLocation)
+def remember_stat_fields(sender, instance, **kwargs):
+    instance._saved_stat_fields = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list(*stat_fields(instance))
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=BookType)
+@receiver(post_save, sender=BookGenre)
+@receiver(post_save, sender=BookFormat)
+@receiver(post_save, sender=BookLocation)
+def recount_changed_taxonomy(sender, instance, created, **kwargs):
+    before = getattr(instance, "_saved_stat_fields", None)
+    if created or before is None:
+        return
+    if before != tuple(getattr(instance, field) for field in stat_fields(instance)):
+        rebuild_stats_for(taxonomy_stat_users(instance))
+
+
+@receiver(pre_delete, sender=BookType)
+@receiver(pre_delete, sender=BookGenre)
+@receiver(pre_delete, sender=BookFormat)
+@receiver(pre_delete, sender=BookLocation)
+def remember_stat_users(sender, instance, **kwargs):
+    instance._stat_users = taxonomy_stat_users(instance)
+
+
+@receiver(post_delete, sender=BookType)
+@receiver(post_delete, sender=BookGenre)
+@receiver(post_delete, sender=BookFormat)
+@receiver(post_delete, sender=BookLocation)
+def recount_deleted_taxonomy(sender, instance, **kwargs):
+    rebuild_stats_for(getattr(instance, "_stat_users", []))
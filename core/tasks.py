@@ -1,202 +1,98 @@
+from itertools import islice
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from dateutil import parser
-from datetime import date
+from django.utils import timezone
 from huey.contrib.djhuey import db_task
-from .models import User, Book, BookCover, BookReading, Author
+from .models import ImportJob
 from .utils import pluralize
-from .cover_helpers import search_open_library
-from .import_helpers import (
-    goodreads_status,
-    the_storygraph_status,
-    published_year_from_isbn,
-)
+from .bulk_import_helpers import IMPORT_CHUNK_SIZE, csv_rows, import_rows
+from .import_helpers import csv_source
 
+# A chunk that fails is tried this many more times, waiting twice as long
+# (starting with this many seconds) each time.
+IMPORT_RETRIES = 3
+IMPORT_RETRY_DELAY = 30
 
-@db_task()
-def import_single_book(row, user_id):
-    user = get_object_or_404(User, id=user_id)
-    main_author = None
-    additional_authors = []
-    authors = []
-
-    if row.get("Author"):
-        # Goodreads
-        main_author, created_author = Author.objects.get_or_create(
-            name=row["Author"],
-            user=user,
-        )
-
-        if row.get("Additional Authors", "").strip():
-            for author in row["Additional Authors"].split(","):
-                new_author, created_additional_author = Author.objects.get_or_create(
-                    name=author,
-                    user=user,
-                )
-                additional_authors.append(new_author)
-
-    if row.get("Authors"):
-        # The StoryGraph
-        for author in row["Authors"].split(","):
-            new_author, created_new_author = Author.objects.get_or_create(
-                name=author,
-                user=user,
-            )
-            authors.append(new_author)
-
-    if row.get("Exclusive Shelf") or row.get("Bookshelves"):
-        status = goodreads_status(
-            row["Exclusive Shelf"]
-            if row.get("Exclusive Shelf")
-            else row.get("Bookshelves") if row.get("Bookshelves") else "to-read"
-        )
-    elif row.get("Read Status"):
-        status = the_storygraph_status(
-            row["Read Status"] if row.get("Read Status") else "to-read"
-        )
-    else:
-        status = "wishlist"
-
-    published_year = (
-        row.get("Original Publication Year")
-        if row.get("Original Publication Year")
-        else row.get("Year Published") if row.get("Year Published") else None
-    )
-
-    if not published_year and row.get("ISBN/UID"):
-        published_year = published_year_from_isbn(row["ISBN/UID"])
-
-    book, created_book = Book.objects.get_or_create(
-        title=row["Title"],
-        user=user,
-        defaults={
-            "status": status,
-            "published_year": published_year,
-        },
-    )
-
-    # This is a book we didn't already have
-    if created_book:
-        book.imported = True
-        book.save()
-        if main_author:
-            # Goodreads
-            book.author.add(main_author.id)
-
-        if additional_authors:
-            # Goodreads
-            book.author.add(*additional_authors)
-
-        if authors:
-            # The StoryGraph
-            book.author.add(*authors)
 
-        # Download a cover from Open Library
-        cover_author = main_author if main_author else authors[0] if authors else None
-        if cover_author:
-            results = search_open_library(
-                f"&title={book.title}&author={cover_author.name}"
+@db_task()
+def import_books_from_csv(import_job_id, offset=0):
+    """
+    Import a chunk of rows from an `ImportJob`'s CSV, from `offset` on, then
+    queue the rest behind everyone else's tasks, so a big import never keeps
+    a worker to itself or waits on other tasks. The last chunk sends the
+    email and deletes the file.
+
+    A chunk's books and rows are saved with the job's checkpoint, or not at
+    all, so the job can be picked up from there (see `resume_imports`). A
+    chunk that fails is tried again later. Tasks for anywhere else than the
+    checkpoint are stale copies and do nothing.
+    """
+    job = get_object_or_404(ImportJob, id=import_job_id)
+    if not job.is_running or offset != job.offset:
+        return
+
+    storage = storages["imports"]
+    attempts = job.attempts
+
+    try:
+        with storage.open(job.file_name, "rb") as file:
+            if job.status == "queued":
+                first = next(csv_rows(file), None)
+                job.source = csv_source(first[0]) if first else ""
+                # Counted up front for the progress bar.
+                job.total_rows = sum(1 for _ in csv_rows(file))
+                job.status = "running"
+                job.started_at = timezone.now()
+                job.save(update_fields=["source", "total_rows", "status", "started_at"])
+
+            chunk = list(islice(csv_rows(file, offset), IMPORT_CHUNK_SIZE))
+
+        rows = [row for row, _ in chunk]
+        with transaction.atomic():
+            # Another copy of this task may have just done the chunk.
+            if not ImportJob.objects.filter(pk=job.pk, offset=offset).update(
+                updated_at=timezone.now()
+            ):
+                return
+            counts = import_rows(rows, job.user, import_job=job)
+            job.add_counts(
+                processed=len(rows),
+                offset=chunk[-1][1] if chunk else offset,
+                **counts,
             )
-        else:
-            results = search_open_library(f"&title={book.title}")
-
-        if results:
-            if isinstance(results, dict):
-                # If there's only one result, it's a dict
-                r = results
-            else:
-                # Get the first one and hope for the best
-                r = results[0]
-
-            olid = r.get("olid")
-            if olid:
-                book.olid = olid
-                book.save()
-
-            if "cover" in r:
-                new_cover = BookCover.objects.create(
-                    book=book,
-                )
-                saved_cover = new_cover.save_cover_from_url(r["cover"])
-                if not saved_cover:
-                    new_cover.delete()
-
-        # Set reading based on the status
-        if status == "reading":
-            reading = BookReading.objects.create(
-                book=book,
-                start_date=parser.parse(row.get("Date Added")),
+    except Exception as exc:
+        if attempts < IMPORT_RETRIES:
+            ImportJob.objects.filter(pk=job.pk).update(
+                attempts=F("attempts") + 1, error=repr(exc)
             )
-            reading.save()
-
-        if status == "finished":
-            # First, try to get a "Dates Read" (The StoryGraph) field with content like:
-            # 2023/10/28-2024/01/24
-
-            if dates_read := row.get("Dates Read"):
-                try:
-                    start_date, end_date = dates_read.split("-")
-                    start_date = parser.parse(start_date)
-                    end_date = parser.parse(end_date)
-                except ValueError:
-                    start_date = dates_read
-                    end_date = None
-
-                reading = BookReading.objects.create(
-                    book=book,
-                    start_date=start_date,
-                    end_date=end_date,
-                    finished=True,
-                    rating=(
-                        int(row.get("Star Rating")) if row.get("Star Rating") else None
-                    ),
-                )
-                reading.save()
-            else:
-                # Goodreads fallback
-                try:
-                    start_date = parser.parse(row.get("Date Added"))
-                    end_date = parser.parse(row.get("Date Read"))
-
-                    if start_date > end_date:
-                        start_date = end_date
-                except (TypeError, ValueError):
-                    start_date = date.today()
-                    end_date = date.today()
-
-                reading = BookReading.objects.create(
-                    book=book,
-                    start_date=start_date,
-                    end_date=end_date,
-                    finished=True,
-                    rating=row.get("My Rating") or None,
-                )
-                reading.save()
-
-        # Add review as a note if there is one
-        if review := row.get("My Review"):
-            note = book.notes.create(
-                text=review,
+            import_books_from_csv.schedule(
+                (job.pk, offset), delay=IMPORT_RETRY_DELAY * 2**attempts
             )
-            note.save()
+            return
 
-        return True
+        job.status = "failed"
+        job.error = repr(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+        raise
 
-    return False
-
-
-@db_task()
-def import_books_from_csv(data, user_id):
-    user = get_object_or_404(User, id=user_id)
+    if len(chunk) == IMPORT_CHUNK_SIZE:
+        import_books_from_csv(job.pk, job.offset)
+        return
 
-    tasks = [import_single_book(row, user_id) for row in data]
-    results = [task_result.get(blocking=True) for task_result in tasks]
-    count = results.count(True)
+    storage.delete(job.file_name)
+    job.status = "finished"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
 
-    user.email_user(
+    job.user.email_user(
         subject="Book Stacks import finished!",
         message=(
-            f"Your import of {count} {pluralize('book', count)} is done!\n\n"
+            f"Your import of {job.created_books} "
+            f"{pluralize('book', job.created_books)} is done!\n\n"
             f"https://bookstacks.app{reverse('imports')}"  # noqa: E231
         ),
     )
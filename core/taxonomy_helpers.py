@@ -0,0 +1,115 @@
+import time
+import uuid
+from types import MappingProxyType
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import BookType, BookGenre, BookFormat, BookLocation
+
+TAXONOMY_MODELS = {
+    "type": BookType,
+    "genre": BookGenre,
+    "format": BookFormat,
+    "location": BookLocation,
+}
+TAXONOMY_VERSION_KEY = "taxonomy-version"
+# How often (in seconds) to check whether another process changed the taxonomy.
+TAXONOMY_CHECK_INTERVAL = 5
+
+_taxonomies = {}
+_version = None
+_checked_at = 0
+
+
+class Taxonomy:
+    """
+    An immutable, in-memory copy of one of the types/genres/formats/locations
+    tables. These hardly ever change, so each process loads them once.
+    """
+
+    def __init__(self, items):
+        self.items = tuple(items)
+        self.by_pk = MappingProxyType({item.pk: item for item in self.items})
+        self.by_slug = MappingProxyType({item.slug: item for item in self.items})
+        self.ids_by_slug = MappingProxyType({item.slug: item.pk for item in self.items})
+
+        children = {}
+        for item in self.items:
+            if getattr(item, "parent_id", None) is not None:
+                # Save a query every time a template looks at `item.parent`.
+                item.parent = self.by_pk[item.parent_id]
+                children.setdefault(item.parent_id, []).append(item)
+
+        self.children = MappingProxyType(
+            {pk: tuple(items) for pk, items in children.items()}
+        )
+        for item in self.items:
+            item.has_children = item.pk in self.children
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def family_ids(self, slug):
+        """The id for `slug` plus the ids of all its children."""
+        item = self.by_slug[slug]
+        return [item.pk] + [child.pk for child in self.children.get(item.pk, ())]
+
+    def grouped(self):
+        """Top level items first, then children grouped by parent, each by name."""
+        return sorted(
+            self.items,
+            key=lambda item: (
+                item.parent_id is not None,
+                item.parent_id or 0,
+                item.name,
+            ),
+        )
+
+
+def get_taxonomy(field_name):
+    """The cached `Taxonomy` for "type", "genre", "format" or "location"."""
+    global _version, _checked_at
+
+    if time.monotonic() - _checked_at > TAXONOMY_CHECK_INTERVAL:
+        version = cache.get(TAXONOMY_VERSION_KEY)
+        if version != _version:
+            _taxonomies.clear()
+            _version = version
+        _checked_at = time.monotonic()
+
+    if field_name not in _taxonomies:
+        _taxonomies[field_name] = Taxonomy(TAXONOMY_MODELS[field_name].objects.all())
+
+    return _taxonomies[field_name]
+
+
+def forget_taxonomies():
+    """Drop this process's copies so they're loaded again on next use."""
+    _taxonomies.clear()
+
+
+def get_taxonomies():
+    return {field_name: get_taxonomy(field_name) for field_name in TAXONOMY_MODELS}
+
+
+@receiver(post_save, sender=BookType)
+@receiver(post_save, sender=BookGenre)
+@receiver(post_save, sender=BookFormat)
+@receiver(post_save, sender=BookLocation)
+@receiver(post_delete, sender=BookType)
+@receiver(post_delete, sender=BookGenre)
+@receiver(post_delete, sender=BookFormat)
+@receiver(post_delete, sender=BookLocation)
+def invalidate_taxonomies(sender, **kwargs):
+    global _version
+
+    # Other processes notice the new version within `TAXONOMY_CHECK_INTERVAL`.
+    _version = uuid.uuid4().hex
+    cache.set(TAXONOMY_VERSION_KEY, _version, timeout=None)
+    forget_taxonomies()
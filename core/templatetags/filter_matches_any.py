@@ -1,17 +1,16 @@
 from django import template
+from core.taxonomy_helpers import get_taxonomy
 
 register = template.Library()
 
 
 @register.simple_tag
 def filter_matches_any(item, filter_name, filter_queries):
-    if filter_queries.get(filter_name, False) == item.slug:
-        return True
+    selected = filter_queries.get(filter_name, False)
 
-    # Append 'book' to each key in filter_queries and ignore values that are 'all'
-    filter_queries = {f"book{k}": v for k, v in filter_queries.items() if v != "all"}
+    if selected == item.slug:
+        return True
 
     # Check if any sub_items match the filter
-    return item.__class__.objects.filter(
-        parent=item, slug=filter_queries.get(f"book{filter_name}", False)
-    ).exists()
+    child = get_taxonomy(filter_name).get(selected)
+    return child is not None and child.parent_id == item.pk
@@ -5,4 +5,4 @@ register = template.Library()
 
 @register.filter
 def get_book(books, book_id):
-    return books.filter(id=book_id).first()
+    return books.get(book_id)
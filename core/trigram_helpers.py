@@ -0,0 +1,194 @@
+import heapq
+import re
+import uuid
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from django.core.cache import cache
+from .models import Author, Book
+
+TRIGRAM_FIELDS = {
+    Book: "title",
+    Author: "name",
+}
+# How many users' indexes each process keeps around.
+TRIGRAM_INDEX_COUNT = 16
+# How alike (0 to 1) two words need to be to count as a near-miss.
+TRIGRAM_WORD_THRESHOLD = 0.5
+# How much of a query a title needs to match to be returned.
+TRIGRAM_THRESHOLD = 0.5
+# Caps on the work done per query, so big libraries stay quick.
+TRIGRAM_MAX_QUERY_WORDS = 8
+TRIGRAM_MAX_CANDIDATES = 2000
+TRIGRAM_MAX_COMPLETIONS = 200
+
+_indexes = OrderedDict()
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def trigrams(word):
+    """The three letter chunks of `word`, padded so its start counts for more."""
+    word = f"  {word} "
+    return {word[i : i + 3] for i in range(len(word) - 2)}
+
+
+class TrigramIndex:
+    """
+    Finds titles (or names) close to a query in `{pk: text}`, even when it's
+    misspelled. Query words are matched against the distinct words in the
+    texts by shared trigrams, which keeps both building and searching in
+    proportion to the vocabulary rather than the number of texts.
+
+    It also completes partly typed queries from a sorted list of those words.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.words = {}
+        self.pks_by_word = {}
+        for pk, text in texts.items():
+            self.words[pk] = frozenset(words(text))
+            for word in self.words[pk]:
+                self.pks_by_word.setdefault(word, []).append(pk)
+
+        self.trigrams = {word: trigrams(word) for word in self.pks_by_word}
+        self.words_by_trigram = {}
+        for word, grams in self.trigrams.items():
+            for gram in grams:
+                self.words_by_trigram.setdefault(gram, []).append(word)
+
+        self.vocabulary = sorted(self.pks_by_word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def similar_words(self, word):
+        """`{indexed_word: similarity}` for words spelled something like `word`."""
+        wanted = trigrams(word)
+        shared = Counter()
+        for gram in wanted:
+            shared.update(self.words_by_trigram.get(gram, ()))
+
+        similar = {}
+        for other, count in shared.items():
+            # Dice coefficient
+            similarity = 2 * count / (len(wanted) + len(self.trigrams[other]))
+            if similarity >= TRIGRAM_WORD_THRESHOLD:
+                similar[other] = similarity
+        return similar
+
+    def search(self, query, limit=10, threshold=TRIGRAM_THRESHOLD):
+        """The pks of the best matches for `query`, best first."""
+        matches = [
+            self.similar_words(word) for word in words(query)[:TRIGRAM_MAX_QUERY_WORDS]
+        ]
+        if not any(matches):
+            return []
+
+        # Only look at texts with the query's rarest word (or a near-miss of
+        # it), best spellings first, so common words like "the" cost nothing.
+        rarest = min(
+            filter(None, matches),
+            key=lambda similar: sum(len(self.pks_by_word[word]) for word in similar),
+        )
+        candidates = set()
+        for word in sorted(rarest, key=rarest.get, reverse=True):
+            candidates.update(self.pks_by_word[word])
+            if len(candidates) >= TRIGRAM_MAX_CANDIDATES:
+                break
+
+        scored = []
+        for pk in candidates:
+            text_words = self.words[pk]
+            score = sum(
+                max((similar.get(word, 0) for word in text_words), default=0)
+                for similar in matches
+            ) / len(matches)
+            if score >= threshold:
+                # Prefer the closest match, then the shortest title.
+                scored.append((-score, len(text_words), pk))
+
+        scored.sort()
+        return [pk for _, _, pk in scored[:limit]]
+
+    def complete(self, query, limit=10):
+        """
+        The pks of texts with every word of `query`, the last one only as a
+        prefix. Texts starting with the query come first, then shorter ones.
+        """
+        query_words = words(query)[:TRIGRAM_MAX_QUERY_WORDS]
+        if not query_words:
+            return []
+
+        *whole_words, prefix = query_words
+        pks = set()
+        i = bisect_left(self.vocabulary, prefix)
+        completions = 0
+        while (
+            i < len(self.vocabulary)
+            and self.vocabulary[i].startswith(prefix)
+            and completions < TRIGRAM_MAX_COMPLETIONS
+        ):
+            pks.update(self.pks_by_word[self.vocabulary[i]])
+            i += 1
+            completions += 1
+
+        for word in whole_words:
+            pks.intersection_update(self.pks_by_word.get(word, ()))
+
+        query = " ".join(query_words)
+        return heapq.nsmallest(
+            limit,
+            pks,
+            key=lambda pk: (
+                not self.texts[pk].lower().startswith(query),
+                len(self.texts[pk]),
+                self.texts[pk],
+            ),
+        )
+
+
+def _version_key(user_id):
+    return f"trigram-version:{user_id}"
+
+
+def library_version(user_id):
+    """Changes whenever a user's book titles or author names do."""
+    return cache.get(_version_key(user_id))
+
+
+def get_trigram_index(user, model, version=None):
+    """
+    This process's `TrigramIndex` of a user's (unarchived) book titles or
+    author names. Pass `version` if you've just looked up `library_version`.
+    """
+    key = (user.pk, model)
+    version = version or library_version(user.pk)
+
+    if key in _indexes and _indexes[key][0] == version:
+        _indexes.move_to_end(key)
+        return _indexes[key][1]
+
+    queryset = model.objects.filter(user=user)
+    if model is Book:
+        queryset = queryset.exclude(archived=True)
+    index = TrigramIndex(dict(queryset.values_list("pk", TRIGRAM_FIELDS[model])))
+    _indexes[key] = (version, index)
+    while len(_indexes) > TRIGRAM_INDEX_COUNT:
+        _indexes.popitem(last=False)
+
+    return index
+
+
+def forget_trigram_index(user_id):
+    """Rebuild a user's indexes, in every process, next time they're used."""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    for key in [key for key in _indexes if key[0] == user_id]:
+        del _indexes[key]
+
+
+def forget_trigram_indexes():
+    """Drop this process's indexes for every user."""
+    _indexes.clear()
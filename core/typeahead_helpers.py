@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from django.urls import reverse
+from .models import Author, Book
+from .trigram_helpers import get_trigram_index, library_version, words
+
+TYPEAHEAD_LIMITS = {
+    Book: 8,
+    Author: 4,
+}
+# How many recent queries (across users) each process remembers.
+TYPEAHEAD_CACHE_SIZE = 512
+
+_results = OrderedDict()
+
+
+def get_typeahead_results(user, query):
+    """
+    Ranked `{"books": [...], "authors": [...]}` for a partly typed query,
+    cheap enough to ask for on every keystroke. Answers come from each
+    process's word index of the library, and recent ones are remembered
+    until the library's titles or names change.
+    """
+    query = " ".join(words(query))
+    version = library_version(user.pk)
+    key = (user.pk, version, query)
+
+    if key in _results:
+        _results.move_to_end(key)
+        return _results[key]
+
+    results = {}
+    for model, limit in TYPEAHEAD_LIMITS.items():
+        index = get_trigram_index(user, model, version)
+        url_name = f"{model._meta.model_name}_detail"
+        results[f"{model._meta.model_name}s"] = [
+            {
+                "id": pk,
+                "name": index.texts[pk],
+                "url": reverse(url_name, args=(pk,)),
+            }
+            for pk in index.complete(query, limit)
+        ]
+
+    _results[key] = results
+    while len(_results) > TYPEAHEAD_CACHE_SIZE:
+        _results.popitem(last=False)
+
+    return results
+
+
+def forget_typeahead_results():
+    _results.clear()
@@ -1,38 +1,43 @@
-import io
-import csv
 import json
+import uuid
+from urllib.parse import urlsplit
 import bleach
 import markdown
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import login
 from django.conf import settings
+from django.core.files.storage import default_storage, storages
 from django.urls import reverse, reverse_lazy
-from django.http import FileResponse, Http404, HttpResponseForbidden
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    QueryDict,
+)
 from django.contrib.auth.decorators import login_not_required
 from django.contrib import messages
 from django.contrib.syndication.views import Feed
-from django.core.paginator import Paginator
 from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_GET
 from django.views.decorators.http import require_POST
 from django.db import IntegrityError, models
 from django.db.models import (
-    Q,
     OuterRef,
-    Exists,
     Subquery,
-    DateField,
     F,
     Value,
     CharField,
+    Window,
 )
-from django.db.models.functions import Trunc, Coalesce
+from django.db.models.functions import Coalesce, RowNumber
 from django.http import JsonResponse
 from django.core.exceptions import PermissionDenied
 from django.utils.decorators import method_decorator
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from django_htmx.http import HttpResponseClientRedirect
 from django_registration.backends.activation.views import (
     ActivationView as BaseActivationView,
     RegistrationView as BaseRegistrationView,
@@ -42,7 +47,6 @@ from titlecase import titlecase
 from .forms import (
     ImportBooksForm,
     BookForm,
-    BookStatusForm,
     BookReadingForm,
     BookCoverForm,
     BookNoteForm,
@@ -54,21 +58,28 @@ from .forms import (
 )
 from .utils import send_email_to_admin
 from .cover_helpers import search_open_library
-from .filter_helpers import get_filter_counts
+from .filter_helpers import get_filter_count
+from .fragment_helpers import render_book_list_items
+from .pagination_helpers import (
+    keyset_order,
+    keyset_page,
+    keyset_queryset,
+    keyset_slice,
+)
+from .search_helpers import search_library
+from .stats_helpers import get_library_counts, get_status_counts
+from .taxonomy_helpers import get_taxonomies
+from .typeahead_helpers import get_typeahead_results
 from .models import (
     User,
     Book,
     Author,
     BookCover,
-    BookFormat,
-    BookReading,
-    BookType,
-    BookLocation,
-    BookGenre,
     Series,
     SeriesBook,
     Changelog,
     BookStatusChange,
+    ImportJob,
 )
 from .tasks import import_books_from_csv
 
@@ -95,87 +106,36 @@ def status(request, status):
         .prefetch_related("covers", "author", "format", "genre", "location", "type")
     )
 
-    # Check if genres/types have sub-genres/types
-    sub_genre_exists = BookGenre.objects.filter(parent=OuterRef("pk")).values("pk")
-    sub_type_exists = BookType.objects.filter(parent=OuterRef("pk")).values("pk")
-
-    genres = BookGenre.objects.all().annotate(has_sub_genre=Exists(sub_genre_exists))
-    types = BookType.objects.all().annotate(has_sub_type=Exists(sub_type_exists))
-
-    # Determine which filter options have matching books
-
-    locations = BookLocation.objects.all()
-    formats = BookFormat.objects.all()
-
-    # Get filter counts before applying filters
-    filter_counts = {
-        "type": get_filter_counts(books, types, "type"),
-        "genre": get_filter_counts(books, genres, "genre"),
-        "location": get_filter_counts(books, locations, "location"),
-        "format": get_filter_counts(books, formats, "format"),
-    }
-
-    # Get filter parameters from request
-    filter_queries = {
-        "type": request.GET.get("type", "all"),
-        "location": request.GET.get("location", "all"),
-        "format": request.GET.get("format", "all"),
-        "genre": request.GET.get("genre", "all"),
-    }
-
-    # Apply filters to the books queryset
-    try:
-        if filter_queries["type"] != "all":
-            # Get the type
-            type = BookType.objects.get(slug=filter_queries["type"])
-            # If the type is a parent, also check for child types within this type
-            if not type.parent:
-                child_types = BookType.objects.filter(parent=type)
-                books = books.filter(Q(type=type) | Q(type__in=child_types))
-            else:
-                books = books.filter(type=type)
-    except BookType.DoesNotExist:
-        raise Http404()
-
-    if filter_queries["location"] != "all":
-        books = books.filter(location__slug=filter_queries["location"])
-    if filter_queries["format"] != "all":
-        books = books.filter(format__slug=filter_queries["format"])
-    if filter_queries["genre"] != "all":
-        # Fetch the selected genre based on slug
-        selected_genre = BookGenre.objects.get(slug=filter_queries["genre"])
+    taxonomies = get_taxonomies()
+    types = taxonomies["type"]
+    genres = taxonomies["genre"]
+    locations = taxonomies["location"]
+    formats = taxonomies["format"]
+
+    # Get status and filter counts before applying filters
+    status_counts, filter_counts = get_library_counts(
+        request.user,
+        status,
+        taxonomies,
+    )
 
-        # Fetch sub-genres of the selected genre
-        sub_genres = BookGenre.objects.filter(parent=selected_genre)
+    filter_queries = get_filter_queries(request.GET)
+    books = filter_books(books, filter_queries, taxonomies)
 
-        # Filter books by the selected genre and its sub-genres
-        books = books.filter(
-            Q(genre=selected_genre) | Q(genre__in=sub_genres)
-        ).distinct()
-
-    # Sort these statuses by the end date of their latest reading
-    if status in ["finished", "dnf"]:
-        latest_bookreading = BookReading.objects.filter(
-            Q(book=OuterRef("pk"))
-            & (Q(finished=True) if status == "finished" else Q(finished=False))
-        ).order_by("-start_date")
-        books = books.annotate(
-            latest_reading_end_date=Subquery(latest_bookreading.values("end_date")[:1])
-        ).order_by("-latest_reading_end_date")
-
-    if status == "reading":
-        latest_bookreading = BookReading.objects.filter(
-            Q(book=OuterRef("pk"))
-        ).order_by("-start_date")
-        books = books.annotate(
-            latest_reading_start_date=Subquery(
-                latest_bookreading.values("start_date")[:1]
-            )
-        ).order_by("latest_reading_start_date")
+    # Sort these statuses by the end date of their latest finished (or
+    # unfinished, for dnf) reading
+    if status == "finished":
+        ordering = [("latest_finished_end", True), ("pk", True)]
+    elif status == "dnf":
+        ordering = [("latest_unfinished_end", True), ("pk", True)]
+    elif status == "reading":
+        ordering = [("latest_reading_start", False), ("pk", False)]
+    else:
+        ordering = [("updated_at", True), ("pk", True)]
 
-    paginator = Paginator(books, pagination)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    after = request.GET.get("after")
+    page, next_cursor = keyset_page(books, ordering, after, pagination)
+    render_book_list_items(page)
 
     # If status is `finished`, get counts of how many (unique?) Books have
     # associated BookReadings that have end dates in each year and are also
@@ -196,17 +156,17 @@ def status(request, status):
             .annotate(count=models.Count("readings__end_date__year"))
         )
 
-    # Get the books and their forms for the page
-    forms = [(book, BookStatusForm(auto_id=False, instance=book)) for book in page_obj]
-
-    status_counts = {
-        status["status"]: status["count"]
-        for status in Book.objects.filter(user=request.user, archived=False)
-        .values("status")
-        .annotate(count=models.Count("status"))
-    }
+    books_count = count_filtered_books(
+        books, status, filter_queries, status_counts, filter_counts
+    )
 
-    books_count = books.count()
+    if next_cursor:
+        next_query = request.GET.copy()
+        next_query["after"] = next_cursor
+        next_query.pop("page", None)
+        next_page_url = f"{request.path}?{next_query.urlencode()}"
+    else:
+        next_page_url = None
 
     context = {
         "statuses": Book._meta.get_field("status").choices,
@@ -216,12 +176,12 @@ def status(request, status):
             "slug": status,
             "name": Book(status=status).get_status_display(),
         },
-        "forms": forms,
+        "books": page,
         "formats": formats,
         "types": types,
         "locations": locations,
         "genres": genres,
-        "page_obj": page_obj,
+        "next_page_url": next_page_url,
         "filter_queries": filter_queries,
         "filter_active": status_counts.get(status, 0) != books_count,
         "filter_request": any(value != "all" for value in filter_queries.values()),
@@ -229,12 +189,56 @@ def status(request, status):
         "filtered_books_count": books_count,
     }
 
-    if request.htmx:
+    if request.htmx and after:
+        return render(request, "components/book-list-page.html", context)
+    elif request.htmx:
         return render(request, "components/book-list.html", context)
     else:
         return render(request, "status.html", context)
 
 
+def get_filter_queries(params):
+    """The status page's filters from its query string, "all" if not set."""
+    return {
+        field_name: params.get(field_name, "all")
+        for field_name in ("type", "location", "format", "genre")
+    }
+
+
+def filter_books(books, filter_queries, taxonomies):
+    """Apply the filters to `books`, including any sub-types/sub-genres."""
+    for field_name, slug in filter_queries.items():
+        if slug == "all":
+            continue
+        if not taxonomies[field_name].get(slug):
+            raise Http404()
+
+        books = books.filter(
+            **{f"{field_name}__in": taxonomies[field_name].family_ids(slug)}
+        )
+
+    if filter_queries["genre"] != "all":
+        # A book can be in both a genre and its sub-genre
+        books = books.distinct()
+
+    return books
+
+
+def count_filtered_books(books, status, filter_queries, status_counts, filter_counts):
+    """How many books are left after the filters, for "Showing X of Y"."""
+    # Use the cached counts unless more than one filter is narrowing things down
+    active_filters = {
+        field_name: slug for field_name, slug in filter_queries.items() if slug != "all"
+    }
+    if not active_filters:
+        return status_counts.get(status, 0)
+    elif len(active_filters) == 1:
+        [(field_name, slug)] = active_filters.items()
+        return get_filter_count(filter_counts[field_name], slug)
+    else:
+        return books.count()
+
+
 def import_books(request):
     if request.method == "POST":
         form = ImportBooksForm(request.POST, request.FILES)
@@ -246,80 +250,104 @@ def import_books(request):
                 messages.error(request, "Please choose a CSV file.")
                 return redirect(reverse("import_books"))
 
-            data = csv_file.read().decode("utf-8")
-            reader = csv.DictReader(io.StringIO(data))
-
-            import_books_from_csv(list(reader), request.user.id)
+            # Only the file's name goes on the queue, the rows are read from
+            # it a chunk at a time.
+            name = storages["imports"].save(
+                f"{request.user.id}_{uuid.uuid4().hex}.csv", csv_file
+            )
+            job = ImportJob.objects.create(user=request.user, file_name=name)
+            import_books_from_csv(job.pk)
 
         else:
             messages.error(request, "Nope.")
-            reader = False
-
-        if not reader:
             return redirect(reverse("import_books"))
 
         messages.success(
             request, "Import started. We’ll send you an email when it's done."
         )
-        return redirect("index")
+        return redirect("imports")
 
     return render(request, "import_books.html", {"form": ImportBooksForm})
 
 
 def imports(request):
-    # Group books by date and retrieve all details
-    books = (
-        request.user.books.filter(imported=True)
-        .annotate(date_imported=Trunc("created_at", "day", output_field=DateField()))
-        .order_by("-date_imported")
-    )
-
-    # Structure the data for the template
-    imports_grouped_by_date = {}
-    for book in books:
-        date = book.date_imported
-        if date not in imports_grouped_by_date:
-            imports_grouped_by_date[date] = {"books": [book], "count": 1}
-        else:
-            imports_grouped_by_date[date]["books"].append(book)
-            imports_grouped_by_date[date]["count"] += 1
+    pagination = 10
 
-    # Convert the dictionary to a list of tuples for easier template iteration
-    imports_grouped_by_date = sorted(
-        imports_grouped_by_date.items(), key=lambda x: x[0], reverse=True
+    ordering = [("created_at", True), ("id", True)]
+    after = request.GET.get("after")
+    jobs, next_cursor = keyset_page(
+        request.user.import_jobs.all(), ordering, after, pagination
     )
+    add_import_job_books(jobs)
 
     context = {
-        "imports_grouped_by_date": imports_grouped_by_date,
+        "jobs": jobs,
+        "first_page": not after,
+        "next_page_url": f"{request.path}?after={next_cursor}" if next_cursor else None,
     }
 
-    return render(request, "imports.html", context)
+    if request.htmx and after:
+        return render(request, "components/import-job-list-page.html", context)
+    else:
+        return render(request, "imports.html", context)
+
+
+def import_job_progress(request, pk):
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    add_import_job_books([job])
+    return render(request, "components/import-job.html", {"job": job})
+
+
+def add_import_job_books(jobs, count=10):
+    """Give each job the first `count` books it added, in one query."""
+    books = (
+        Book.objects.filter(import_job__in=jobs)
+        .annotate(
+            position=Window(RowNumber(), partition_by="import_job", order_by="pk")
+        )
+        .filter(position__lte=count)
+        .only("pk", "title", "import_job")
+    )
+
+    by_job = {}
+    for book in books:
+        by_job.setdefault(book.import_job_id, []).append(book)
+    for job in jobs:
+        job.first_books = by_job.get(job.pk, [])
+        job.more_books = job.created_books - len(job.first_books)
 
 
 def logbook(request):
     pagination = 10
 
     # Subquery to get the first status change for each book
-    first_change_subquery = BookStatusChange.objects.filter(book=OuterRef("pk")).values(
-        "old_status"
-    )[:1]
+    first_change_subquery = (
+        BookStatusChange.objects.filter(book=OuterRef("pk"))
+        .order_by("changed_at")
+        .values("old_status")[:1]
+    )
 
-    # Annotated queryset for books with their original status
-    books_with_status = (
-        Book.objects.annotate(
+    # Books as log entries, with the status they were added with. The columns
+    # have to line up with `status_changes` below.
+    books_added = (
+        Book.objects.filter(user=request.user)
+        .annotate(
+            book_id=F("id"),
             log_timestamp=F("created_at"),
-            original_status=Coalesce(
+            log_type=Value("book", output_field=CharField()),
+            old_status=Value(None, output_field=CharField()),
+            new_status=Coalesce(
                 Subquery(first_change_subquery, output_field=CharField()), F("status")
             ),
-            log_type=Value("book", output_field=CharField()),
         )
-        .filter(user=request.user)
         .values(
             "id",
+            "book_id",
             "log_timestamp",
-            "title",
-            "original_status",
             "log_type",
+            "title",
+            "old_status",
+            "new_status",
         )
     )
 
@@ -332,32 +360,51 @@ def logbook(request):
             title=F("book__title"),
         )
         .values(
+            "id",
             "book_id",
             "log_timestamp",
+            "log_type",
             "title",
             "old_status",
             "new_status",
-            "log_type",
         )
     )
 
-    # Combine both querysets
-    books_list = list(books_with_status)
-    status_changes_list = list(status_changes)
-
-    combined_logs = books_list + status_changes_list
-    combined_logs.sort(key=lambda x: x["log_timestamp"], reverse=True)
-
-    paginator = Paginator(combined_logs, pagination)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    # Combine both in one query so only a page's worth of rows come back
+    ordering = [("log_timestamp", True), ("log_type", True), ("id", True)]
+    after = request.GET.get("after")
+    logs = (
+        keyset_queryset(books_added, ordering, after)
+        .order_by()
+        .union(keyset_queryset(status_changes, ordering, after).order_by(), all=True)
+        .order_by(*keyset_order(ordering))
+    )
+    page, next_cursor = keyset_slice(list(logs[: pagination + 1]), ordering, pagination)
+
+    # Look up just this page's books, with their first cover, in one query
+    first_cover = BookCover.objects.filter(book=OuterRef("pk")).order_by("order")
+    books = Book.objects.filter(
+        user=request.user, pk__in={log["book_id"] for log in page}
+    ).annotate(
+        thumbnail=Subquery(first_cover.values("thumbnail")[:1]),
+        thumbnail_width=Subquery(first_cover.values("thumbnail_width")[:1]),
+        thumbnail_height=Subquery(first_cover.values("thumbnail_height")[:1]),
+    )
+    for book in books:
+        book.thumbnail_url = (
+            default_storage.url(book.thumbnail) if book.thumbnail else None
+        )
 
     context = {
-        "books": Book.objects.filter(user=request.user).prefetch_related("covers"),
-        "page_obj": page_obj,
+        "books": {book.pk: book for book in books},
+        "page": page,
+        "first_page": not after,
+        "next_page_url": f"{request.path}?after={next_cursor}" if next_cursor else None,
     }
 
-    if request.htmx:
+    if request.htmx and after:
+        return render(request, "components/logbook-list-page.html", context)
+    elif request.htmx:
         return render(request, "components/logbook-list.html", context)
     else:
         return render(request, "logbook.html", context)
@@ -523,7 +570,6 @@ def book_detail(request, pk):
                 "slug": book.status,
                 "name": book.get_status_display(),
             },
-            "form": BookStatusForm(auto_id=False, instance=book),
             "reading_form": BookReadingForm(instance=book),
             "note_form": BookNoteForm(instance=book),
             "readings": readings,
@@ -556,23 +602,7 @@ def book_update(request, pk):
                     reading = book.readings.first()
                 return redirect("reading_update", pk=book.pk, reading_pk=reading.pk)
 
-            if request.POST.get("status_change"):
-                messages.success(
-                    request,
-                    f"{book} moved to {book.get_status_display()}",
-                )
-                return redirect("status", status=old_status)
-
-            if request.POST.get("status_change_from_detail"):
-                messages.success(
-                    request,
-                    f"{book} moved to {book.get_status_display()}",
-                )
-            else:
-                messages.success(
-                    request,
-                    f"{book} updated",
-                )
+            messages.success(request, f"{book} updated")
 
             return redirect(book.get_absolute_url())
     else:
@@ -589,6 +619,74 @@ def book_update(request, pk):
     )
 
 
+@require_POST
+def book_status(request, pk):
+    """
+    Move a book to another status without posting the whole book back through
+    `BookForm`. htmx requests get the list item's replacement (nothing) plus
+    the updated status nav and messages.
+    """
+    book = get_object_or_404(Book, pk=pk, user=request.user)
+    old_status = book.status
+    new_status = request.POST.get("status")
+
+    if new_status not in dict(Book._meta.get_field("status").choices):
+        return HttpResponseBadRequest("Unknown status")
+
+    if new_status != old_status:
+        book.status = new_status
+        book.save()
+
+    if new_status != old_status and new_status == "finished":
+        messages.success(request, f"Congrats on finishing {book}! Review it now?")
+        reading = book.readings.first()
+        if reading:
+            url = reverse("reading_update", args=(book.pk, reading.pk))
+        else:
+            url = book.get_absolute_url()
+        return HttpResponseClientRedirect(url) if request.htmx else redirect(url)
+
+    messages.success(request, f"{book} moved to {book.get_status_display()}")
+
+    if request.POST.get("status_change_from_detail"):
+        return redirect(book.get_absolute_url())
+
+    if not request.htmx:
+        return redirect("status", status=old_status)
+
+    context = {
+        "statuses": Book._meta.get_field("status").choices,
+        "status": {"slug": old_status},
+        "status_counts": get_status_counts(request.user),
+    }
+
+    # The list's filters are in the page's URL, not this request's.
+    filter_queries = get_filter_queries(
+        QueryDict(urlsplit(request.htmx.current_url or "").query)
+    )
+    if any(value != "all" for value in filter_queries.values()):
+        taxonomies = get_taxonomies()
+        status_counts, filter_counts = get_library_counts(
+            request.user, old_status, taxonomies
+        )
+        books = filter_books(
+            Book.objects.filter(status=old_status, archived=False, user=request.user),
+            filter_queries,
+            taxonomies,
+        )
+        books_count = count_filtered_books(
+            books, old_status, filter_queries, status_counts, filter_counts
+        )
+        context |= {
+            "status_counts": status_counts,
+            "filter_request": True,
+            "filter_active": status_counts.get(old_status, 0) != books_count,
+            "filtered_books_count": books_count,
+        }
+
+    return render(request, "components/book-status-changed.html", context)
+
+
 @require_POST
 def book_delete(request, pk):
     book = get_object_or_404(Book, pk=pk, user=request.user)
@@ -620,41 +718,55 @@ def book_unarchive(request, pk):
 
 def search(request):
     query = request.GET.get("q").strip()
-    forms = []
 
     if query:
-        books = (
-            Book.objects.filter(
-                title__icontains=query,
-                user=request.user,
-            )
+        books = search_library(
+            Book.objects.filter(user=request.user)
             .exclude(archived=True)
-            .distinct()
+            .prefetch_related("covers"),
+            request.user,
+            query,
+        )
+        books = render_book_list_items(books)
+        authors = search_library(
+            Author.objects.filter(user=request.user), request.user, query
+        )
+        series = search_library(
+            Series.objects.filter(user=request.user), request.user, query
         )
-        # Get the books and their forms for these search results
-        forms = [(book, BookStatusForm(auto_id=False, instance=book)) for book in books]
-
-        authors = Author.objects.filter(
-            name__icontains=query,
-            user=request.user,
-        ).distinct()
     else:
-        books = Book.objects.none()
-        authors = Author.objects.none()
+        books = []
+        authors = []
+        series = []
 
     return render(
         request,
         "search.html",
         {
             "query": query,
-            "forms": forms,
             "books": books,
             "authors": authors,
+            "series": series,
             "statuses": Book._meta.get_field("status").choices,
         },
     )
 
 
+@require_GET
+def typeahead(request):
+    query = request.GET.get("q", "").strip()
+    results = (
+        get_typeahead_results(request.user, query)
+        if query
+        else {"books": [], "authors": []}
+    )
+
+    if request.htmx:
+        return render(request, "components/typeahead.html", {"query": query, **results})
+
+    return JsonResponse(results)
+
+
 def open_library_search(request):
     status = request.GET.get("status", "wishlist")
     form = OpenLibrarySearchForm(request.GET or None, autofocus=False)
@@ -689,13 +801,12 @@ def open_library_search(request):
             pair.split("=")[1] for pair in query.lstrip("&").split("&")
         )
 
-        local_results = (
-            Book.objects.filter(
-                title__icontains=raw_query,
-                user=request.user,
-            )
+        local_results = search_library(
+            Book.objects.filter(user=request.user)
             .exclude(archived=True)
-            .distinct()
+            .prefetch_related("covers"),
+            request.user,
+            raw_query,
         )
 
         results = search_open_library(query)
@@ -1056,9 +1167,9 @@ def series_add_book(request, pk):
 
     books = Book.objects.filter(user=request.user).exclude(seriesbook__series=series)
 
-    # if search query `q` is present, filter the books by title
+    # if search query `q` is present, find books by title, allowing for typos
     if query := request.GET.get("q"):
-        books = books.filter(title__icontains=query)
+        books = search_library(books, request.user, query)
 
     return render(
         request,
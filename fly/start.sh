@@ -21,8 +21,10 @@ aws s3api put-bucket-lifecycle-configuration \
     --lifecycle-configuration file:///code/fly/spaces-lifecycle.json \
     --endpoint=https://nyc3.digitaloceanspaces.com
 
-# Start Huey and leave it running in the background.
+# Start Huey and leave it running in the background, with imports' covers
+# on a queue of their own.
 python manage.py run_huey &
+python manage.py run_covers_huey &
 
 if [[ -z "$DB_DIR" ]]; then
     echo "DB_DIR env var not specified - this should be a path of the directory where the database file should be stored"
@@ -46,6 +48,12 @@ rm -f ./just.sh && just.sh >/dev/null 2>&1
 ./manage.py migrate --noinput
 ./manage.py loaddata book_type book_genre book_format book_location
 ./manage.py createcachetable
+# Counts are kept up to date as books change, this only reports any drift.
+./manage.py rebuild_library_stats --check
+
+# Tasks queued before a restart may be gone, imports carry on from their
+# checkpoints.
+./manage.py resume_imports
 
 chmod -R a+rwX /db
 